@@ -1,7 +1,26 @@
 from django.contrib import admin
 
-from orders.models import Order, OrderItem
+from orders.models import FailedStagedOrder, IdempotencyKey, Order, OrderItem, StagedOrder
 
 # Register your models here.
 admin.site.register(Order)
 admin.site.register(OrderItem)
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'restaurant', 'customer', 'status_code', 'created_at')
+    search_fields = ('key',)
+    exclude = ('response',)
+
+
+@admin.register(StagedOrder)
+class StagedOrderAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'restaurant_id', 'created_at')
+    exclude = ('payload',)
+
+
+@admin.register(FailedStagedOrder)
+class FailedStagedOrderAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'restaurant_id', 'staged_at', 'failed_at')
+    readonly_fields = ('error',)
@@ -0,0 +1,85 @@
+"""
+Idempotent order placement.
+
+Clients on flaky networks retry order requests they never got an answer
+for. A request sent with an `Idempotency-Key` header has its successful
+response stored in `IdempotencyKey`, and retries with the same key get that
+response back without the order being placed again.
+
+Concurrent duplicates are serialized with a transaction scoped advisory
+lock on the key: the second request waits for the first to commit, then
+finds and replays its response. Other requests never wait on each other,
+and no table is locked.
+
+Keys are kept for `ORDER_IDEMPOTENCY_TTL` seconds (default 24 hours), after
+which a key may be reused. Expired keys are deleted by the
+`purge_idempotency_keys` management command.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+
+from orders.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+DEFAULT_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+
+def get_idempotency_ttl():
+    return timedelta(seconds=getattr(settings, 'ORDER_IDEMPOTENCY_TTL', DEFAULT_IDEMPOTENCY_TTL))
+
+
+def request_fingerprint(data):
+    """Digest of a request body, telling retries from other requests reusing a key."""
+    return hashlib.md5(json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+
+
+def lock_idempotency_key(restaurant_id, customer_id, key):
+    """
+    Takes an advisory lock on a key until the surrounding transaction ends.
+    Keys are hashed down to the 64 bit lock id Postgres expects; colliding
+    keys merely wait on each other.
+    """
+    digest = hashlib.blake2b(f"{restaurant_id}:{customer_id}:{key}".encode(), digest_size=8).digest()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [int.from_bytes(digest, 'big', signed=True)])
+
+
+def get_stored_response(restaurant_id, customer_id, key):
+    """The stored response of a key, or None. Expired keys are deleted on the way."""
+    stored = IdempotencyKey.objects.filter(
+        restaurant_id=restaurant_id, customer_id=customer_id, key=key
+    ).first()
+    if stored is not None and stored.created_at < timezone.now() - get_idempotency_ttl():
+        stored.delete()
+        return None
+    return stored
+
+
+def store_response(restaurant_id, customer_id, key, fingerprint, response):
+    return IdempotencyKey.objects.create(
+        restaurant_id=restaurant_id,
+        customer_id=customer_id,
+        key=key,
+        fingerprint=fingerprint,
+        status_code=response.status_code,
+        response=response.data,
+    )
+
+
+def purge_expired_keys(batch_size=5000):
+    """Deletes expired keys in batches, returning how many were deleted."""
+    expired = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - get_idempotency_ttl())
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
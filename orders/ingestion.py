@@ -0,0 +1,237 @@
+"""
+Write-behind order ingestion.
+
+At lunch peaks a single restaurant may get hundreds of orders per second.
+In `queued` mode, `RestaurantOrderView.post` still validates and prices each
+order (under the menu version lock, see `OrderSerializer.prepare`), but
+instead of writing it to the order tables it reserves the order's id from
+the `orders_order` sequence and appends the order as one row to
+`StagedOrder`, answering 202 with the reserved order number.
+
+`flush_staged_orders` then moves staged orders to `Order`/`OrderItem` in
+batches, each batch with a single statement: the staged rows are deleted
+and their orders and items inserted from their JSON payload in one go. The
+reserved ids become the order ids, so the order number given to the
+customer stays valid.
+
+`StagedOrder` is an UNLOGGED table: appending to it skips the write-ahead
+log, which is most of the cost of a small insert. The trade-off is that
+Postgres empties unlogged tables after a crash, losing the orders accepted
+but not yet flushed; run the flusher continuously to keep that window short.
+
+Orders that can no longer be written, e.g. because one of their menu items
+was deleted before they were flushed, are moved to `FailedStagedOrder`.
+
+Once `MAX_QUEUE_DEPTH` orders are waiting, new orders are refused with a
+503 and a `Retry-After` header until the flusher catches up.
+
+Settings (all optional):
+    ORDER_INGESTION = {
+        "MODE": "direct",           # or "queued"
+        "MAX_QUEUE_DEPTH": 10000,
+        "RETRY_AFTER": 1,           # seconds
+        "BATCH_SIZE": 500,
+    }
+"""
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from orders.models import FailedStagedOrder, Order, OrderItem, StagedOrder
+from restaurants.models import CustomizationOption
+
+logger = logging.getLogger(__name__)
+
+DIRECT = 'direct'
+QUEUED = 'queued'
+
+DEFAULT_ORDER_INGESTION = {
+    "MODE": DIRECT,
+    "MAX_QUEUE_DEPTH": 10000,
+    "RETRY_AFTER": 1,
+    "BATCH_SIZE": 500,
+}
+
+
+def get_ingestion_setting(name):
+    return getattr(settings, 'ORDER_INGESTION', {}).get(name, DEFAULT_ORDER_INGESTION[name])
+
+
+def is_queued_mode():
+    return get_ingestion_setting("MODE") == QUEUED
+
+
+def column_names(model, include_pk=True):
+    return [
+        field.column for field in model._meta.concrete_fields
+        if include_pk or not field.primary_key
+    ]
+
+
+def row_payload(instance):
+    """Column values of a model instance, as `jsonb_populate_record` reads them."""
+    return {field.column: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def estimated_queue_depth():
+    """
+    An upper bound of the number of staged orders, read without scanning the
+    table: every staged order has an id between the oldest one still staged
+    and the last one handed out by the `StagedOrder` sequence.
+    """
+    table = StagedOrder._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT pg_sequence_last_value(pg_get_serial_sequence(%s, 'id')::regclass)"
+            f" - (SELECT id FROM {table} ORDER BY id LIMIT 1) + 1",
+            [table]
+        )
+        return cursor.fetchone()[0] or 0
+
+
+def queue_is_full():
+    """
+    Whether `MAX_QUEUE_DEPTH` orders are waiting. Staged orders are only
+    counted, no further than the limit, once the estimate reaches it.
+    """
+    max_depth = get_ingestion_setting("MAX_QUEUE_DEPTH")
+    if estimated_queue_depth() < max_depth:
+        return False
+    return StagedOrder.objects.all()[:max_depth].count() >= max_depth
+
+
+def reserve_order_id():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id'))", [Order._meta.db_table])
+        return cursor.fetchone()[0]
+
+
+def stage_order(serializer, **extra_fields):
+    """
+    Prices a validated `OrderSerializer` order like `serializer.save` would
+    and stages it. Returns the unsaved order, carrying its reserved id.
+    """
+    with transaction.atomic():
+        order, items = serializer.prepare({**serializer.validated_data, **extra_fields})
+        order.pk = reserve_order_id()
+        order.created_at = order.updated_at = timezone.now()
+        for item in items:
+            item.order_id = order.pk
+            item.created_at = item.modified_at = order.created_at
+
+        StagedOrder.objects.create(
+            order_id=order.pk,
+            restaurant_id=order.restaurant_id,
+            payload={
+                "order": row_payload(order),
+                "items": [
+                    {column: value for column, value in row_payload(item).items() if column != 'id'}
+                    for item in items
+                ],
+            },
+        )
+    return order
+
+
+def flush_staged_orders_sql(selection):
+    """
+    Moves the staged orders picked by `selection` (a `WHERE` condition on
+    the staged order ids) to the order tables. Customizations whose option
+    was deleted in the meantime are dropped, like `OrderItem.customizations`
+    does for saved orders.
+    """
+    order_columns = column_names(Order)
+    item_columns = column_names(OrderItem, include_pk=False)
+    item_values = [
+        'option.id' if column == 'customizations_id' else f'staged_item.{column}'
+        for column in item_columns
+    ]
+    return f"""
+        WITH batch AS (
+            DELETE FROM {StagedOrder._meta.db_table}
+            WHERE {selection}
+            RETURNING payload
+        ), inserted_orders AS (
+            INSERT INTO {Order._meta.db_table} ({', '.join(order_columns)})
+            SELECT {', '.join(f'staged_order.{column}' for column in order_columns)}
+            FROM batch, jsonb_populate_record(NULL::{Order._meta.db_table}, batch.payload->'order') AS staged_order
+            RETURNING id
+        ), inserted_items AS (
+            INSERT INTO {OrderItem._meta.db_table} ({', '.join(item_columns)})
+            SELECT {', '.join(item_values)}
+            FROM batch
+            CROSS JOIN jsonb_populate_recordset(NULL::{OrderItem._meta.db_table}, batch.payload->'items') AS staged_item
+            LEFT JOIN {CustomizationOption._meta.db_table} AS option ON option.id = staged_item.customizations_id
+            RETURNING id
+        )
+        SELECT (SELECT count(*) FROM inserted_orders), (SELECT count(*) FROM inserted_items)
+    """
+
+
+def claim_staged_orders(cursor, batch_size):
+    cursor.execute(
+        f"SELECT id FROM {StagedOrder._meta.db_table} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED",
+        [batch_size]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def fail_staged_order(staged_order_id, error):
+    """Moves a staged order that cannot be flushed to `FailedStagedOrder`."""
+    staged = StagedOrder.objects.get(pk=staged_order_id)
+    FailedStagedOrder.objects.create(
+        order_id=staged.order_id,
+        restaurant_id=staged.restaurant_id,
+        payload=staged.payload,
+        error=str(error),
+        staged_at=staged.created_at,
+    )
+    staged.delete()
+
+
+def flush_staged_orders(batch_size=None):
+    """
+    Moves up to `batch_size` staged orders, oldest first, to the order
+    tables in one statement. Concurrent flushers skip each other's rows.
+
+    Should an order of the batch fail a constraint, e.g. because one of its
+    menu items was deleted since it was staged, the batch is flushed again
+    order by order, and the orders still failing are moved to
+    `FailedStagedOrder` instead of holding up the queue.
+
+    Returns the number of (orders, order items, failed orders) written.
+    """
+    batch_size = batch_size or get_ingestion_setting("BATCH_SIZE")
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Check foreign keys as each statement runs rather than on commit,
+        # so a failing order only rolls back its own savepoint
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        try:
+            with transaction.atomic():
+                cursor.execute(
+                    flush_staged_orders_sql(
+                        f"id IN (SELECT id FROM {StagedOrder._meta.db_table}"
+                        f" ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)"
+                    ),
+                    [batch_size]
+                )
+                return (*cursor.fetchone(), 0)
+        except IntegrityError:
+            logger.warning("Flushing a batch of staged orders failed, flushing them one by one")
+
+        orders = items = failed = 0
+        for staged_order_id in claim_staged_orders(cursor, batch_size):
+            try:
+                with transaction.atomic():
+                    cursor.execute(flush_staged_orders_sql("id = %s"), [staged_order_id])
+                    flushed_orders, flushed_items = cursor.fetchone()
+            except IntegrityError as e:
+                logger.exception("Staged order %s cannot be flushed", staged_order_id)
+                fail_staged_order(staged_order_id, e)
+                failed += 1
+            else:
+                orders += flushed_orders
+                items += flushed_items
+        return orders, items, failed
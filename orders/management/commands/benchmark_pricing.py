@@ -0,0 +1,56 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from orders.pricing import TAKEAWAY, price_cart
+from restaurants.models import Restaurant
+from restaurants.price_table import PriceTable
+from zapeat.std_utils import measure
+
+CART_SIZES = (1, 10, 50, 100, 250, 500)
+
+
+class Command(BaseCommand):
+    help = "Measures pricing carts of 1 to 500 lines with the order pricing engine"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument(
+            '--menu-items', type=int, default=1000,
+            help="Number of menu items of the synthetic menu"
+        )
+        parser.add_argument('--tax-rate', default='0.05')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        item_count = options['menu_items']
+        # Two customization options per menu item
+        price_table = PriceTable(
+            version=1,
+            item_prices={item_id: Decimal(rng.randrange(2000, 50000)) / 100 for item_id in range(item_count)},
+            option_prices={
+                option_id: (option_id // 2, Decimal(rng.randrange(0, 5000)) / 100)
+                for option_id in range(item_count * 2)
+            },
+        )
+        restaurant = Restaurant(base_parcel_charges=Decimal('10.00'), additional_parcel_charges=Decimal('2.50'))
+
+        self.stdout.write(f"Menu of {item_count} items, {options['iterations']} iterations")
+        for size in CART_SIZES:
+            lines = []
+            for _ in range(size):
+                item_id = rng.randrange(item_count)
+                lines.append({
+                    "menu_item_id": item_id,
+                    "customizations_id": item_id * 2 + rng.randrange(2) if rng.random() < 0.5 else None,
+                    "quantity": rng.randrange(1, 4),
+                })
+            result = measure(
+                lambda: price_cart(lines, price_table, restaurant, TAKEAWAY, options['tax_rate']),
+                options['iterations']
+            )
+            self.stdout.write(
+                f"{size:>4} lines: median {result['median']:.3f}ms, "
+                f"p95 {result['p95']:.3f}ms, max {result['max']:.3f}ms"
+            )
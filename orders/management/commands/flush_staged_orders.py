@@ -0,0 +1,47 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from orders.ingestion import flush_staged_orders, get_ingestion_setting
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Moves staged orders to the order tables in batches (see orders.ingestion)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=get_ingestion_setting("BATCH_SIZE"))
+        parser.add_argument(
+            '--poll-interval', type=float, default=0.2,
+            help="Seconds to wait before polling again when no orders are staged"
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once no orders are staged instead of polling forever"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    orders, items, failed = flush_staged_orders(options['batch_size'])
+                except Exception:
+                    if options['once']:
+                        raise
+                    # Keep flushing: the next batch may well go through
+                    logger.exception("Flushing staged orders failed")
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                if orders or failed:
+                    self.stdout.write(f"Flushed {orders} orders ({items} items), {failed} failed")
+                    continue
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
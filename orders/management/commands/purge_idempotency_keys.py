@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from orders.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Deletes idempotency keys older than ORDER_IDEMPOTENCY_TTL"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Number of keys deleted per statement"
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} idempotency keys"))
@@ -0,0 +1,34 @@
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_orderitem_created_at_orderitem_is_active_and_more'),
+        ('restaurants', '0023_restaurant_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Idempotency-Key header of the request', max_length=255)),
+                ('fingerprint', models.CharField(help_text='Digest of the request body', max_length=32)),
+                ('status_code', models.PositiveSmallIntegerField(help_text='Status code of the stored response')),
+                ('response', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Body of the stored response')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('customer', models.ForeignKey(help_text='The user who placed the order', on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL)),
+                ('restaurant', models.ForeignKey(help_text='Restaurant the order was placed with', on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to='restaurants.restaurant')),
+            ],
+            options={
+                'verbose_name': 'Idempotency Key',
+                'verbose_name_plural': 'Idempotency Keys',
+                'unique_together': {('restaurant', 'customer', 'key')},
+            },
+        ),
+    ]
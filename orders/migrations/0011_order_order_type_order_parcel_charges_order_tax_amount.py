@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='order_type',
+            field=models.CharField(choices=[('DINE_IN', 'Dine-in'), ('TAKEAWAY', 'Takeaway')], default='DINE_IN', help_text='Dine-in or takeaway, takeaway orders pay parcel charges', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='parcel_charges',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Parcel charges included in the total amount', max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Taxes included in the total amount', max_digits=10),
+        ),
+    ]
@@ -0,0 +1,31 @@
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_order_order_type_order_parcel_charges_order_tax_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StagedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(help_text='Id reserved for the order', unique=True)),
+                ('restaurant_id', models.BigIntegerField()),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Columns of the order and its items')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Staged Order',
+                'verbose_name_plural': 'Staged Orders',
+            },
+        ),
+        # Staged orders skip the write-ahead log, see orders.ingestion
+        migrations.RunSQL(
+            "ALTER TABLE orders_stagedorder SET UNLOGGED",
+            "ALTER TABLE orders_stagedorder SET LOGGED",
+        ),
+    ]
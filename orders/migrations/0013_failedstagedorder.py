@@ -0,0 +1,28 @@
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_stagedorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailedStagedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(help_text='Id reserved for the order', unique=True)),
+                ('restaurant_id', models.BigIntegerField()),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Columns of the order and its items')),
+                ('error', models.TextField()),
+                ('staged_at', models.DateTimeField()),
+                ('failed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Failed Staged Order',
+                'verbose_name_plural': 'Failed Staged Orders',
+            },
+        ),
+    ]
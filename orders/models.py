@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 from restaurants.base import BaseModel
@@ -28,6 +29,11 @@ class Order(models.Model):
         ('REJECTED', 'Rejected'),
     ]
 
+    ORDER_TYPE = [
+        ('DINE_IN', 'Dine-in'),
+        ('TAKEAWAY', 'Takeaway'),
+    ]
+
     # Link to User model
     customer = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -44,7 +50,25 @@ class Order(models.Model):
         help_text="Restaurant associated with the order"
     )
 
+    order_type = models.CharField(
+        max_length=10,
+        choices=ORDER_TYPE,
+        default='DINE_IN',
+        help_text="Dine-in or takeaway, takeaway orders pay parcel charges"
+    )
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Total amount for the order")
+    parcel_charges = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        help_text="Parcel charges included in the total amount"
+    )
+    tax_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        help_text="Taxes included in the total amount"
+    )
     payment_status = models.CharField(
         max_length=10,
         choices=PAYMENT_STATUS,
@@ -111,3 +135,74 @@ class OrderItem(BaseModel):
     class Meta:
         verbose_name = "Order Item"
         verbose_name_plural = "Order Items"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response of an order request sent with an `Idempotency-Key` header,
+    replayed to retries of that request (see `orders.idempotency`).
+    """
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        help_text="Restaurant the order was placed with"
+    )
+    customer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        help_text="The user who placed the order"
+    )
+    key = models.CharField(max_length=255, help_text="Idempotency-Key header of the request")
+    fingerprint = models.CharField(max_length=32, help_text="Digest of the request body")
+    status_code = models.PositiveSmallIntegerField(help_text="Status code of the stored response")
+    response = models.JSONField(encoder=DjangoJSONEncoder, help_text="Body of the stored response")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} - {self.restaurant_id}"
+
+    class Meta:
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+        unique_together = ['restaurant', 'customer', 'key']
+
+
+class StagedOrder(models.Model):
+    """
+    An order accepted in queued ingestion mode and not yet written to the
+    order tables, see `orders.ingestion`. The table is UNLOGGED.
+    """
+    order_id = models.BigIntegerField(unique=True, help_text="Id reserved for the order")
+    restaurant_id = models.BigIntegerField()
+    payload = models.JSONField(encoder=DjangoJSONEncoder, help_text="Columns of the order and its items")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Staged order #{self.order_id} - {self.restaurant_id}"
+
+    class Meta:
+        verbose_name = "Staged Order"
+        verbose_name_plural = "Staged Orders"
+
+
+class FailedStagedOrder(models.Model):
+    """
+    A staged order that could not be written to the order tables, e.g.
+    because one of its menu items was deleted before it was flushed. Kept,
+    unlike `StagedOrder`, in a logged table for someone to follow up.
+    """
+    order_id = models.BigIntegerField(unique=True, help_text="Id reserved for the order")
+    restaurant_id = models.BigIntegerField()
+    payload = models.JSONField(encoder=DjangoJSONEncoder, help_text="Columns of the order and its items")
+    error = models.TextField()
+    staged_at = models.DateTimeField()
+    failed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Failed staged order #{self.order_id} - {self.restaurant_id}"
+
+    class Meta:
+        verbose_name = "Failed Staged Order"
+        verbose_name_plural = "Failed Staged Orders"
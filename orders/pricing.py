@@ -0,0 +1,87 @@
+"""
+Order pricing.
+
+`price_cart` prices a cart (order lines of menu item ids, customization ids
+and quantities) against a restaurant's price table (see
+`restaurants.price_table`), without touching the database:
+
+    line total      (menu item price + customization price) x quantity
+    subtotal        sum of the line totals
+    parcel charges  TAKEAWAY orders only: `Restaurant.base_parcel_charges`,
+                    plus `additional_parcel_charges` for every unit beyond
+                    the first
+    tax             `ORDER_TAX_RATE` (default 0) of subtotal + parcel charges,
+                    rounded half up to the cent
+    total           subtotal + parcel charges + tax
+
+All amounts are Decimals, so totals are exact. Order placement and quotes
+price through this module only.
+"""
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+DINE_IN = 'DINE_IN'
+TAKEAWAY = 'TAKEAWAY'
+
+CENT = Decimal('0.01')
+
+Quote = namedtuple('Quote', ['line_totals', 'subtotal', 'parcel_charges', 'tax', 'total', 'errors'])
+
+
+def get_tax_rate():
+    return Decimal(str(getattr(settings, 'ORDER_TAX_RATE', 0)))
+
+
+def price_lines(lines, price_table):
+    """
+    Returns the total of every line, None for invalid ones, and the errors
+    of every line, empty for valid ones.
+    """
+    line_totals, errors = [], []
+    for line in lines:
+        menu_item_id, customization_id = line['menu_item_id'], line.get('customizations_id')
+        price = price_table.item_price(menu_item_id)
+        if price is None:
+            line_totals.append(None)
+            errors.append({"menu_item": [f"Menu item {menu_item_id} is not on this restaurant's menu."]})
+            continue
+        if customization_id is not None:
+            option_price = price_table.option_price(customization_id, menu_item_id)
+            if option_price is None:
+                line_totals.append(None)
+                errors.append({"customizations": [
+                    f"Customization {customization_id} is not available for menu item {menu_item_id}."
+                ]})
+                continue
+            price += option_price
+        line_totals.append(price * line.get('quantity', 1))
+        errors.append({})
+    return line_totals, errors
+
+
+def parcel_charges(lines, base_charges, additional_charges):
+    units = sum(line.get('quantity', 1) for line in lines)
+    if not units:
+        return Decimal(0)
+    return Decimal(base_charges) + Decimal(additional_charges) * (units - 1)
+
+
+def price_cart(lines, price_table, restaurant, order_type=DINE_IN, tax_rate=None):
+    """
+    Prices a cart for a restaurant. `lines` are dicts of `menu_item_id`,
+    `customizations_id` (optional) and `quantity` (default 1). When any line
+    is invalid, `errors` holds the errors of every line and amounts are None.
+    """
+    line_totals, errors = price_lines(lines, price_table)
+    if any(errors):
+        return Quote(line_totals, None, None, None, None, errors)
+
+    subtotal = sum(line_totals, Decimal(0))
+    charges = Decimal(0)
+    if order_type == TAKEAWAY:
+        charges = parcel_charges(lines, restaurant.base_parcel_charges, restaurant.additional_parcel_charges)
+    tax_rate = get_tax_rate() if tax_rate is None else Decimal(tax_rate)
+    tax = ((subtotal + charges) * tax_rate).quantize(CENT, rounding=ROUND_HALF_UP)
+    return Quote(line_totals, subtotal, charges, tax, subtotal + charges + tax, [])
@@ -1,35 +1,30 @@
+from django.db import transaction
 from rest_framework import serializers
 
-from restaurants.serializers import CustomizationOptionSerializer
+from orders.pricing import DINE_IN, price_cart
+from restaurants.menu_cache import lock_menu_version
+from restaurants.price_table import get_price_table
 from .models import Order, OrderItem
-from restaurants.models import CustomizationOption, MenuItem, Restaurant
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    customizations = serializers.PrimaryKeyRelatedField(queryset=CustomizationOption.objects.all())
+    # Plain ids, priced for every line at once by OrderSerializer.validate
+    menu_item = serializers.IntegerField(source='menu_item_id')
+    customizations = serializers.IntegerField(source='customizations_id', required=False, allow_null=True)
     price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     class Meta:
         model = OrderItem
         fields = ['uuid', 'menu_item', 'quantity', 'price', 'customizations']
 
-    def validate(self, attrs):
-        menu_item = attrs.get('menu_item')
-        quantity = attrs.get('quantity')
-        customizations = attrs.get('customizations')
-        
-        # Calculate base price from menu item and quantity
-        total_price = menu_item.price * quantity
-        
-        # Add customization price if any
-        if customizations:
-            total_price += customizations.price * quantity
-            
-        # Add calculated price to validated data
-        attrs['price'] = total_price
-        return attrs
-
 
 class OrderSerializer(serializers.ModelSerializer):
+    """
+    Places orders. The restaurant ordered from is expected in the serializer
+    context (`context={"restaurant": restaurant}`), every ordered menu item
+    must belong to it. Orders are priced by `orders.pricing` from the
+    restaurant's price table (see `restaurants.price_table`), never from the
+    menu tables directly.
+    """
     items = OrderItemSerializer(many=True, write_only=True)
     order_items = OrderItemSerializer(source='items', many=True, read_only=True)
     customer_name = serializers.ReadOnlyField(source="customer.mobile_number")
@@ -38,45 +33,75 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = [
-            'id', 'customer', 'customer_name', 'restaurant',
-            'total_amount', 'payment_status', 'order_status', 'restaurant_status',
+            'id', 'customer', 'customer_name', 'restaurant', 'order_type',
+            'total_amount', 'parcel_charges', 'tax_amount', 'payment_status', 'order_status', 'restaurant_status',
             'special_instructions', 'created_at', 'updated_at', 'items', 'order_items'
         ]
-        read_only_fields = ['id', 'customer', 'created_at', 'updated_at', 'price']
+        read_only_fields = [
+            'id', 'customer', 'total_amount', 'parcel_charges', 'tax_amount', 'created_at', 'updated_at', 'price'
+        ]
+
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("An order needs at least one item.")
+        return items
+
+    def validate_order_type(self, order_type):
+        services = self.context['restaurant'].services
+        if services and order_type not in services:
+            raise serializers.ValidationError(f"The restaurant does not offer {order_type} orders.")
+        return order_type
+
+    def price_order(self, attrs, price_table):
+        """Prices an order with the pricing engine, raising the errors of every line."""
+        quote = price_cart(
+            attrs['items'], price_table, self.context['restaurant'], attrs.get('order_type', DINE_IN)
+        )
+        if quote.errors:
+            raise serializers.ValidationError({"items": quote.errors})
+        return quote
+
+    def validate(self, attrs):
+        """Checks and prices the lines against the menu, from its cached price table."""
+        restaurant = self.context['restaurant']
+        price_table = get_price_table(restaurant.pk, restaurant.menu_version)
+        attrs['quote'] = self.price_order(attrs, price_table)
+        attrs['menu_version'] = price_table.version
+        return attrs
+
+    def prepare(self, validated_data):
+        """
+        Returns the unsaved order and order items of validated data. Call
+        inside the transaction saving them: it keeps menu writers out until
+        the order is written, and reprices the order if the menu changed
+        since it was validated.
+        """
+        validated_data = dict(validated_data)
+        priced_version = validated_data.pop('menu_version')
+        quote = validated_data.pop('quote')
+        restaurant_id = self.context['restaurant'].pk
+        version = lock_menu_version(restaurant_id)
+        if version != priced_version:
+            quote = self.price_order(validated_data, get_price_table(restaurant_id, version))
 
-    def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        total_order_price = 0
-
-        for item_data in items_data:
-            #TODO: fix price calculation
-            item_price = 0
-            customizations = item_data.pop('customizations', None)
-            menu_item = item_data['menu_item']
-            quantity = item_data['quantity']
-            # Calculate item price
-            item_price = menu_item.price * quantity
-
-            # Add customization price if any
-            if customizations:
-                item_price += customizations.price * quantity
-
-            # Add to total order price
-            total_order_price += item_price
-
-            # Create order item
-            item_data.pop('price', None)  # Remove price if exists
-            OrderItem.objects.create(
-                order=order,
-                customizations=customizations,
-                price=item_price,
-                **item_data
+        order = Order(
+            total_amount=quote.total,
+            parcel_charges=quote.parcel_charges,
+            tax_amount=quote.tax,
+            **validated_data
         )
+        items = [
+            OrderItem(order=order, price=line_total, **item_data)
+            for item_data, line_total in zip(items_data, quote.line_totals)
+        ]
+        return order, items
 
-        # Update order with total amount
-        order.total_amount = total_order_price
-        order.save()
+    def create(self, validated_data):
+        with transaction.atomic():
+            order, items = self.prepare(validated_data)
+            order.save()
+            OrderItem.objects.bulk_create(items)
         return order
 
     # def create(self, validated_data):
@@ -98,3 +123,15 @@ class OrderSerializer(serializers.ModelSerializer):
     #     order.total_amount = total_price
     #     import pdb; pdb.set_trace()
     #     return order
+
+
+class AcceptedOrderSerializer(serializers.ModelSerializer):
+    """An order accepted for write-behind ingestion, see `orders.ingestion`."""
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'restaurant', 'order_type', 'total_amount', 'parcel_charges', 'tax_amount',
+            'order_status', 'created_at'
+        ]
+        read_only_fields = fields
@@ -1,3 +1,267 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.models import Customer
+from orders.idempotency import purge_expired_keys
+from orders.ingestion import flush_staged_orders
+from orders.models import FailedStagedOrder, IdempotencyKey, Order, StagedOrder
+from orders.pricing import DINE_IN, TAKEAWAY, price_cart
+from orders.serializers import OrderSerializer
+from restaurants.menu_cache import bump_menu_version
+from restaurants.models import CustomizationOption, MenuItem, Restaurant
+from restaurants.price_table import PriceTable, price_table_cache
+from restaurants.tests import create_menu, create_restaurant
+
+
+class PricingTests(SimpleTestCase):
+    price_table = PriceTable(
+        version=1,
+        item_prices={1: Decimal("100.00"), 2: Decimal("49.99")},
+        option_prices={7: (1, Decimal("10.00"))},
+    )
+    restaurant = Restaurant(base_parcel_charges=Decimal("10.00"), additional_parcel_charges=Decimal("2.50"))
+    lines = [
+        {"menu_item_id": 1, "customizations_id": 7, "quantity": 2},
+        {"menu_item_id": 2},
+    ]
+
+    def test_dine_in(self):
+        quote = price_cart(self.lines, self.price_table, self.restaurant, DINE_IN, tax_rate=0)
+        self.assertEqual(quote.line_totals, [Decimal("220.00"), Decimal("49.99")])
+        self.assertEqual((quote.parcel_charges, quote.tax, quote.total), (0, 0, Decimal("269.99")))
+
+    def test_takeaway_parcel_charges_and_tax(self):
+        quote = price_cart(self.lines, self.price_table, self.restaurant, TAKEAWAY, tax_rate="0.05")
+        # 10.00 for the first unit, 2.50 for each of the two others
+        self.assertEqual(quote.parcel_charges, Decimal("15.00"))
+        # 5% of 284.99, rounded half up
+        self.assertEqual(quote.tax, Decimal("14.25"))
+        self.assertEqual(quote.total, Decimal("299.24"))
+
+    def test_invalid_lines(self):
+        quote = price_cart(
+            [{"menu_item_id": 3}, {"menu_item_id": 2, "customizations_id": 7}, {"menu_item_id": 1}],
+            self.price_table, self.restaurant
+        )
+        self.assertIsNone(quote.total)
+        self.assertEqual([set(errors) for errors in quote.errors], [{"menu_item"}, {"customizations"}, set()])
+
+
+class OrderSerializerTests(TestCase):
+
+    def setUp(self):
+        price_table_cache.clear()
+        self.customer = Customer.objects.create(mobile_number="+919000000001", name="Customer")
+        self.restaurant = create_restaurant(1)
+        create_menu(self.restaurant, categories=2, items_per_category=10)
+        self.items = list(MenuItem.objects.filter(category__restaurant=self.restaurant))
+
+    def place_order(self, lines, restaurant=None, **fields):
+        serializer = OrderSerializer(
+            data={"items": lines, **fields},
+            context={"restaurant": restaurant or self.restaurant}
+        )
+        if not serializer.is_valid():
+            return None, serializer.errors
+        return serializer.save(customer=self.customer, restaurant=restaurant or self.restaurant), None
+
+    def test_order_total_and_items(self):
+        item = self.items[0]
+        option = CustomizationOption.objects.filter(group__menu_item=item).first()
+        order, errors = self.place_order([
+            {"menu_item": item.id, "quantity": 2, "customizations": option.id},
+            {"menu_item": self.items[1].id},
+        ])
+        self.assertIsNone(errors)
+
+        # (100 + 10) * 2 + 100
+        self.assertEqual(Order.objects.get(pk=order.pk).total_amount, Decimal("320.00"))
+        self.assertEqual(
+            sorted(order.items.values_list('price', flat=True)), [Decimal("100.00"), Decimal("220.00")]
+        )
+
+    @override_settings(ORDER_TAX_RATE="0.05")
+    def test_takeaway_order(self):
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(
+            base_parcel_charges="10.00", additional_parcel_charges="2.00", services=["DINE_IN", "TAKEAWAY"]
+        )
+        self.restaurant.refresh_from_db()
+        serializer = OrderSerializer(
+            data={"order_type": "TAKEAWAY", "items": [{"menu_item": self.items[0].id, "quantity": 2}]},
+            context={"restaurant": self.restaurant}
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        order = serializer.save(customer=self.customer, restaurant=self.restaurant)
+
+        # 200.00 + 12.00 parcel charges + 5% tax
+        self.assertEqual((order.parcel_charges, order.tax_amount, order.total_amount), (
+            Decimal("12.00"), Decimal("10.60"), Decimal("222.60")
+        ))
+
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(services=["DINE_IN"])
+        self.restaurant.refresh_from_db()
+        order, errors = self.place_order([{"menu_item": self.items[0].id}], order_type="TAKEAWAY")
+        self.assertIn("order_type", errors)
+
+    def test_queries_do_not_grow_with_lines(self):
+        options = dict(CustomizationOption.objects.values_list('group__menu_item_id', 'id'))
+        query_counts = []
+        for line_count in (1, 2, 20):
+            lines = [
+                {"menu_item": item.id, "quantity": 2, "customizations": options[item.id]}
+                for item in self.items[:line_count]
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                order, errors = self.place_order(lines)
+            self.assertIsNone(errors)
+            self.assertEqual(order.items.count(), line_count)
+            query_counts.append(len(queries))
+        # The first order loads the price table
+        self.assertEqual(query_counts[1], query_counts[2])
+
+    def test_orders_are_priced_from_the_price_table(self):
+        self.place_order([{"menu_item": self.items[0].id}])
+        with CaptureQueriesContext(connection) as queries:
+            order, errors = self.place_order([{"menu_item": self.items[1].id, "quantity": 3}])
+        self.assertEqual(order.total_amount, Decimal("300.00"))
+        self.assertFalse([query for query in queries if "restaurants_menuitem" in query["sql"]])
+
+    def test_menu_changes_after_validation_are_repriced(self):
+        item = self.items[0]
+        serializer = OrderSerializer(data={"items": [{"menu_item": item.id}]}, context={"restaurant": self.restaurant})
+        self.assertTrue(serializer.is_valid())
+
+        MenuItem.objects.filter(pk=item.pk).update(price="150.00")
+        bump_menu_version(self.restaurant.pk)
+        order = serializer.save(customer=self.customer, restaurant=self.restaurant)
+        self.assertEqual(order.total_amount, Decimal("150.00"))
+
+    def test_items_must_belong_to_the_restaurant(self):
+        other_restaurant = create_restaurant(2)
+        create_menu(other_restaurant, categories=1, items_per_category=1)
+        other_item = MenuItem.objects.get(category__restaurant=other_restaurant)
+        other_option = CustomizationOption.objects.filter(group__menu_item=other_item).first()
+
+        order, errors = self.place_order([
+            {"menu_item": self.items[0].id},
+            {"menu_item": other_item.id},
+            {"menu_item": self.items[1].id, "customizations": other_option.id},
+        ])
+        self.assertIsNone(order)
+        self.assertEqual(errors["items"][0], {})
+        self.assertIn("menu_item", errors["items"][1])
+        self.assertIn("customizations", errors["items"][2])
+        self.assertFalse(Order.objects.exists())
+
+
+class IdempotentOrderTests(TestCase):
+
+    def setUp(self):
+        price_table_cache.clear()
+        # RestaurantOrderView places every order as customer 2
+        Customer.objects.create(id=2, mobile_number="+919000000002", name="Customer")
+        self.restaurant = create_restaurant(1)
+        create_menu(self.restaurant, categories=1, items_per_category=2)
+        self.item = MenuItem.objects.filter(category__restaurant=self.restaurant).first()
+        self.url = reverse('order-detail', kwargs={'restaurant_id': self.restaurant.pk})
+
+    def post_order(self, quantity=1, **headers):
+        return self.client.post(
+            self.url,
+            {"items": [{"menu_item": self.item.id, "quantity": quantity}]},
+            content_type='application/json',
+            headers=headers
+        )
+
+    def test_retries_replay_the_first_response(self):
+        first = self.post_order(**{"Idempotency-Key": "order-1"})
+        self.assertEqual(first.status_code, 200)
+
+        retry = self.post_order(**{"Idempotency-Key": "order-1"})
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.post_order(**{"Idempotency-Key": "order-2"})
+        self.post_order()
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.post_order(**{"Idempotency-Key": "order-1"})
+        response = self.post_order(quantity=2, **{"Idempotency-Key": "order-1"})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_keys_are_purged_and_reusable(self):
+        self.post_order(**{"Idempotency-Key": "order-1"})
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(purge_expired_keys(), 1)
+        self.post_order(**{"Idempotency-Key": "order-1"})
+        self.assertEqual(Order.objects.count(), 2)
+
+
+@override_settings(ORDER_INGESTION={"MODE": "queued", "MAX_QUEUE_DEPTH": 2, "RETRY_AFTER": 3})
+class QueuedOrderIngestionTests(TestCase):
+
+    def setUp(self):
+        price_table_cache.clear()
+        # RestaurantOrderView places every order as customer 2
+        Customer.objects.create(id=2, mobile_number="+919000000002", name="Customer")
+        self.restaurant = create_restaurant(1)
+        create_menu(self.restaurant, categories=1, items_per_category=2)
+        self.items = list(MenuItem.objects.filter(category__restaurant=self.restaurant))
+        self.url = reverse('order-detail', kwargs={'restaurant_id': self.restaurant.pk})
+
+    def post_order(self, lines):
+        return self.client.post(self.url, {"items": lines}, content_type='application/json')
+
+    def test_staged_orders_are_flushed_with_their_reserved_ids(self):
+        response = self.post_order([
+            {"menu_item": self.items[0].id, "quantity": 2},
+            {"menu_item": self.items[1].id},
+        ])
+        self.assertEqual(response.status_code, 202)
+        order_id = response.json()["data"]["id"]
+        self.assertEqual(response.json()["data"]["total_amount"], "300.00")
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(StagedOrder.objects.filter(order_id=order_id).exists())
+
+        self.assertEqual(flush_staged_orders(), (1, 2, 0))
+        order = Order.objects.get(pk=order_id)
+        self.assertEqual(order.total_amount, Decimal("300.00"))
+        self.assertEqual(
+            sorted(order.items.values_list('price', flat=True)), [Decimal("100.00"), Decimal("200.00")]
+        )
+        self.assertFalse(StagedOrder.objects.exists())
+        self.assertEqual(flush_staged_orders(), (0, 0, 0))
+
+    def test_orders_of_deleted_menu_items_do_not_hold_up_the_queue(self):
+        option = CustomizationOption.objects.filter(group__menu_item=self.items[0]).first()
+        customized = self.post_order([{"menu_item": self.items[0].id, "customizations": option.id}]).json()["data"]
+        removed = self.post_order([{"menu_item": self.items[1].id}]).json()["data"]
+        option.delete()
+        self.items[1].delete()
+
+        self.assertEqual(flush_staged_orders(), (1, 1, 1))
+        self.assertIsNone(Order.objects.get(pk=customized["id"]).items.get().customizations_id)
+        self.assertEqual(FailedStagedOrder.objects.get().order_id, removed["id"])
+        self.assertFalse(StagedOrder.objects.exists())
+
+    def test_full_queue_is_refused(self):
+        for _ in range(2):
+            self.assertEqual(self.post_order([{"menu_item": self.items[0].id}]).status_code, 202)
+
+        response = self.post_order([{"menu_item": self.items[0].id}])
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(StagedOrder.objects.count(), 2)
+
+        flush_staged_orders()
+        self.assertEqual(self.post_order([{"menu_item": self.items[0].id}]).status_code, 202)
@@ -1,9 +1,21 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from authentication.models import Customer
+from orders.idempotency import (
+    IDEMPOTENCY_HEADER,
+    MAX_KEY_LENGTH,
+    get_stored_response,
+    lock_idempotency_key,
+    request_fingerprint,
+    store_response,
+)
+from orders.ingestion import get_ingestion_setting, is_queued_mode, queue_is_full, stage_order
 from orders.models import Order
-from orders.serializers import OrderSerializer
+from orders.serializers import AcceptedOrderSerializer, OrderSerializer
 from restaurants.models import Restaurant
 from zapeat.std_utils import CustomAPIModule, StandardResultsSetPagination
+from rest_framework import status
+from rest_framework.response import Response
 from rest_framework.views import APIView
 
 
@@ -29,16 +41,73 @@ class RestaurantOrderView(APIView, CustomAPIModule):
 
     def post(self, request, *args, **kwargs):
         """
-        Create a new order for a given restaurant
+        Create a new order for a given restaurant. Requests sent with an
+        `Idempotency-Key` header are placed once, retries get the first response back.
         """
         restaurant = self.get_restaurant()
-        serializer = OrderSerializer(data=request.data)
         user_dummy = Customer.objects.get(id=2) #TODO: Make user dynamic
         self.request.user = user_dummy
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return self.create_order(request, restaurant)
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            return self.validation_error_response(
+                errors={"idempotency_key": [f"Must be 1 to {MAX_KEY_LENGTH} characters long."]},
+                message="Invalid Idempotency-Key"
+            )
+
+        fingerprint = request_fingerprint(request.data)
+        with transaction.atomic():
+            # Waits for a concurrent request with the same key to finish
+            lock_idempotency_key(restaurant.id, self.request.user.id, key)
+            stored = get_stored_response(restaurant.id, self.request.user.id, key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    return self.validation_error_response(
+                        errors={"idempotency_key": ["Already used for a different request."]},
+                        message="Invalid Idempotency-Key"
+                    )
+                response = Response(stored.response, status=stored.status_code)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+
+            response = self.create_order(request, restaurant)
+            if status.is_success(response.status_code):
+                store_response(restaurant.id, self.request.user.id, key, fingerprint, response)
+            return response
+
+    def create_order(self, request, restaurant):
+        if is_queued_mode():
+            return self.stage_order(request, restaurant)
+        serializer = OrderSerializer(data=request.data, context={'restaurant': restaurant})
         serializer.is_valid(raise_exception=True)
         serializer.save(customer=self.request.user, restaurant=restaurant)
         return self.success_response(data=serializer.data, message="Order created successfully")
 
+    def stage_order(self, request, restaurant):
+        """
+        Accepts an order for write-behind ingestion (see `orders.ingestion`),
+        or refuses it while the ingestion queue is full.
+        """
+        if queue_is_full():
+            response = self.error_response(
+                message="Too many orders, please retry shortly",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = str(get_ingestion_setting("RETRY_AFTER"))
+            return response
+
+        serializer = OrderSerializer(data=request.data, context={'restaurant': restaurant})
+        serializer.is_valid(raise_exception=True)
+        order = stage_order(serializer, customer=self.request.user, restaurant=restaurant)
+        return self.success_response(
+            data=AcceptedOrderSerializer(order).data,
+            message="Order accepted",
+            status_code=status.HTTP_202_ACCEPTED
+        )
+
+
 class DashboardOrdersView(APIView, CustomAPIModule):
     model = Order
     serializer_class = OrderSerializer
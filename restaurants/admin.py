@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import (
     OpeningTime,
     BankAccount,
@@ -8,54 +9,138 @@ from .models import (
     MenuItem,
     CustomizationGroup,
     CustomizationOption,
+    MenuSnapshot,
+    MenuTombstone,
+    MenuImportJob,
+    Cuisine,
 )
+from .menu_cache import menu_restaurant_ids
+from .menu_changes import menu_rows_deleting, menu_rows_saved
+
+
+class MenuVersionAdminMixin:
+    """
+    Records every admin write to menu rows: bumps the menu version of the
+    affected restaurants, tracks the change for menu sync and rebuilds their
+    menu snapshots. Admin changes already run inside a transaction, which all
+    of this joins.
+    """
+
+    def save_model(self, request, obj, form, change):
+        # An edit may move the row to another restaurant
+        previous_restaurant_ids = menu_restaurant_ids(self.model, [obj.pk]) if change else set()
+        super().save_model(request, obj, form, change)
+        menu_rows_saved(self.model, [obj.pk], previous_restaurant_ids)
+
+    def delete_model(self, request, obj):
+        menu_rows_deleting(self.model, [obj.pk])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        menu_rows_deleting(self.model, list(queryset.values_list('pk', flat=True)))
+        super().delete_queryset(request, queryset)
+
+
+class TouchRestaurantsAdminMixin:
+    """
+    Restaurant details embed their location, opening times and bank accounts.
+    Bumps `updated_at` of the restaurants using a row edited on its own, as the
+    detail ETag is derived from it.
+    """
+    restaurant_lookup = None
+
+    def touch_restaurants(self, pks):
+        Restaurant.objects.filter(**{f"{self.restaurant_lookup}__in": list(pks)}).update(
+            updated_at=timezone.now()
+        )
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.touch_restaurants([obj.pk])
+
+    def delete_model(self, request, obj):
+        self.touch_restaurants([obj.pk])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        self.touch_restaurants(queryset.values_list('pk', flat=True))
+        super().delete_queryset(request, queryset)
 
 @admin.register(OpeningTime)
-class OpeningTimeAdmin(admin.ModelAdmin):
+class OpeningTimeAdmin(TouchRestaurantsAdminMixin, admin.ModelAdmin):
+    restaurant_lookup = 'opening_times'
     list_display = ('weekday', 'from_hour', 'to_hour')
     ordering = ['weekday']
 
 @admin.register(BankAccount)
-class BankAccountAdmin(admin.ModelAdmin):
+class BankAccountAdmin(TouchRestaurantsAdminMixin, admin.ModelAdmin):
+    restaurant_lookup = 'bank_accounts'
     list_display = ('account_name', 'account_number', 'bank_name', 'ifsc_code')
     search_fields = ('account_name', 'account_number', 'ifsc_code')
     list_filter = ('bank_name',)
     ordering = ['created_at']
 
 @admin.register(Location)
-class LocationAdmin(admin.ModelAdmin):
+class LocationAdmin(TouchRestaurantsAdminMixin, admin.ModelAdmin):
+    restaurant_lookup = 'location'
     list_display = ('latitude', 'longitude')
     search_fields = ('latitude', 'longitude')
 
 @admin.register(Restaurant)
 class RestaurantAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'mobile_number', 'email', 'is_online')
-    search_fields = ('name', 'phone_number', 'email')
+    search_fields = ('name', 'mobile_number', 'email')
     list_filter = ('category', 'is_online')
     ordering = ['-created_at']
     filter_horizontal = ('opening_times', 'bank_accounts')  # For many-to-many fields
 
 @admin.register(MenuCategory)
-class MenuCategoryAdmin(admin.ModelAdmin):
+class MenuCategoryAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'restaurant')
     search_fields = ('name',)
     list_filter = ('restaurant',)
 
 @admin.register(MenuItem)
-class MenuItemAdmin(admin.ModelAdmin):
+class MenuItemAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'food_type', 'customizable', 'spice_level', 'sweetness_level', 'must_try')
     search_fields = ('name',)
     list_filter = ('food_type', 'customizable')
     ordering = ['name']
 
 @admin.register(CustomizationGroup)
-class CustomizationGroupAdmin(admin.ModelAdmin):
+class CustomizationGroupAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'menu_item', 'max_options_allowed', 'min_options_allowed')
     search_fields = ('name',)
     list_filter = ('menu_item',)
 
 @admin.register(CustomizationOption)
-class CustomizationOptionAdmin(admin.ModelAdmin):
+class CustomizationOptionAdmin(MenuVersionAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'group', 'price', 'food_type', 'spice_level', 'sweetness_level')
     search_fields = ('name',)
     list_filter = ('food_type', 'group')
+
+
+@admin.register(MenuSnapshot)
+class MenuSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('restaurant', 'version', 'updated_at')
+    readonly_fields = ('restaurant', 'version', 'etag', 'updated_at')
+    exclude = ('payload',)
+
+
+@admin.register(MenuTombstone)
+class MenuTombstoneAdmin(admin.ModelAdmin):
+    list_display = ('restaurant', 'kind', 'object_id', 'change_seq')
+    list_filter = ('kind',)
+
+
+@admin.register(MenuImportJob)
+class MenuImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'restaurant', 'status', 'processed_categories', 'total_categories', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    exclude = ('payload',)
+
+
+@admin.register(Cuisine)
+class CuisineAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    search_fields = ('name', 'slug')
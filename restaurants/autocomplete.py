@@ -0,0 +1,79 @@
+"""
+Restaurant name autocomplete.
+
+`Restaurant.name` and `Restaurant.address` carry trigram GIN indexes on their
+upper cased value (`pg_trgm`). Upper casing matches the expression Django
+compiles case insensitive lookups to, so the same indexes also serve
+`icontains`/`istartswith` filters, such as the admin search.
+
+Queries of `MIN_SIMILARITY_LENGTH` characters or more match names, or
+address localities, by trigram word similarity, which tolerates typos and
+matches any word of a name: "biry" and "paradse" both find "Paradise
+Biryani". Shorter queries hold too few trigrams for
+similarity to mean anything and match name prefixes instead. Short prefixes
+are also the most common and the most expensive queries of a type-ahead,
+so their results are kept in a small in-process cache for `CACHE_TIMEOUT`
+seconds.
+"""
+import time
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Upper
+
+from restaurants.models import Restaurant
+from zapeat.std_utils import LRUCache
+
+DEFAULT_AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 20
+
+MIN_SIMILARITY_LENGTH = 3
+
+# Queries this short or shorter are cached
+CACHED_PREFIX_LENGTH = 3
+CACHE_TIMEOUT = 60
+
+AUTOCOMPLETE_FIELDS = ('id', 'name', 'logo_url')
+
+prefix_cache = LRUCache(max_entries=2048)
+
+
+def normalize_query(text):
+    return ' '.join(text.split()).upper()
+
+
+def match_restaurants(query, limit):
+    """Restaurants matching a query normalized with `normalize_query`, best matches first."""
+    if len(query) < MIN_SIMILARITY_LENGTH:
+        restaurants = Restaurant.objects.filter(name__istartswith=query).order_by('name', 'id')
+    else:
+        restaurants = Restaurant.objects.alias(
+            upper_name=Upper('name'),
+            upper_address=Upper('address'),
+        ).filter(
+            Q(upper_name__trigram_word_similar=query) | Q(upper_address__trigram_word_similar=query)
+        ).annotate(
+            name_similarity=TrigramWordSimilarity(query, 'upper_name'),
+            address_similarity=TrigramWordSimilarity(query, 'upper_address'),
+        ).order_by('-name_similarity', '-address_similarity', 'id')
+    return list(restaurants.values(*AUTOCOMPLETE_FIELDS)[:limit])
+
+
+def autocomplete_restaurants(text, limit=DEFAULT_AUTOCOMPLETE_LIMIT):
+    """
+    Returns up to `limit` restaurants matching the text typed so far, as
+    dicts of `AUTOCOMPLETE_FIELDS`.
+    """
+    query = normalize_query(text)
+    if not query:
+        return []
+    if len(query) > CACHED_PREFIX_LENGTH:
+        return match_restaurants(query, limit)
+
+    key = (query, limit)
+    cached = prefix_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    restaurants = match_restaurants(query, limit)
+    prefix_cache.set(key, (time.monotonic() + CACHE_TIMEOUT, restaurants))
+    return restaurants
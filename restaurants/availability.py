@@ -0,0 +1,104 @@
+"""
+Menu item availability index.
+
+`MenuItem.availability_times` restricts when an item can be ordered. Instead
+of joining the availabilities of every item on each request, the windows of
+all items of a restaurant are compiled once into per-item `IntervalSet`s and
+kept in an in-process LRU against the restaurant's menu version, so an
+index is only rebuilt after the restaurant's menu changed.
+
+Only writes calling `restaurants.menu_cache.bump_menu_version` change that
+version: the menu endpoints, menu imports, and the menu serializers and
+admin through `restaurants.menu_changes`. Other writes, such as edits of an
+`ItemAvailability` itself or `QuerySet` updates, leave cached indexes stale
+until the next bump and must call `bump_menu_version` themselves.
+
+Filtered menus are rendered from the menu document once per set of hidden
+items and kept in a second LRU, so the requests of every minute between two
+availability boundaries share one rendition and never parse the menu.
+"""
+import json
+from collections import defaultdict
+
+from restaurants.menu_cache import render_menu_document
+from restaurants.models import MenuItem
+from restaurants.schedules import IntervalSet
+from zapeat.std_utils import LRUCache
+
+index_cache = LRUCache(max_entries=512)
+filtered_menu_cache = LRUCache(max_entries=512)
+
+
+class AvailabilityIndex:
+    """Availability windows of the items of one restaurant."""
+
+    def __init__(self, item_windows):
+        self.item_windows = item_windows
+
+    def is_available(self, item_id, minute):
+        """Items without availability windows are always available."""
+        windows = self.item_windows.get(item_id)
+        return windows is None or minute in windows
+
+    def unavailable_items(self, minute):
+        """Ids of the items not available at `minute` of the week."""
+        return frozenset(
+            item_id for item_id, windows in self.item_windows.items() if minute not in windows
+        )
+
+
+def build_availability_index(restaurant_id):
+    windows_by_item = defaultdict(list)
+    rows = MenuItem.availability_times.through.objects.filter(
+        menuitem__category__restaurant_id=restaurant_id
+    ).values_list(
+        'menuitem_id',
+        'itemavailability__weekday',
+        'itemavailability__from_hour',
+        'itemavailability__to_hour'
+    )
+    for item_id, weekday, from_hour, to_hour in rows:
+        windows_by_item[item_id].append((weekday, from_hour, to_hour))
+
+    return AvailabilityIndex({
+        item_id: IntervalSet.from_windows(windows)
+        for item_id, windows in windows_by_item.items()
+    })
+
+
+def get_availability_index(restaurant_id, menu_version):
+    cached = index_cache.get(restaurant_id)
+    if cached is not None and cached[0] == menu_version:
+        return cached[1]
+
+    index = build_availability_index(restaurant_id)
+    index_cache.set(restaurant_id, (menu_version, index))
+    return index
+
+
+def filter_available_items(menu, index, minute):
+    """
+    Filters a serialized menu down to the items available at `minute` of the
+    week, dropping categories left without items.
+    """
+    filtered = []
+    for category in menu:
+        items = [item for item in category["menu_items"] if index.is_available(item["id"], minute)]
+        if items:
+            filtered.append({**category, "menu_items": items})
+    return filtered
+
+
+def get_available_menu_payload(restaurant, document, minute):
+    """
+    Returns the rendered menu `document` of a restaurant filtered down to
+    the items available at `minute` of the week.
+    """
+    index = get_availability_index(restaurant.pk, document.version)
+    key = (restaurant.pk, document.etag, index.unavailable_items(minute))
+    payload = filtered_menu_cache.get(key)
+    if payload is None:
+        menu = filter_available_items(json.loads(document.payload)["data"]["menu"], index, minute)
+        payload = render_menu_document(restaurant, document.version, menu).payload
+        filtered_menu_cache.set(key, payload)
+    return payload
@@ -0,0 +1,86 @@
+"""
+Normalized restaurant cuisines.
+
+`Restaurant.cuisines` stays the comma separated text restaurants are edited
+with, and is mirrored into `Cuisine` rows linked through
+`RestaurantCuisine`. Cuisines are identified by the slug of their name, so
+"South Indian", "south indian" and " South-Indian " are one cuisine.
+
+Links are rebuilt by `restaurants.signals` whenever a restaurant save
+changes its `cuisines`. Writes through `QuerySet.update` bypass signals
+and must call `sync_restaurant_cuisines` themselves.
+
+Cuisine filters resolve slugs to ids once, then answer from the
+(cuisine, restaurant) index of the link table instead of scanning the text.
+"""
+from django.db.models import Count
+from django.utils.text import slugify
+
+from restaurants.models import Cuisine, RestaurantCuisine
+
+
+def parse_cuisines(values):
+    """
+    Parses comma separated cuisine names, from one string or a list of them,
+    into a dict of display name by slug, in order and without duplicates.
+    """
+    if isinstance(values, str):
+        values = [values]
+    cuisines = {}
+    for value in values:
+        for name in (value or '').split(','):
+            name = ' '.join(name.split())
+            slug = slugify(name, allow_unicode=True)
+            if slug:
+                cuisines.setdefault(slug, name)
+    return cuisines
+
+
+def get_or_create_cuisines(cuisines):
+    """
+    Returns the ids by slug of cuisines parsed with `parse_cuisines`,
+    creating the missing ones, in two queries.
+    """
+    if not cuisines:
+        return {}
+    Cuisine.objects.bulk_create(
+        [Cuisine(slug=slug, name=name) for slug, name in cuisines.items()],
+        ignore_conflicts=True
+    )
+    return dict(Cuisine.objects.filter(slug__in=cuisines).values_list('slug', 'id'))
+
+
+def sync_restaurant_cuisines(restaurant_id, text):
+    """
+    Links a restaurant to the cuisines of its `cuisines` text, writing only
+    the links that changed.
+    """
+    cuisine_ids = set(get_or_create_cuisines(parse_cuisines(text)).values())
+    links = RestaurantCuisine.objects.filter(restaurant_id=restaurant_id)
+    current_ids = set(links.values_list('cuisine_id', flat=True))
+
+    if current_ids - cuisine_ids:
+        links.filter(cuisine_id__in=current_ids - cuisine_ids).delete()
+    RestaurantCuisine.objects.bulk_create(
+        [RestaurantCuisine(restaurant_id=restaurant_id, cuisine_id=cuisine_id)
+         for cuisine_id in cuisine_ids - current_ids],
+        ignore_conflicts=True
+    )
+
+
+def filter_by_cuisines(restaurants, cuisines, match_all=False):
+    """
+    Narrows restaurants down to those serving any (or, with `match_all`,
+    every) cuisine of a list parsed with `parse_cuisines`. Unknown cuisines
+    match nothing.
+    """
+    cuisine_ids = list(Cuisine.objects.filter(slug__in=cuisines).values_list('id', flat=True))
+    if not cuisine_ids or (match_all and len(cuisine_ids) < len(cuisines)):
+        return restaurants.none()
+
+    links = RestaurantCuisine.objects.filter(cuisine_id__in=cuisine_ids)
+    if match_all and len(cuisine_ids) > 1:
+        links = links.values('restaurant_id').annotate(
+            matches=Count('cuisine_id')
+        ).filter(matches=len(cuisine_ids))
+    return restaurants.filter(pk__in=links.values('restaurant_id'))
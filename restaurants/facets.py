@@ -0,0 +1,103 @@
+"""
+Facet counts of restaurant searches.
+
+Discovery screens show, next to the restaurants matching their filters, how
+many of them fall in each `category`, `service_style`, service and cuisine.
+All four are counted by one statement: the filtered restaurant ids are
+computed once in a CTE and each facet is a GROUP BY over them, glued together
+with UNION ALL. Services are an array and are unnested, cuisines come from
+the `RestaurantCuisine` link table.
+
+Counts are cached per filter combination for a short while
+(`RESTAURANT_FACETS["TIMEOUT"]`). They are not invalidated on writes, as
+slightly stale counts are fine for browsing and a busy filter combination is
+recomputed at most once per timeout.
+
+Settings (all optional):
+    RESTAURANT_FACETS = {
+        "CACHE_ALIAS": "default",
+        "TIMEOUT": 60,
+    }
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+
+FACETS = ('category', 'service_style', 'services', 'cuisine')
+
+DEFAULT_RESTAURANT_FACETS = {
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": 60,
+}
+
+FACET_COUNTS_SQL = """
+    WITH matches AS ({matches})
+    SELECT 'category', restaurant.category, count(*)
+    FROM restaurants_restaurant AS restaurant
+    JOIN matches ON matches.id = restaurant.id
+    GROUP BY restaurant.category
+    UNION ALL
+    SELECT 'service_style', restaurant.service_style, count(*)
+    FROM restaurants_restaurant AS restaurant
+    JOIN matches ON matches.id = restaurant.id
+    GROUP BY restaurant.service_style
+    UNION ALL
+    SELECT 'services', service.value, count(DISTINCT restaurant.id)
+    FROM restaurants_restaurant AS restaurant
+    JOIN matches ON matches.id = restaurant.id
+    CROSS JOIN unnest(restaurant.services) AS service(value)
+    GROUP BY service.value
+    UNION ALL
+    SELECT 'cuisine', cuisine.slug, count(*)
+    FROM restaurants_restaurantcuisine AS link
+    JOIN matches ON matches.id = link.restaurant_id
+    JOIN restaurants_cuisine AS cuisine ON cuisine.id = link.cuisine_id
+    GROUP BY cuisine.slug
+"""
+
+
+def get_facets_setting(name):
+    return getattr(settings, 'RESTAURANT_FACETS', {}).get(name, DEFAULT_RESTAURANT_FACETS[name])
+
+
+def count_facets(restaurants):
+    """
+    Counts the restaurants of a queryset per value of every facet, in one
+    query. Returns {facet: [{"value": value, "count": count}]}, most common
+    values first.
+    """
+    facets = {facet: [] for facet in FACETS}
+    try:
+        matches, params = restaurants.order_by().values('id').query.sql_with_params()
+    except EmptyResultSet:
+        return facets
+    with connection.cursor() as cursor:
+        cursor.execute(FACET_COUNTS_SQL.format(matches=matches), params)
+        rows = cursor.fetchall()
+
+    for facet, value, count in sorted(rows, key=lambda row: (-row[2], row[1])):
+        facets[facet].append({"value": value, "count": count})
+    return facets
+
+
+def facets_cache_key(filters):
+    digest = hashlib.md5(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()
+    return f"restaurants:facets:{digest}"
+
+
+def cached_facet_counts(restaurants, filters):
+    """
+    `count_facets` of a filtered queryset, cached under `filters`, a JSON
+    serializable description of the filters the queryset was built from.
+    """
+    cache = caches[get_facets_setting("CACHE_ALIAS")]
+    key = facets_cache_key(filters)
+    facets = cache.get(key)
+    if facets is None:
+        facets = count_facets(restaurants)
+        cache.set(key, facets, timeout=get_facets_setting("TIMEOUT"))
+    return facets
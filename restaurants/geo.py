@@ -0,0 +1,135 @@
+"""
+Nearby restaurant lookups.
+
+`Location.location` holds a geography point kept in sync with
+latitude/longitude and indexed with GiST. Nearby queries combine an
+`ST_DWithin` radius filter with a KNN `<->` ordering, both of which PostGIS
+answers from the index, so they stay fast however many restaurants exist.
+Distances on geography columns are in meters along the spheroid.
+
+Without PostGIS, e.g. on a plain database in tests, nearby queries narrow
+restaurants down to a bounding box and rank them in Python with
+`Location.distances_from`.
+"""
+import math
+
+import numpy as np
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.db import connection
+from django.db.models import F, FloatField, Func, Value
+
+from restaurants.models import Location, Restaurant
+
+DEFAULT_RADIUS_KM = 5
+MAX_RADIUS_KM = 50
+DEFAULT_NEARBY_LIMIT = 20
+MAX_NEARBY_LIMIT = 100
+
+KM_PER_DEGREE = 111.32
+
+# Restaurant columns returned by nearby queries
+NEARBY_FIELDS = ('id', 'name', 'address', 'logo_url', 'is_online')
+# Columns of restaurants ranked in Python
+CANDIDATE_FIELDS = (*NEARBY_FIELDS, 'location__latitude', 'location__longitude')
+
+
+class KNNDistance(Func):
+    """
+    The PostGIS `<->` distance operator. Ordering by it, with a LIMIT, lets
+    the planner walk the GiST index nearest first instead of sorting.
+    """
+    arg_joiner = ' <-> '
+    template = '%(expressions)s'
+    output_field = FloatField()
+
+
+def make_point(latitude, longitude):
+    return Point(longitude, latitude, srid=4326)
+
+
+def point_value(point):
+    return Value(point, output_field=PointField(srid=4326, geography=True))
+
+
+def nearby_queryset(latitude, longitude, radius_km=DEFAULT_RADIUS_KM, limit=DEFAULT_NEARBY_LIMIT,
+                    queryset=None):
+    point = make_point(latitude, longitude)
+    queryset = Restaurant.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        location__location__dwithin=(point, D(km=radius_km))
+    ).annotate(
+        distance=KNNDistance(F('location__location'), point_value(point))
+    ).order_by('distance').values(*NEARBY_FIELDS, 'distance')[:limit]
+
+
+def has_postgis():
+    return getattr(connection.ops, 'postgis', False)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min latitude, max latitude, min longitude, max longitude) around a point"""
+    latitude_delta = radius_km / KM_PER_DEGREE
+    longitude_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return (
+        latitude - latitude_delta, latitude + latitude_delta,
+        longitude - longitude_delta, longitude + longitude_delta,
+    )
+
+
+def bounding_box_candidates(latitude, longitude, radius_km, queryset=None):
+    """
+    Restaurants in the bounding box of a circle, a superset of those within
+    `radius_km`, as dicts of `CANDIDATE_FIELDS`.
+    """
+    min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(latitude, longitude, radius_km)
+    queryset = Restaurant.objects.all() if queryset is None else queryset
+    return list(queryset.filter(
+        location__latitude__range=(min_latitude, max_latitude),
+        location__longitude__range=(min_longitude, max_longitude),
+    ).values(*CANDIDATE_FIELDS))
+
+
+def rank_candidates(latitude, longitude, candidates, radius_km, limit):
+    """
+    Ranks candidate restaurants by their distance to a point, computed in
+    Python, keeping the `limit` nearest within `radius_km`.
+    """
+    if not candidates:
+        return []
+    distances = Location.distances_from(latitude, longitude, [
+        (candidate['location__latitude'], candidate['location__longitude']) for candidate in candidates
+    ])
+    nearest = [index for index in np.argsort(distances, kind='stable') if distances[index] <= radius_km]
+    return [
+        {
+            **{field: candidates[index][field] for field in NEARBY_FIELDS},
+            "distance_km": round(float(distances[index]), 3),
+        }
+        for index in nearest[:limit]
+    ]
+
+
+def nearby_restaurants_in_python(latitude, longitude, radius_km=DEFAULT_RADIUS_KM, limit=DEFAULT_NEARBY_LIMIT,
+                                 queryset=None):
+    """`nearby_restaurants` for databases without PostGIS"""
+    candidates = bounding_box_candidates(latitude, longitude, radius_km, queryset)
+    return rank_candidates(latitude, longitude, candidates, radius_km, limit)
+
+
+def nearby_restaurants(latitude, longitude, radius_km=DEFAULT_RADIUS_KM, limit=DEFAULT_NEARBY_LIMIT,
+                       queryset=None):
+    """
+    Returns up to `limit` restaurants within `radius_km` of a point, nearest
+    first, as dicts of `NEARBY_FIELDS` plus their `distance_km`.
+    """
+    if not has_postgis():
+        return nearby_restaurants_in_python(latitude, longitude, radius_km, limit, queryset)
+    return [
+        {
+            **{field: restaurant[field] for field in NEARBY_FIELDS},
+            "distance_km": round(restaurant["distance"] / 1000, 3),
+        }
+        for restaurant in nearby_queryset(latitude, longitude, radius_km, limit, queryset)
+    ]
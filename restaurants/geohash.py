@@ -0,0 +1,83 @@
+"""
+Geohash encoding.
+
+A geohash names a cell of a grid over the earth by interleaving the bits of
+its longitude and latitude, base32 encoded. Every extra character splits a
+cell into 32, and cells sharing a prefix are nested, which makes geohashes
+convenient cache keys for areas of a chosen size (precision 6 is about
+1.2km x 0.6km, precision 4 about 39km x 19.5km).
+"""
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(latitude, longitude, precision):
+    """Returns the geohash of the cell holding a point."""
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        value, value_range = (longitude, longitude_range) if even else (latitude, latitude_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(geohash)
+
+
+def bounds(geohash):
+    """Returns (min latitude, max latitude, min longitude, max longitude) of a cell."""
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    even = True
+    for character in geohash:
+        value = BASE32.index(character)
+        for shift in range(4, -1, -1):
+            value_range = longitude_range if even else latitude_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if value >> shift & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+    return latitude_range[0], latitude_range[1], longitude_range[0], longitude_range[1]
+
+
+def cell_size(precision):
+    """(latitude, longitude) span in degrees of the cells at a precision."""
+    bit_count = precision * 5
+    latitude_bits = bit_count // 2
+    longitude_bits = bit_count - latitude_bits
+    return 180.0 / 2 ** latitude_bits, 360.0 / 2 ** longitude_bits
+
+
+def covering(min_latitude, max_latitude, min_longitude, max_longitude, precision):
+    """Returns the geohashes of the cells overlapping a bounding box."""
+    latitude_step, longitude_step = cell_size(precision)
+    min_latitude, max_latitude = max(min_latitude, -90.0), min(max_latitude, 90.0)
+    min_longitude, max_longitude = max(min_longitude, -180.0), min(max_longitude, 180.0)
+
+    cells = set()
+    latitude = min_latitude
+    while True:
+        longitude = min_longitude
+        while True:
+            cells.add(encode(min(latitude, max_latitude), min(longitude, max_longitude), precision))
+            if longitude >= max_longitude:
+                break
+            longitude += longitude_step
+        if latitude >= max_latitude:
+            break
+        latitude += latitude_step
+    return cells
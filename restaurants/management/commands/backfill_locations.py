@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from restaurants.models import Location
+
+BACKFILL_SQL = """
+    UPDATE restaurants_location
+    SET location = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography
+    WHERE id = ANY(%s)
+"""
+
+
+class Command(BaseCommand):
+    help = "Fills in Location.location from latitude/longitude for existing rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Recompute every point, not only the missing ones"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Number of rows updated per transaction"
+        )
+
+    def handle(self, *args, **options):
+        locations = Location.objects.order_by('id')
+        if not options['all']:
+            locations = locations.filter(location__isnull=True)
+
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+        while True:
+            ids = list(locations.filter(pk__gt=last_id).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(BACKFILL_SQL, [ids])
+                updated += cursor.rowcount
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} locations"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from restaurants.menu import load_menu_tree, serialize_menu
+from restaurants.menu_cache import MENU_RESTAURANT_FIELDS, refresh_menu_snapshot, render_menu_document
+from restaurants.models import Restaurant, MenuSnapshot
+from zapeat.std_utils import measure
+
+
+class Command(BaseCommand):
+    help = "Compares serving a menu from its snapshot with assembling it live"
+
+    def add_arguments(self, parser):
+        parser.add_argument('restaurant_id', type=int)
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        restaurant_id = options['restaurant_id']
+        iterations = options['iterations']
+        if not Restaurant.objects.filter(pk=restaurant_id).exists():
+            raise CommandError(f"Restaurant with id {restaurant_id} not found")
+
+        document = refresh_menu_snapshot(restaurant_id)
+
+        def live():
+            restaurant = Restaurant.objects.only(*MENU_RESTAURANT_FIELDS).get(pk=restaurant_id)
+            menu = serialize_menu(load_menu_tree(restaurant_id))
+            return render_menu_document(restaurant, restaurant.menu_version, menu).payload
+
+        def snapshot():
+            return bytes(MenuSnapshot.objects.values_list('payload', flat=True).get(pk=restaurant_id))
+
+        self.stdout.write(
+            f"Menu of restaurant {restaurant_id}: {len(document.payload)} bytes, {iterations} iterations"
+        )
+        for name, func in (("live assembly", live), ("snapshot", snapshot)):
+            result = measure(func, iterations)
+            self.stdout.write(
+                f"{name:>14}: median {result['median']:.2f}ms, "
+                f"p95 {result['p95']:.2f}ms, max {result['max']:.2f}ms"
+            )
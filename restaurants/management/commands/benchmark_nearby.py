@@ -0,0 +1,90 @@
+import random
+import time
+
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from restaurants.geo import nearby_queryset
+from restaurants.models import Location, Restaurant
+from zapeat.std_utils import summarize_timings
+
+# Synthetic restaurants are spread over roughly the area of a large city
+LATITUDES = (12.85, 13.10)
+LONGITUDES = (77.45, 77.75)
+
+TARGET_MS = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures nearby restaurant queries against synthetic restaurants, "
+        "created in a transaction that is rolled back afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100_000)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--radius', type=float, default=5, help="Search radius in km")
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def random_point(self, rng):
+        return rng.uniform(*LATITUDES), rng.uniform(*LONGITUDES)
+
+    def create_restaurants(self, count, rng, batch_size=5000):
+        for start in range(0, count, batch_size):
+            coordinates = [self.random_point(rng) for _ in range(min(batch_size, count - start))]
+            locations = Location.objects.bulk_create([
+                Location(latitude=latitude, longitude=longitude, location=Point(longitude, latitude, srid=4326))
+                for latitude, longitude in coordinates
+            ])
+            Restaurant.objects.bulk_create([
+                Restaurant(
+                    category='CASUAL_DINING',
+                    cuisines='Synthetic',
+                    name=f"Benchmark Restaurant {start + i}",
+                    mobile_number=f"+9{start + i:014d}",
+                    email=f"benchmark-{start + i}@example.com",
+                    address="Benchmark Street",
+                    fssai_license_number=f"BENCH{start + i}",
+                    gst_number=f"BENCH{start + i}",
+                    location=location,
+                )
+                for i, location in enumerate(locations)
+            ])
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        count = options['count']
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            self.create_restaurants(count, rng)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE restaurants_location")
+                cursor.execute("ANALYZE restaurants_restaurant")
+            self.stdout.write(f"Created {count} synthetic restaurants in {time.perf_counter() - start:.1f}s")
+
+            latitude, longitude = self.random_point(rng)
+            self.stdout.write(
+                nearby_queryset(latitude, longitude, options['radius'], options['limit']).explain()
+            )
+
+            timings = []
+            for _ in range(options['iterations']):
+                latitude, longitude = self.random_point(rng)
+                start = time.perf_counter()
+                list(nearby_queryset(latitude, longitude, options['radius'], options['limit']))
+                timings.append((time.perf_counter() - start) * 1000)
+
+            transaction.set_rollback(True)
+
+        result = summarize_timings(timings)
+        p95 = result['p95']
+        self.stdout.write(
+            f"{options['iterations']} nearby queries (radius {options['radius']}km, limit {options['limit']}): "
+            f"median {result['median']:.2f}ms, p95 {p95:.2f}ms, max {result['max']:.2f}ms"
+        )
+        style = self.style.SUCCESS if p95 < TARGET_MS else self.style.WARNING
+        self.stdout.write(style(f"p95 {'within' if p95 < TARGET_MS else 'above'} the {TARGET_MS}ms target"))
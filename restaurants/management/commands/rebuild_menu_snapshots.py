@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.menu_cache import rebuild_menu_snapshots
+from restaurants.models import Restaurant
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the pre-rendered menu snapshots of all (or the given) restaurants"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--restaurant', type=int, action='append', dest='restaurant_ids',
+            help="Only rebuild the snapshot of this restaurant (repeatable)"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Number of restaurants whose menus are loaded together"
+        )
+
+    def handle(self, *args, **options):
+        restaurants = Restaurant.objects.order_by('id')
+        if options['restaurant_ids']:
+            restaurants = restaurants.filter(pk__in=options['restaurant_ids'])
+        restaurant_ids = list(restaurants.values_list('id', flat=True))
+
+        batch_size = options['batch_size']
+        rebuilt = 0
+        for start in range(0, len(restaurant_ids), batch_size):
+            rebuilt += rebuild_menu_snapshots(restaurant_ids[start:start + batch_size])
+
+        skipped = len(restaurant_ids) - rebuilt
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rebuilt} menu snapshots ({skipped} skipped as written concurrently)"
+        ))
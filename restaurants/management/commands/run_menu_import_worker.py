@@ -0,0 +1,59 @@
+import threading
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from restaurants.menu_imports import claim_menu_import, run_menu_import
+
+
+class Command(BaseCommand):
+    help = "Applies queued asynchronous menu imports with a pool of worker threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2)
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help="Seconds to wait before polling again when the queue is empty"
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=2,
+            help="Minutes without a heartbeat after which a running import is considered abandoned and retried"
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once the queue is empty instead of polling forever"
+        )
+
+    def work(self, stopped, options):
+        stale_after = timedelta(minutes=options['stale_after'])
+        try:
+            while not stopped.is_set():
+                job = claim_menu_import(stale_after=stale_after)
+                if job is None:
+                    if options['once']:
+                        return
+                    stopped.wait(options['poll_interval'])
+                    continue
+
+                job = run_menu_import(job)
+                self.stdout.write(f"Menu import #{job.pk} for restaurant {job.restaurant_id}: {job.status}")
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        stopped = threading.Event()
+        workers = [
+            threading.Thread(target=self.work, args=(stopped, options), daemon=True)
+            for _ in range(options['threads'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(timeout=1)
+        except KeyboardInterrupt:
+            stopped.set()
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from restaurants.opening_hours import minutes_until_next_boundary, refresh_open_now, schedule_boundaries
+from restaurants.schedules import minute_of_week
+
+
+class Command(BaseCommand):
+    help = (
+        "Keeps Restaurant.is_open_now up to date, waking up only when some "
+        "restaurant opens or closes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-sleep', type=int, default=900,
+            help="Seconds after which boundaries are reloaded even if none was reached, "
+                 "to pick up new opening times"
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Refresh once and exit"
+        )
+
+    def seconds_until_next_boundary(self, now, boundaries):
+        minutes = minutes_until_next_boundary(boundaries, minute_of_week(now))
+        if minutes is None:
+            return None
+        # Wake up just after the boundary minute starts
+        return minutes * 60 - now.second - now.microsecond / 1_000_000 + 1
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                now = timezone.now()
+                changed = refresh_open_now(now)
+                self.stdout.write(f"{timezone.localtime(now):%a %H:%M}: {changed} restaurants opened or closed")
+                if options['once']:
+                    return
+
+                delay = self.seconds_until_next_boundary(now, schedule_boundaries())
+                delay = options['max_sleep'] if delay is None else min(delay, options['max_sleep'])
+                time.sleep(max(delay, 1))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,126 @@
+"""
+Menu tree loading.
+
+The menu of a restaurant is a four level tree
+(MenuCategory -> MenuItem -> CustomizationGroup -> CustomizationOption).
+Walking it through the ORM relations costs one query per node, so instead
+every level is fetched with a single query filtered on the restaurant and the
+tree is stitched together in memory. Loading a menu therefore costs at most
+four queries, however many categories and items it has.
+"""
+from collections import defaultdict
+
+from restaurants.models import (
+    MenuCategory,
+    MenuItem,
+    CustomizationGroup,
+    CustomizationOption,
+)
+
+
+def load_menu_tree(restaurant_id):
+    """
+    Returns the menu categories of a restaurant with the rest of the tree
+    attached to them.
+
+    Every category gets a `menu_items` list, every item a `groups` list and
+    every group a `group_options` list. Groups are only loaded for
+    customizable items, which is what the menu payload exposes.
+    """
+    return load_menu_trees([restaurant_id])[restaurant_id]
+
+
+def load_menu_trees(restaurant_ids):
+    """
+    Loads the menus of several restaurants at once, still in four queries.
+    Returns a dict of restaurant id to the categories `load_menu_tree` returns.
+    """
+    restaurant_ids = list(restaurant_ids)
+    trees = {restaurant_id: [] for restaurant_id in restaurant_ids}
+
+    categories = list(
+        MenuCategory.objects.filter(restaurant_id__in=restaurant_ids).order_by('id')
+    )
+    if not categories:
+        return trees
+
+    items = MenuItem.objects.filter(
+        category__restaurant_id__in=restaurant_ids
+    ).order_by('id')
+    groups = CustomizationGroup.objects.filter(
+        menu_item__category__restaurant_id__in=restaurant_ids,
+        menu_item__customizable=True
+    ).order_by('id')
+    options = CustomizationOption.objects.filter(
+        group__menu_item__category__restaurant_id__in=restaurant_ids,
+        group__menu_item__customizable=True
+    ).order_by('id')
+
+    options_by_group = defaultdict(list)
+    for option in options:
+        options_by_group[option.group_id].append(option)
+
+    groups_by_item = defaultdict(list)
+    for group in groups:
+        group.group_options = options_by_group[group.id]
+        groups_by_item[group.menu_item_id].append(group)
+
+    items_by_category = defaultdict(list)
+    for item in items:
+        item.groups = groups_by_item[item.id]
+        items_by_category[item.category_id].append(item)
+
+    for category in categories:
+        category.menu_items = items_by_category[category.id]
+        trees[category.restaurant_id].append(category)
+
+    return trees
+
+
+def serialize_menu_items(category):
+    """Serializes the items of a category loaded by `load_menu_tree`."""
+    return [
+        {
+            "id": item.id,
+            "name": item.name,
+            "price": item.price,
+            "photo_url": item.photo_url,
+            "customizable": item.customizable,
+            "customizations": [
+                {
+                    "group_name": group.name,
+                    "options": [
+                        {"name": option.name, "price": option.price, "food_type": option.food_type}
+                        for option in group.group_options
+                    ]
+                }
+                for group in item.groups
+            ] if item.customizable else [],
+            "food_type": item.food_type
+        }
+        for item in category.menu_items
+    ]
+
+
+def serialize_menu(categories):
+    """Menu payload served by the menu GET endpoint."""
+    return [
+        {
+            "name": category.name,
+            "description": category.description,
+            "menu_items": serialize_menu_items(category)
+        }
+        for category in categories
+    ]
+
+
+def serialize_menu_summary(categories):
+    """Menu payload returned after a menu has been created/updated."""
+    return [
+        {
+            "category_name": category.name,
+            "category_description": category.description,
+            "items": serialize_menu_items(category)
+        }
+        for category in categories
+    ]
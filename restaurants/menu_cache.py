@@ -0,0 +1,329 @@
+"""
+Versioned menu cache.
+
+Every restaurant carries a `menu_version` counter which is bumped, inside the
+same transaction, by every code path that writes to its menu. Menus are cached
+as fully rendered response bodies (`MenuDocument`) tagged with the ETag of the
+state they were built from, which covers the menu version and the restaurant
+row. A cached menu is therefore valid for exactly as long as neither moves,
+and a write to one restaurant never evicts the menu of another.
+
+Menus are looked up in three tiers before being assembled from the menu
+tables:
+    - an in-process LRU holding the menus of the most read restaurants
+    - an optional shared Django cache (`MENU_CACHE["SHARED_CACHE_ALIAS"]`)
+    - the `MenuSnapshot` table, rewritten whenever a menu is written
+
+Settings (all optional):
+    MENU_CACHE = {
+        "MAX_ENTRIES": 512,
+        "SHARED_CACHE_ALIAS": None,
+        "SHARED_CACHE_TIMEOUT": 3600,
+    }
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from restaurants.menu import load_menu_tree, load_menu_trees, serialize_menu
+from restaurants.menu_search import refresh_search_vectors
+from restaurants.models import (
+    Restaurant,
+    MenuSnapshot,
+    MenuCategory,
+    MenuItem,
+    CustomizationGroup,
+    CustomizationOption,
+)
+from zapeat.std_utils import CustomAPIModule, LRUCache
+
+DEFAULT_MENU_CACHE = {
+    "MAX_ENTRIES": 512,
+    "SHARED_CACHE_ALIAS": None,
+    "SHARED_CACHE_TIMEOUT": 3600,
+}
+
+MENU_MESSAGE = "Restaurant menu retrieved successfully"
+
+# Number of optimistic attempts at building a consistent menu before falling
+# back to locking the restaurant row against concurrent menu writers.
+BUILD_ATTEMPTS = 3
+
+# Restaurant columns the menu document depends on
+MENU_RESTAURANT_FIELDS = ('id', 'name', 'menu_version', 'updated_at')
+
+# Lookup from each menu model to the restaurant owning the row
+RESTAURANT_LOOKUPS = {
+    MenuCategory: 'restaurant_id',
+    MenuItem: 'category__restaurant_id',
+    CustomizationGroup: 'menu_item__category__restaurant_id',
+    CustomizationOption: 'group__menu_item__category__restaurant_id',
+}
+
+MenuDocument = namedtuple('MenuDocument', ['version', 'etag', 'payload'])
+
+
+def get_menu_cache_setting(name):
+    return getattr(settings, 'MENU_CACHE', {}).get(name, DEFAULT_MENU_CACHE[name])
+
+
+local_cache = LRUCache(max_entries=get_menu_cache_setting("MAX_ENTRIES"))
+
+
+def get_shared_cache():
+    alias = get_menu_cache_setting("SHARED_CACHE_ALIAS")
+    return caches[alias] if alias else None
+
+
+def shared_cache_key(restaurant_id, etag):
+    return f"restaurants:menu:{restaurant_id}:{etag}"
+
+
+def get_menu_version(restaurant_id):
+    return Restaurant.objects.values_list('menu_version', flat=True).get(pk=restaurant_id)
+
+
+def bump_menu_version(restaurant_id):
+    """
+    Increments the menu version of a restaurant and returns the new version.
+
+    The UPDATE keeps the restaurant row locked until the surrounding
+    transaction ends, which serializes concurrent menu writers of the same
+    restaurant. Call this before writing menu rows, inside the transaction
+    that writes them.
+    """
+    with transaction.atomic():
+        Restaurant.objects.filter(pk=restaurant_id).update(
+            menu_version=F('menu_version') + 1
+        )
+        return get_menu_version(restaurant_id)
+
+
+def lock_menu_version(restaurant_id):
+    """
+    Returns the menu version of a restaurant and keeps it from moving until
+    the surrounding transaction ends.
+
+    Takes a share lock on the restaurant row: it waits for, then blocks, the
+    UPDATE of `bump_menu_version`, but other share lockers do not wait on
+    each other. Call this inside the transaction relying on the version.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT menu_version FROM restaurants_restaurant WHERE id = %s FOR SHARE",
+            [restaurant_id]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        raise Restaurant.DoesNotExist(f"Restaurant {restaurant_id} does not exist")
+    return row[0]
+
+
+def menu_restaurant_ids(model, pks):
+    """Returns the ids of the restaurants owning the given menu rows."""
+    lookup = RESTAURANT_LOOKUPS[model]
+    return set(
+        model.objects.filter(pk__in=pks).values_list(lookup, flat=True).distinct()
+    )
+
+
+def menu_etag(restaurant_id, version, updated_at, *variant):
+    """
+    ETag of a menu response. The document embeds the restaurant name, hence
+    updated_at; `variant` distinguishes filtered renditions of the menu.
+    """
+    return CustomAPIModule.make_etag("menu", restaurant_id, version, updated_at.timestamp(), *variant)
+
+
+def render_menu_document(restaurant, version, menu):
+    """Renders the menu response body exactly as the menu endpoint would."""
+    payload = JSONRenderer().render(
+        CustomAPIModule.create_response_data(
+            data={
+                "restaurant": restaurant.name,
+                "menu": menu
+            },
+            message=MENU_MESSAGE
+        )
+    )
+    return MenuDocument(
+        version=version,
+        etag=menu_etag(restaurant.pk, version, restaurant.updated_at),
+        payload=payload
+    )
+
+
+def cache_menu_document(restaurant_id, document):
+    local_cache.set(restaurant_id, document)
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.set(
+            shared_cache_key(restaurant_id, document.etag),
+            document,
+            timeout=get_menu_cache_setting("SHARED_CACHE_TIMEOUT")
+        )
+
+
+def store_newer_menu_snapshot(restaurant_id, document):
+    """
+    Stores a menu snapshot built by a reader, unless the stored one is of a
+    later menu version: a slow reader must not overwrite the snapshot a
+    menu writer refreshed in the meantime. Writers, which hold the menu
+    version lock, use `store_menu_snapshot`.
+    """
+    table = MenuSnapshot._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (restaurant_id, version, etag, payload, updated_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (restaurant_id) DO UPDATE SET
+                version = EXCLUDED.version,
+                etag = EXCLUDED.etag,
+                payload = EXCLUDED.payload,
+                updated_at = EXCLUDED.updated_at
+            WHERE {table}.version <= EXCLUDED.version
+            """,
+            [restaurant_id, document.version, document.etag, document.payload, timezone.now()]
+        )
+
+
+def store_menu_snapshot(restaurant_id, document):
+    MenuSnapshot.objects.update_or_create(
+        restaurant_id=restaurant_id,
+        defaults={
+            "version": document.version,
+            "etag": document.etag,
+            "payload": document.payload,
+        }
+    )
+
+
+def build_menu(restaurant_id, version):
+    """
+    Builds the serialized menu of a restaurant as of `version`.
+
+    The tree is loaded with several queries, so a writer committing between
+    them could leave us with a half written menu. The version is re-read after
+    loading: if it did not move, no menu write committed in between and the
+    result is consistent. Otherwise the build is retried and, as a last
+    resort, done while holding the restaurant row lock writers take.
+
+    Returns a (version, menu) tuple.
+    """
+    for _ in range(BUILD_ATTEMPTS):
+        menu = serialize_menu(load_menu_tree(restaurant_id))
+        current_version = get_menu_version(restaurant_id)
+        if current_version == version:
+            return version, menu
+        version = current_version
+
+    with transaction.atomic():
+        version = Restaurant.objects.select_for_update().values_list(
+            'menu_version', flat=True
+        ).get(pk=restaurant_id)
+        return version, serialize_menu(load_menu_tree(restaurant_id))
+
+
+def get_menu_document(restaurant):
+    """
+    Returns the rendered menu of a restaurant, loaded with (at least) the
+    `MENU_RESTAURANT_FIELDS` columns, from the first cache tier holding it for
+    the restaurant's current ETag. Falls back to building it from the menu
+    tables and storing it in every tier.
+    """
+    restaurant_id = restaurant.pk
+    etag = menu_etag(restaurant_id, restaurant.menu_version, restaurant.updated_at)
+
+    document = local_cache.get(restaurant_id)
+    if document is not None and document.etag == etag:
+        return document
+
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        document = shared_cache.get(shared_cache_key(restaurant_id, etag))
+        if document is not None:
+            local_cache.set(restaurant_id, document)
+            return document
+
+    snapshot = MenuSnapshot.objects.filter(
+        restaurant_id=restaurant_id, etag=etag
+    ).values_list('payload', flat=True).first()
+    if snapshot is not None:
+        document = MenuDocument(version=restaurant.menu_version, etag=etag, payload=bytes(snapshot))
+        cache_menu_document(restaurant_id, document)
+        return document
+
+    version, menu = build_menu(restaurant_id, restaurant.menu_version)
+    document = render_menu_document(restaurant, version, menu)
+    store_newer_menu_snapshot(restaurant_id, document)
+    cache_menu_document(restaurant_id, document)
+    return document
+
+
+def refresh_menu_snapshot(restaurant_id):
+    """
+    Rebuilds the menu snapshot, and the dish search documents, of a
+    restaurant. Meant for menu writers: when called inside the writing
+    transaction the snapshot commits together with the menu, and caches are
+    only primed once it has committed.
+    """
+    with transaction.atomic():
+        restaurant = Restaurant.objects.select_for_update().only(
+            *MENU_RESTAURANT_FIELDS
+        ).get(pk=restaurant_id)
+        menu = serialize_menu(load_menu_tree(restaurant_id))
+        document = render_menu_document(restaurant, restaurant.menu_version, menu)
+        store_menu_snapshot(restaurant_id, document)
+        refresh_search_vectors(restaurant_id)
+    transaction.on_commit(lambda: cache_menu_document(restaurant_id, document))
+    return document
+
+
+def schedule_menu_snapshot_refresh(restaurant_id):
+    """Rebuilds the menu snapshot once the current transaction commits."""
+    transaction.on_commit(lambda: refresh_menu_snapshot(restaurant_id))
+
+
+def rebuild_menu_snapshots(restaurant_ids):
+    """
+    Rebuilds the snapshots of many restaurants, loading all their menus with
+    one set of queries and writing all snapshots with a single upsert.
+
+    Menus written while the rebuild runs are skipped, their writers refresh
+    their snapshots themselves. Returns the number of snapshots written.
+    """
+    restaurants = list(
+        Restaurant.objects.filter(pk__in=restaurant_ids).only(*MENU_RESTAURANT_FIELDS)
+    )
+    trees = load_menu_trees(restaurant.pk for restaurant in restaurants)
+    current_versions = dict(
+        Restaurant.objects.filter(pk__in=trees.keys()).values_list('id', 'menu_version')
+    )
+
+    snapshots = []
+    for restaurant in restaurants:
+        if current_versions.get(restaurant.pk) != restaurant.menu_version:
+            continue
+        document = render_menu_document(
+            restaurant, restaurant.menu_version, serialize_menu(trees[restaurant.pk])
+        )
+        snapshots.append(MenuSnapshot(
+            restaurant_id=restaurant.pk,
+            version=document.version,
+            etag=document.etag,
+            payload=document.payload
+        ))
+
+    MenuSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['restaurant'],
+        update_fields=['version', 'etag', 'payload', 'updated_at']
+    )
+    return len(snapshots)
@@ -0,0 +1,212 @@
+"""
+Menu change tracking for incremental menu sync.
+
+Every menu row carries the menu version it was last changed in
+(`change_seq`), and rows removed from a restaurant leave a `MenuTombstone`
+behind. A client holding the menu as of version N can then fetch only the rows
+changed, and the ids of the rows removed, after N. Removing a row implies
+removing the rows below it.
+
+Tombstones are only kept for the last `MENU_DELTA_MAX_GAP` versions; clients
+further behind get a full snapshot of the menu instead.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from restaurants.menu_cache import (
+    RESTAURANT_LOOKUPS,
+    bump_menu_version,
+    get_menu_version,
+    menu_restaurant_ids,
+    schedule_menu_snapshot_refresh,
+)
+from restaurants.models import (
+    Restaurant,
+    MenuCategory,
+    MenuItem,
+    CustomizationGroup,
+    CustomizationOption,
+    MenuTombstone,
+)
+
+DEFAULT_MAX_GAP = 50
+
+# Number of optimistic attempts at reading a consistent set of changes
+READ_ATTEMPTS = 3
+
+KINDS = {
+    MenuCategory: 'category',
+    MenuItem: 'item',
+    CustomizationGroup: 'group',
+    CustomizationOption: 'option',
+}
+
+# Fields of each menu model exposed to syncing clients
+SYNC_FIELDS = {
+    MenuCategory: ('id', 'name', 'description'),
+    MenuItem: (
+        'id', 'category_id', 'name', 'description', 'price', 'photo_url', 'customizable',
+        'food_type', 'spice_level', 'sweetness_level', 'must_try'
+    ),
+    CustomizationGroup: ('id', 'menu_item_id', 'name', 'max_options_allowed', 'min_options_allowed'),
+    CustomizationOption: ('id', 'group_id', 'name', 'price', 'food_type', 'spice_level', 'sweetness_level'),
+}
+
+# For each menu model, the lookup from itself and every model below it
+SUBTREE_LOOKUPS = {
+    MenuCategory: [
+        (MenuCategory, 'pk'),
+        (MenuItem, 'category'),
+        (CustomizationGroup, 'menu_item__category'),
+        (CustomizationOption, 'group__menu_item__category'),
+    ],
+    MenuItem: [
+        (MenuItem, 'pk'),
+        (CustomizationGroup, 'menu_item'),
+        (CustomizationOption, 'group__menu_item'),
+    ],
+    CustomizationGroup: [
+        (CustomizationGroup, 'pk'),
+        (CustomizationOption, 'group'),
+    ],
+    CustomizationOption: [
+        (CustomizationOption, 'pk'),
+    ],
+}
+
+
+def get_max_gap():
+    return getattr(settings, 'MENU_DELTA_MAX_GAP', DEFAULT_MAX_GAP)
+
+
+def restaurant_rows(model, restaurant_id):
+    return model.objects.filter(**{RESTAURANT_LOOKUPS[model]: restaurant_id})
+
+
+def stamp_menu_rows(model, pks, version):
+    """Marks rows, and the rows below them, as changed in `version`."""
+    for subtree_model, lookup in SUBTREE_LOOKUPS[model]:
+        subtree_model.objects.filter(**{f"{lookup}__in": pks}).update(change_seq=version)
+
+
+def record_removed_menu_rows(restaurant_id, model, pks, version):
+    """
+    Leaves tombstones for rows, and the rows below them, removed from a
+    restaurant in `version`. Call before the rows are deleted. Returns the
+    number of rows recorded.
+    """
+    tombstones = []
+    for subtree_model, lookup in SUBTREE_LOOKUPS[model]:
+        object_ids = subtree_model.objects.filter(
+            **{f"{lookup}__in": pks}
+        ).values_list('pk', flat=True)
+        tombstones.extend(
+            MenuTombstone(
+                restaurant_id=restaurant_id,
+                kind=KINDS[subtree_model],
+                object_id=object_id,
+                change_seq=version
+            )
+            for object_id in object_ids
+        )
+    MenuTombstone.objects.bulk_create(tombstones)
+    prune_tombstones(restaurant_id, version)
+    return len(tombstones)
+
+
+def prune_tombstones(restaurant_id, version):
+    """Drops tombstones no client can need, see `get_menu_changes`."""
+    MenuTombstone.objects.filter(
+        restaurant_id=restaurant_id,
+        change_seq__lte=version - get_max_gap()
+    ).delete()
+
+
+def menu_rows_saved(model, pks, previous_restaurant_ids=()):
+    """
+    Records a save of menu rows: bumps the menu version of their restaurants,
+    stamps the rows and rebuilds the snapshots. Rows moved away from a
+    restaurant are recorded as removed from it. Call inside the transaction
+    saving the rows, once they are saved.
+    """
+    restaurant_ids = menu_restaurant_ids(model, pks)
+    for restaurant_id in set(previous_restaurant_ids) - restaurant_ids:
+        version = bump_menu_version(restaurant_id)
+        record_removed_menu_rows(restaurant_id, model, pks, version)
+        schedule_menu_snapshot_refresh(restaurant_id)
+
+    for restaurant_id in restaurant_ids:
+        version = bump_menu_version(restaurant_id)
+        restaurant_pks = restaurant_rows(model, restaurant_id).filter(pk__in=pks).values_list('pk', flat=True)
+        stamp_menu_rows(model, list(restaurant_pks), version)
+        schedule_menu_snapshot_refresh(restaurant_id)
+
+
+def menu_rows_deleting(model, pks):
+    """
+    Records the deletion of menu rows. Call inside the transaction deleting
+    the rows, before they are deleted.
+    """
+    for restaurant_id in menu_restaurant_ids(model, pks):
+        version = bump_menu_version(restaurant_id)
+        restaurant_pks = restaurant_rows(model, restaurant_id).filter(pk__in=pks).values_list('pk', flat=True)
+        record_removed_menu_rows(restaurant_id, model, list(restaurant_pks), version)
+        schedule_menu_snapshot_refresh(restaurant_id)
+
+
+def read_menu_changes(restaurant_id, since):
+    changes = {
+        f"{KINDS[model]}s": list(
+            restaurant_rows(model, restaurant_id).filter(
+                change_seq__gt=since
+            ).order_by('id').values(*SYNC_FIELDS[model])
+        )
+        for model in KINDS
+    }
+    removed = {f"{kind}s": [] for kind in KINDS.values()}
+    if since >= 0:
+        tombstones = MenuTombstone.objects.filter(
+            restaurant_id=restaurant_id,
+            change_seq__gt=since
+        ).order_by('id').values_list('kind', 'object_id')
+        for kind, object_id in tombstones:
+            removed[f"{kind}s"].append(object_id)
+    return changes, removed
+
+
+def needs_full_sync(version, since):
+    return since is None or since < 0 or since > version or version - since >= get_max_gap()
+
+
+def get_menu_changes(restaurant_id, version, since=None):
+    """
+    Returns the changes to the menu of a restaurant after version `since`.
+
+    When `since` is missing, ahead of the menu or further behind than the
+    tombstones reach, every row is returned instead with `full` set, and the
+    client should replace its copy of the menu. As with menu builds, the
+    version is re-read after reading the changes to make sure no menu write
+    committed in between, falling back to the row lock menu writers take.
+    """
+    for _ in range(READ_ATTEMPTS):
+        full = needs_full_sync(version, since)
+        changes, removed = read_menu_changes(restaurant_id, -1 if full else since)
+        current_version = get_menu_version(restaurant_id)
+        if current_version == version:
+            break
+        version = current_version
+    else:
+        with transaction.atomic():
+            version = Restaurant.objects.select_for_update().values_list(
+                'menu_version', flat=True
+            ).get(pk=restaurant_id)
+            full = needs_full_sync(version, since)
+            changes, removed = read_menu_changes(restaurant_id, -1 if full else since)
+
+    return {
+        "version": version,
+        "since": None if full else since,
+        "full": full,
+        "changes": changes,
+        "removed": removed,
+    }
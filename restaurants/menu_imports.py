@@ -0,0 +1,206 @@
+"""
+Asynchronous menu imports.
+
+Large menus posted with `?async=1` (or `Prefer: respond-async`) are stored
+as a `MenuImportJob` and applied by `run_menu_import_worker`, a pool of
+worker threads claiming queued jobs from Postgres with
+`SELECT ... FOR UPDATE SKIP LOCKED`. No broker is involved and several
+workers can run side by side.
+
+An import is applied in a single transaction, exactly like a synchronous
+menu POST, so a failed or interrupted import leaves the menu untouched and
+can safely be retried.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from restaurants.menu_cache import bump_menu_version, refresh_menu_snapshot
+from restaurants.menu_sync import (
+    CATEGORY_DEFAULTS,
+    CATEGORY_FIELDS,
+    GROUP_DEFAULTS,
+    GROUP_FIELDS,
+    ITEM_DEFAULTS,
+    ITEM_FIELDS,
+    OPTION_DEFAULTS,
+    OPTION_FIELDS,
+    MenuSync,
+    chunked,
+    clean_field,
+)
+from restaurants.models import (
+    MenuImportJob,
+    MenuCategory,
+    MenuItem,
+    CustomizationGroup,
+    CustomizationOption,
+)
+
+logger = logging.getLogger(__name__)
+
+# Categories applied between two progress reports
+IMPORT_BATCH_SIZE = 20
+
+
+def check_fields(errors, path, model, fields, data, defaults):
+    """Records the errors `MenuSync` would raise on the fields of a posted row."""
+    for field in fields:
+        try:
+            clean_field(model, field, data, defaults)
+        except ValidationError as e:
+            errors[f"{path}.{field}"] = e.messages
+
+
+def validate_menu(menu_categories):
+    """
+    Checks a posted menu up front, structure and values alike, so an
+    asynchronous import is not accepted only to fail in the worker. Returns
+    a dict of errors keyed by the path of the offending value.
+    """
+    errors = {}
+    if not isinstance(menu_categories, list) or not menu_categories:
+        return {"menu": ["Menu categories are required."]}
+
+    for c, category_data in enumerate(menu_categories):
+        if not isinstance(category_data, dict) or not category_data.get("name"):
+            errors[f"menu[{c}].name"] = ["This field is required."]
+            continue
+        check_fields(errors, f"menu[{c}]", MenuCategory, CATEGORY_FIELDS, category_data, CATEGORY_DEFAULTS)
+        for i, item_data in enumerate(category_data.get("menu_items", [])):
+            path = f"menu[{c}].menu_items[{i}]"
+            if not isinstance(item_data, dict):
+                errors[path] = ["Expected an object."]
+                continue
+            if not item_data.get("name"):
+                errors[f"{path}.name"] = ["This field is required."]
+            check_fields(errors, path, MenuItem, ITEM_FIELDS, item_data, ITEM_DEFAULTS)
+            for g, group_data in enumerate(item_data.get("customization_groups", [])):
+                group_path = f"{path}.customization_groups[{g}]"
+                if not isinstance(group_data, dict) or not group_data.get("name"):
+                    errors[f"{group_path}.name"] = ["This field is required."]
+                    continue
+                check_fields(errors, group_path, CustomizationGroup, GROUP_FIELDS, group_data, GROUP_DEFAULTS)
+                for o, option_data in enumerate(group_data.get("options", [])):
+                    option_path = f"{group_path}.options[{o}]"
+                    if not isinstance(option_data, dict) or not option_data.get("name"):
+                        errors[f"{option_path}.name"] = ["This field is required."]
+                        continue
+                    check_fields(
+                        errors, option_path, CustomizationOption, OPTION_FIELDS, option_data, OPTION_DEFAULTS
+                    )
+    return errors
+
+
+def enqueue_menu_import(restaurant_id, menu_categories):
+    return MenuImportJob.objects.create(
+        restaurant_id=restaurant_id,
+        payload=menu_categories,
+        total_categories=len(menu_categories)
+    )
+
+
+class ProgressReporter:
+    """
+    Publishes the progress of a running import every `interval` seconds,
+    along with a heartbeat telling other workers the import is still alive.
+
+    The import runs in one transaction, so progress written through the
+    importing connection would only show once the import is over. The
+    reporter writes from its own thread, hence its own connection.
+    """
+
+    def __init__(self, job_id, interval=1.0):
+        self.job_id = job_id
+        self.interval = interval
+        self.processed = 0
+        self.published = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def report(self, processed):
+        self.processed = processed
+
+    def publish(self):
+        """Publishes the progress if it changed, and a heartbeat regardless."""
+        processed = self.processed
+        fields = {"heartbeat_at": timezone.now()}
+        if processed != self.published:
+            fields["processed_categories"] = processed
+        MenuImportJob.objects.filter(pk=self.job_id).update(**fields)
+        self.published = processed
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    self.publish()
+                except Exception:
+                    logger.exception("Failed to publish progress of menu import %s", self.job_id)
+        finally:
+            connection.close()
+
+
+def claim_menu_import(stale_after=timedelta(minutes=2)):
+    """
+    Claims the oldest queued import, or a running one whose worker has not
+    sent a heartbeat (see `ProgressReporter`) for longer than `stale_after`
+    and presumably died. Returns None when there is nothing to do.
+    """
+    with transaction.atomic():
+        stale_before = timezone.now() - stale_after
+        job = MenuImportJob.objects.select_for_update(skip_locked=True).filter(
+            status='QUEUED'
+        ).order_by('created_at').first()
+        if job is None:
+            job = MenuImportJob.objects.select_for_update(skip_locked=True).filter(
+                status='RUNNING', heartbeat_at__lt=stale_before
+            ).order_by('created_at').first()
+        if job is None:
+            return None
+
+        job.status = 'RUNNING'
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.attempts += 1
+        job.processed_categories = 0
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'attempts', 'processed_categories'])
+        return job
+
+
+def run_menu_import(job):
+    """Applies a claimed import and records its outcome on the job."""
+    restaurant_id = job.restaurant_id
+    try:
+        with ProgressReporter(job.pk) as progress, transaction.atomic():
+            version = bump_menu_version(restaurant_id)
+            sync = MenuSync(restaurant_id, version)
+            processed = 0
+            for batch in chunked(job.payload, IMPORT_BATCH_SIZE):
+                sync.apply_batch(batch)
+                processed += len(batch)
+                progress.report(processed)
+            job.result = sync.finish()
+            refresh_menu_snapshot(restaurant_id)
+        job.status = 'SUCCEEDED'
+        job.processed_categories = job.total_categories
+        job.error = None
+    except Exception as e:
+        logger.exception("Menu import %s failed", job.pk)
+        job.status = 'FAILED'
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'processed_categories', 'result', 'error', 'finished_at'])
+    return job
@@ -0,0 +1,95 @@
+"""
+Cross-restaurant dish search.
+
+Every menu item carries a `search_vector` document built from its name, its
+category name, the names of its customization options and its description,
+weighted in that order, and indexed with GIN. Documents are rebuilt per
+restaurant in one statement whenever its menu snapshot is, which every menu
+writer already does, and only rows whose document changed are written.
+
+Queries match every term as a prefix (`paneer tik` matches "Paneer Tikka"),
+so the endpoint doubles as type-ahead. The `simple` configuration is used
+as dish names are rarely English and should not be stemmed.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+
+from restaurants.models import MenuItem
+
+SEARCH_CONFIG = 'simple'
+
+# Terms beyond this are ignored
+MAX_QUERY_TERMS = 8
+
+REFRESH_SEARCH_VECTORS_SQL = f"""
+    UPDATE restaurants_menuitem AS item
+    SET search_vector = document.vector
+    FROM (
+        SELECT
+            menu_item.id,
+            setweight(to_tsvector('{SEARCH_CONFIG}', menu_item.name), 'A')
+            || setweight(to_tsvector('{SEARCH_CONFIG}', category.name), 'B')
+            || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(string_agg(customization_option.name, ' '), '')), 'C')
+            || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(menu_item.description, '')), 'D') AS vector
+        FROM restaurants_menuitem AS menu_item
+        JOIN restaurants_menucategory AS category ON category.id = menu_item.category_id
+        LEFT JOIN restaurants_customizationgroup AS customization_group
+            ON customization_group.menu_item_id = menu_item.id
+        LEFT JOIN restaurants_customizationoption AS customization_option
+            ON customization_option.group_id = customization_group.id
+        WHERE category.restaurant_id = %s
+        GROUP BY menu_item.id, category.name
+    ) AS document
+    WHERE item.id = document.id
+    AND item.search_vector IS DISTINCT FROM document.vector
+"""
+
+# Columns of a search result
+RESULT_FIELDS = {
+    "category": F('category__name'),
+    "restaurant_id": F('category__restaurant_id'),
+    "restaurant": F('category__restaurant__name'),
+}
+
+
+def refresh_search_vectors(restaurant_id):
+    """Rebuilds the search documents of a restaurant's menu items."""
+    with connection.cursor() as cursor:
+        cursor.execute(REFRESH_SEARCH_VECTORS_SQL, [restaurant_id])
+        return cursor.rowcount
+
+
+def build_search_query(text):
+    """
+    Turns user input into a prefix query matching every term, or None when
+    it holds no searchable term. Only word characters survive, so the input
+    cannot inject tsquery operators.
+    """
+    terms = re.findall(r'\w+', text.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return SearchQuery(
+        ' & '.join(f"{term}:*" for term in terms),
+        config=SEARCH_CONFIG,
+        search_type='raw'
+    )
+
+
+def search_menu_items(query, food_type=None, restaurant_ids=None):
+    """
+    Returns the menu items matching a query built by `build_search_query`
+    as dicts annotated with their `rank`, unordered.
+    """
+    items = MenuItem.objects.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    )
+    if food_type:
+        items = items.filter(food_type=food_type)
+    if restaurant_ids:
+        items = items.filter(category__restaurant_id__in=restaurant_ids)
+    return items.values(
+        'id', 'name', 'description', 'price', 'photo_url', 'food_type', 'rank', **RESULT_FIELDS
+    )
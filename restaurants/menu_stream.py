@@ -0,0 +1,124 @@
+"""
+Streaming menu uploads.
+
+Menus posted as NDJSON (`Content-Type: application/x-ndjson`) are parsed line
+by line straight from the request stream instead of being loaded whole
+through `request.data`. Each line holds one record, either a category or a
+menu item of the category before it:
+
+    {"type": "category", "name": "Drinks", "description": "Hot and cold"}
+    {"type": "item", "name": "Tea", "price": "20.00", "food_type": "VEG"}
+    {"type": "item", "name": "Coffee", "price": "30.00", "food_type": "VEG",
+     "customizable": true, "customization_groups": [{"name": "Milk", "options": [...]}]}
+
+Records are grouped into batches of at most `batch_size` records, in the
+category structure `MenuSync.apply_batch` expects. A category larger than a
+batch is split across consecutive batches under the same name, which the
+sync merges back. Only the current batch of the upload is ever held in
+memory, instead of the whole parsed body `request.data` would hold.
+
+That bounds parsing only. `MenuSync` still keeps the natural key and field
+values of every row of the restaurant's menu, and the snapshot refresh
+renders the whole menu once it is applied, so the memory of an upload still
+grows with the size of the menu, just well below that of a JSON upload of
+the same menu.
+"""
+import json
+
+from django.core.exceptions import ValidationError
+
+from restaurants.menu_sync import (
+    CATEGORY_DEFAULTS,
+    CATEGORY_FIELDS,
+    ITEM_DEFAULTS,
+    ITEM_FIELDS,
+    clean_field,
+)
+from restaurants.models import MenuCategory, MenuItem
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl')
+
+DEFAULT_STREAM_BATCH_SIZE = 200
+
+
+class MenuStreamError(ValueError):
+    """An invalid line of a streamed menu."""
+
+    def __init__(self, message, line_number=None):
+        super().__init__(message if line_number is None else f"Line {line_number}: {message}")
+        self.line_number = line_number
+
+
+def is_menu_stream(request):
+    return request.content_type in NDJSON_CONTENT_TYPES
+
+
+def iter_menu_records(lines):
+    """Decodes the non blank lines of a stream, yielding (line number, record)."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise MenuStreamError("Invalid JSON.", line_number)
+        if not isinstance(record, dict):
+            raise MenuStreamError("Expected an object.", line_number)
+        yield line_number, record
+
+
+def validate_menu_record(line_number, record):
+    """
+    Checks a record like `MenuSync` would check the row, so an invalid line
+    is reported as such rather than failing the write of its batch.
+    """
+    record_type = record.get("type")
+    if record_type not in ("category", "item"):
+        raise MenuStreamError("`type` must be 'category' or 'item'.", line_number)
+    if record.get("name") in (None, ""):
+        raise MenuStreamError("`name` is required.", line_number)
+
+    if record_type == "category":
+        model, fields, defaults = MenuCategory, CATEGORY_FIELDS, CATEGORY_DEFAULTS
+    else:
+        model, fields, defaults = MenuItem, ITEM_FIELDS, ITEM_DEFAULTS
+    for field in fields:
+        try:
+            clean_field(model, field, record, defaults)
+        except ValidationError as e:
+            raise MenuStreamError(f"`{field}`: {' '.join(e.messages)}", line_number)
+
+
+def iter_menu_batches(lines, batch_size=DEFAULT_STREAM_BATCH_SIZE):
+    """
+    Groups the records of a streamed menu into lists of category dicts
+    holding at most `batch_size` records (categories and menu items) each.
+    """
+    batch = []
+    category = None
+    size = 0
+
+    for line_number, record in iter_menu_records(lines):
+        validate_menu_record(line_number, record)
+        fields = {key: value for key, value in record.items() if key != "type"}
+        if record["type"] == "item" and category is None:
+            raise MenuStreamError("A menu item must follow its category.", line_number)
+
+        if size == batch_size:
+            yield batch
+            batch = []
+            size = 0
+            if record["type"] == "item":
+                # Carry the category over to the next batch
+                category = {**category, "menu_items": []}
+                batch.append(category)
+
+        if record["type"] == "category":
+            category = {**fields, "menu_items": []}
+            batch.append(category)
+        else:
+            category["menu_items"].append(fields)
+        size += 1
+
+    if batch:
+        yield batch
@@ -0,0 +1,265 @@
+"""
+Diff-based menu sync.
+
+Applies a menu posted to the menu endpoint onto the current menu of a
+restaurant. Rows are matched by natural key (category name, item name within
+its category, group name within its item, option name within its group):
+matching rows are updated in place only when a field changed, new rows are
+inserted with `bulk_create` and rows missing from the posted menu are deleted
+in batches. Rows left untouched keep their primary keys, so orders keep
+pointing at the items they were placed for.
+
+Posted values are converted and checked like the model fields would on
+save; a missing or invalid one raises `MenuSyncError`, which callers report
+as a validation error once the transaction rolled back.
+
+The menu is processed batch by batch of categories, so callers can feed it
+incrementally; deletions are only worked out once every batch was applied.
+Must run inside the transaction that bumped the restaurant's menu version to
+`version`.
+"""
+from django.core.exceptions import ValidationError
+
+from restaurants.menu_changes import record_removed_menu_rows
+from restaurants.models import (
+    MenuCategory,
+    MenuItem,
+    CustomizationGroup,
+    CustomizationOption,
+)
+
+DEFAULT_BATCH_SIZE = 500
+
+CATEGORY_FIELDS = ('description',)
+ITEM_FIELDS = (
+    'description', 'price', 'photo_url', 'customizable', 'food_type',
+    'spice_level', 'sweetness_level', 'must_try'
+)
+GROUP_FIELDS = ('max_options_allowed', 'min_options_allowed')
+OPTION_FIELDS = ('price', 'food_type', 'spice_level', 'sweetness_level')
+
+# Values of the fields missing from a posted menu
+CATEGORY_DEFAULTS = {"description": ""}
+ITEM_DEFAULTS = {
+    "description": "",
+    "photo_url": "",
+    "customizable": False,
+    "spice_level": 0,
+    "sweetness_level": 0,
+    "must_try": False,
+}
+GROUP_DEFAULTS = {"max_options_allowed": 1, "min_options_allowed": 0}
+OPTION_DEFAULTS = {"price": 0.0, "spice_level": 0, "sweetness_level": 0}
+
+# Fields whose posted value must be one of the field's choices. Spice and
+# sweetness levels have always defaulted to 0, outside their choices.
+CHOICE_FIELDS = ('food_type',)
+
+
+class MenuSyncError(ValueError):
+    """A posted menu row that cannot be written."""
+
+
+def clean_field(model, field_name, data, defaults):
+    """
+    Value of a field of a posted row, converted and checked like the model
+    field would on save. Fields without a default are required. Raises
+    `ValidationError`.
+    """
+    field = model._meta.get_field(field_name)
+    value = field.to_python(data[field_name] if field_name in data else defaults.get(field_name))
+    if value is None and not field.null:
+        raise ValidationError(field.error_messages['required'], code='required')
+    if field_name in CHOICE_FIELDS:
+        field.validate(value, None)
+    field.run_validators(value)
+    return value
+
+
+def chunked(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class MenuSync:
+
+    def __init__(self, restaurant_id, version, batch_size=DEFAULT_BATCH_SIZE):
+        self.restaurant_id = restaurant_id
+        self.version = version
+        self.batch_size = batch_size
+        self.counts = {"inserted": 0, "updated": 0, "deleted": 0}
+        self.seen = {model: set() for model in (MenuCategory, MenuItem, CustomizationGroup, CustomizationOption)}
+
+        # Natural key -> (pk, field values) of the current rows
+        self.categories = {
+            name: (pk, tuple(values))
+            for pk, name, *values in MenuCategory.objects.filter(
+                restaurant_id=restaurant_id
+            ).values_list('pk', 'name', *CATEGORY_FIELDS)
+        }
+        self.items = {
+            (category_id, name): (pk, tuple(values))
+            for pk, category_id, name, *values in MenuItem.objects.filter(
+                category__restaurant_id=restaurant_id
+            ).values_list('pk', 'category_id', 'name', *ITEM_FIELDS)
+        }
+        self.groups = {
+            (menu_item_id, name): (pk, tuple(values))
+            for pk, menu_item_id, name, *values in CustomizationGroup.objects.filter(
+                menu_item__category__restaurant_id=restaurant_id
+            ).values_list('pk', 'menu_item_id', 'name', *GROUP_FIELDS)
+        }
+        self.options = {
+            (group_id, name): (pk, tuple(values))
+            for pk, group_id, name, *values in CustomizationOption.objects.filter(
+                group__menu_item__category__restaurant_id=restaurant_id
+            ).values_list('pk', 'group_id', 'name', *OPTION_FIELDS)
+        }
+
+    @staticmethod
+    def clean_values(model, fields, data, defaults):
+        """
+        Field values of a posted row, see `clean_field`. Raises
+        `MenuSyncError` on a missing or invalid value.
+        """
+        values = []
+        for field in fields:
+            try:
+                values.append(clean_field(model, field, data, defaults))
+            except ValidationError as e:
+                raise MenuSyncError(
+                    f"{model._meta.verbose_name} {data.get('name')!r}: `{field}`: {' '.join(e.messages)}"
+                )
+        return tuple(values)
+
+    def sync_rows(self, model, fields, existing, rows):
+        """
+        Inserts or updates one level of the menu. `rows` holds a
+        (natural key, identifying attributes, field values) tuple per posted
+        row. Returns the primary keys of the rows, in order.
+        """
+        created = {}
+        updated = {}
+        for key, attributes, values in rows:
+            if key in created:
+                # Repeated natural key, the last occurrence wins
+                for field, value in zip(fields, values):
+                    setattr(created[key][0], field, value)
+                created[key] = (created[key][0], values)
+                continue
+
+            current = existing.get(key)
+            if current is None:
+                created[key] = (
+                    model(**attributes, **dict(zip(fields, values)), change_seq=self.version),
+                    values
+                )
+            elif current[1] != values:
+                updated[current[0]] = model(
+                    pk=current[0], **dict(zip(fields, values)), change_seq=self.version
+                )
+                existing[key] = (current[0], values)
+
+        model.objects.bulk_create([obj for obj, _ in created.values()], batch_size=self.batch_size)
+        for key, (obj, values) in created.items():
+            existing[key] = (obj.pk, values)
+        if updated:
+            model.objects.bulk_update(
+                updated.values(), [*fields, 'change_seq'], batch_size=self.batch_size
+            )
+        self.counts["inserted"] += len(created)
+        self.counts["updated"] += len(updated)
+
+        pks = [existing[key][0] for key, _, _ in rows]
+        self.seen[model].update(pks)
+        return pks
+
+    def apply_batch(self, categories):
+        """Applies a batch of posted categories, each with its menu items."""
+        category_pks = self.sync_rows(MenuCategory, CATEGORY_FIELDS, self.categories, [
+            (
+                category_data["name"],
+                {"restaurant_id": self.restaurant_id, "name": category_data["name"]},
+                self.clean_values(MenuCategory, CATEGORY_FIELDS, category_data, CATEGORY_DEFAULTS)
+            )
+            for category_data in categories
+        ])
+
+        items = [
+            (category_pk, item_data)
+            for category_pk, category_data in zip(category_pks, categories)
+            for item_data in category_data.get("menu_items", [])
+        ]
+        item_pks = self.sync_rows(MenuItem, ITEM_FIELDS, self.items, [
+            (
+                (category_pk, item_data["name"]),
+                {"category_id": category_pk, "name": item_data["name"]},
+                self.clean_values(MenuItem, ITEM_FIELDS, item_data, ITEM_DEFAULTS)
+            )
+            for category_pk, item_data in items
+        ])
+
+        # Customizations are only kept for customizable items
+        groups = [
+            (item_pk, group_data)
+            for item_pk, (_, item_data) in zip(item_pks, items)
+            if item_data.get("customizable")
+            for group_data in item_data.get("customization_groups", [])
+        ]
+        group_pks = self.sync_rows(CustomizationGroup, GROUP_FIELDS, self.groups, [
+            (
+                (item_pk, group_data["name"]),
+                {"menu_item_id": item_pk, "name": group_data["name"]},
+                self.clean_values(CustomizationGroup, GROUP_FIELDS, group_data, GROUP_DEFAULTS)
+            )
+            for item_pk, group_data in groups
+        ])
+
+        self.sync_rows(CustomizationOption, OPTION_FIELDS, self.options, [
+            (
+                (group_pk, option_data["name"]),
+                {"group_id": group_pk, "name": option_data["name"]},
+                self.clean_values(CustomizationOption, OPTION_FIELDS, option_data, OPTION_DEFAULTS)
+            )
+            for group_pk, (_, group_data) in zip(group_pks, groups)
+            for option_data in group_data.get("options", [])
+        ])
+
+    def finish(self):
+        """
+        Deletes the rows missing from the posted menu and returns the
+        inserted/updated/deleted row counts. Rows below a deleted row go with
+        it, so only rows whose parent survives are deleted explicitly.
+        """
+        levels = [
+            (MenuCategory, [
+                pk for pk, _ in self.categories.values()
+                if pk not in self.seen[MenuCategory]
+            ]),
+            (MenuItem, [
+                pk for (category_pk, _), (pk, _) in self.items.items()
+                if pk not in self.seen[MenuItem] and category_pk in self.seen[MenuCategory]
+            ]),
+            (CustomizationGroup, [
+                pk for (item_pk, _), (pk, _) in self.groups.items()
+                if pk not in self.seen[CustomizationGroup] and item_pk in self.seen[MenuItem]
+            ]),
+            (CustomizationOption, [
+                pk for (group_pk, _), (pk, _) in self.options.items()
+                if pk not in self.seen[CustomizationOption] and group_pk in self.seen[CustomizationGroup]
+            ]),
+        ]
+        for model, pks in levels:
+            for batch in chunked(pks, self.batch_size):
+                self.counts["deleted"] += record_removed_menu_rows(
+                    self.restaurant_id, model, batch, self.version
+                )
+                model.objects.filter(pk__in=batch).delete()
+        return self.counts
+
+    def apply(self, categories):
+        """Applies a whole posted menu, see `apply_batch` and `finish`."""
+        for batch in chunked(categories, self.batch_size):
+            self.apply_batch(batch)
+        return self.finish()
@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0014_restaurant_menu_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuSnapshot',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='menu_snapshot', serialize=False, to='restaurants.restaurant')),
+                ('version', models.PositiveIntegerField(help_text='Menu version the snapshot was rendered from')),
+                ('etag', models.CharField(help_text='ETag of the rendered menu', max_length=100)),
+                ('payload', models.BinaryField(help_text='Rendered JSON response body')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Menu Snapshot',
+                'verbose_name_plural': 'Menu Snapshots',
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def change_seq_field():
+    return models.PositiveIntegerField(db_index=True, default=0, editable=False, help_text='Menu version of the last change to this row')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0015_menusnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menucategory',
+            name='change_seq',
+            field=change_seq_field(),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='change_seq',
+            field=change_seq_field(),
+        ),
+        migrations.AddField(
+            model_name='customizationgroup',
+            name='change_seq',
+            field=change_seq_field(),
+        ),
+        migrations.AddField(
+            model_name='customizationoption',
+            name='change_seq',
+            field=change_seq_field(),
+        ),
+        migrations.CreateModel(
+            name='MenuTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Menu Category'), ('item', 'Menu Item'), ('group', 'Customization Group'), ('option', 'Customization Option')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('change_seq', models.PositiveIntegerField(help_text='Menu version the row was removed in')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='menu_tombstones', to='restaurants.restaurant')),
+            ],
+            options={
+                'verbose_name': 'Menu Tombstone',
+                'verbose_name_plural': 'Menu Tombstones',
+                'indexes': [models.Index(fields=['restaurant', 'change_seq'], name='restaurants_restaur_d2f4b8_idx')],
+            },
+        ),
+    ]
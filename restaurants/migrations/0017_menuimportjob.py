@@ -0,0 +1,35 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0016_menu_change_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed')], default='QUEUED', help_text='Current status of the import', max_length=10)),
+                ('payload', models.JSONField(help_text='Menu categories to import')),
+                ('total_categories', models.PositiveIntegerField(default=0)),
+                ('processed_categories', models.PositiveIntegerField(default=0)),
+                ('result', models.JSONField(blank=True, help_text='Inserted/updated/deleted row counts of a finished import', null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='menu_import_jobs', to='restaurants.restaurant')),
+            ],
+            options={
+                'verbose_name': 'Menu Import Job',
+                'verbose_name_plural': 'Menu Import Jobs',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='restaurants_status_84af34_idx')],
+            },
+        ),
+    ]
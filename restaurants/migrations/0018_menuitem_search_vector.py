@@ -0,0 +1,47 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Builds the search documents of the existing menu items, see
+# restaurants.menu_search.REFRESH_SEARCH_VECTORS_SQL
+BACKFILL_SEARCH_VECTORS_SQL = """
+    UPDATE restaurants_menuitem AS item
+    SET search_vector = document.vector
+    FROM (
+        SELECT
+            menu_item.id,
+            setweight(to_tsvector('simple', menu_item.name), 'A')
+            || setweight(to_tsvector('simple', category.name), 'B')
+            || setweight(to_tsvector('simple', coalesce(string_agg(customization_option.name, ' '), '')), 'C')
+            || setweight(to_tsvector('simple', coalesce(menu_item.description, '')), 'D') AS vector
+        FROM restaurants_menuitem AS menu_item
+        JOIN restaurants_menucategory AS category ON category.id = menu_item.category_id
+        LEFT JOIN restaurants_customizationgroup AS customization_group
+            ON customization_group.menu_item_id = menu_item.id
+        LEFT JOIN restaurants_customizationoption AS customization_option
+            ON customization_option.group_id = customization_group.id
+        GROUP BY menu_item.id, category.name
+    ) AS document
+    WHERE item.id = document.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0017_menuimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Dish search document, maintained by restaurants.menu_search', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='restaurants_search__e6f6d2_gin'),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTORS_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,17 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0018_menuitem_search_vector'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='location',
+            name='location',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, help_text='Filled in from latitude/longitude on save, used by nearby searches', null=True, srid=4326),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Frozen copy of the bitmap layout of restaurants.schedules at the time of
+# this migration, so later changes to that module cannot alter it
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+BITMAP_BYTES = MINUTES_PER_WEEK // 8
+
+
+def minute_of_day(value):
+    return value.hour * 60 + value.minute
+
+
+def window_intervals(weekday, from_hour, to_hour, cutoff=None):
+    start = (weekday - 1) * MINUTES_PER_DAY + minute_of_day(from_hour)
+    length = (minute_of_day(to_hour) - minute_of_day(from_hour)) % MINUTES_PER_DAY or MINUTES_PER_DAY
+    if cutoff is not None:
+        cutoff_offset = (minute_of_day(cutoff) - minute_of_day(from_hour)) % MINUTES_PER_DAY
+        if 0 < cutoff_offset < length:
+            length = cutoff_offset
+    end = start + length
+    if end <= MINUTES_PER_WEEK:
+        return [(start, end)]
+    return [(start, MINUTES_PER_WEEK), (0, end - MINUTES_PER_WEEK)]
+
+
+def windows_bitmap(windows, cutoff=None):
+    """One bit per minute of the week, bit `m % 8` of byte `m // 8`."""
+    bitmap = bytearray(BITMAP_BYTES)
+    for weekday, from_hour, to_hour in windows:
+        for start, end in window_intervals(weekday, from_hour, to_hour, cutoff):
+            for minute in range(start, end):
+                bitmap[minute >> 3] |= 1 << (minute & 7)
+    return bytes(bitmap)
+
+
+def compile_opening_bitmaps(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    windows = defaultdict(list)
+    opening_times = Restaurant.opening_times.through.objects.values_list(
+        'restaurant_id', 'openingtime__weekday', 'openingtime__from_hour', 'openingtime__to_hour'
+    )
+    for restaurant_id, weekday, from_hour, to_hour in opening_times:
+        windows[restaurant_id].append((weekday, from_hour, to_hour))
+
+    restaurants = [
+        Restaurant(
+            pk=restaurant_id,
+            opening_bitmap=windows_bitmap(windows[restaurant_id], cutoff)
+        )
+        for restaurant_id, cutoff in Restaurant.objects.values_list('id', 'kitchen_closing_time')
+    ]
+    Restaurant.objects.bulk_update(restaurants, ['opening_bitmap'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0019_location_geography'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='opening_bitmap',
+            field=models.BinaryField(editable=False, help_text='Opening hours compiled to one bit per minute of the week, see restaurants.opening_hours', null=True),
+        ),
+        migrations.RunPython(compile_opening_bitmaps, migrations.RunPython.noop),
+    ]
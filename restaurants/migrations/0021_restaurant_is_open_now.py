@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0020_restaurant_opening_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='is_open_now',
+            field=models.BooleanField(db_index=True, default=False, editable=False, help_text='Online and within opening hours, maintained by run_open_now_scheduler'),
+        ),
+    ]
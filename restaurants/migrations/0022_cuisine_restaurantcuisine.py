@@ -0,0 +1,86 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def parse_cuisines(text):
+    """
+    Frozen copy of restaurants.cuisines.parse_cuisines at the time of this
+    migration: display names by slug, in order and without duplicates.
+    """
+    cuisines = {}
+    for name in (text or '').split(','):
+        name = ' '.join(name.split())
+        slug = slugify(name, allow_unicode=True)
+        if slug:
+            cuisines.setdefault(slug, name)
+    return cuisines
+
+
+def link_restaurant_cuisines(apps, schema_editor):
+    Cuisine = apps.get_model('restaurants', 'Cuisine')
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    RestaurantCuisine = apps.get_model('restaurants', 'RestaurantCuisine')
+
+    restaurant_cuisines = {
+        restaurant_id: parse_cuisines(text)
+        for restaurant_id, text in Restaurant.objects.values_list('id', 'cuisines').iterator()
+    }
+    all_cuisines = {}
+    for cuisines in restaurant_cuisines.values():
+        for slug, name in cuisines.items():
+            all_cuisines.setdefault(slug, name)
+    Cuisine.objects.bulk_create(
+        [Cuisine(slug=slug, name=name) for slug, name in all_cuisines.items()],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    cuisine_ids = dict(Cuisine.objects.values_list('slug', 'id'))
+
+    RestaurantCuisine.objects.bulk_create(
+        [
+            RestaurantCuisine(restaurant_id=restaurant_id, cuisine_id=cuisine_ids[slug])
+            for restaurant_id, cuisines in restaurant_cuisines.items()
+            for slug in cuisines
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0021_restaurant_is_open_now'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cuisine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.SlugField(allow_unicode=True, help_text='Normalized name identifying the cuisine', max_length=200, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Cuisine',
+                'verbose_name_plural': 'Cuisines',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RestaurantCuisine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cuisine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restaurant_links', to='restaurants.cuisine')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cuisine_links', to='restaurants.restaurant')),
+            ],
+            options={
+                'verbose_name': 'Restaurant Cuisine',
+                'verbose_name_plural': 'Restaurant Cuisines',
+                'indexes': [models.Index(fields=['cuisine', 'restaurant'], name='restaurants_cuisine_409c0e_idx')],
+                'unique_together': {('restaurant', 'cuisine')},
+            },
+        ),
+        migrations.RunPython(link_restaurant_cuisines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0023_restaurant_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuimportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last time the worker running the import reported in', null=True),
+        ),
+        # Imports running at deploy time are reclaimed by heartbeat from now on
+        migrations.RunSQL(
+            "UPDATE restaurants_menuimportjob SET heartbeat_at = started_at WHERE status = 'RUNNING'",
+            migrations.RunSQL.noop,
+        ),
+    ]
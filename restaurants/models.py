@@ -1,13 +1,19 @@
-from datetime import datetime
 from geopy.distance import geodesic
+import numpy as np
 
 
 from django.contrib.gis.db import models
+from django.contrib.gis.geos import Point
+from django.db.models import F, Func, Value
+from django.db.models.functions import Coalesce, Upper
+from django.db.models.lookups import Exact
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import RegexValidator
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 
-from restaurants.base import BaseModel
+from restaurants.schedules import IntervalSet, bitmap_contains, minute_of_week
 
 # Weekdays Constant
 WEEKDAYS = [
@@ -120,20 +126,85 @@ class BankAccount(models.Model):
         unique_together = ['account_number', 'ifsc_code']
 
 class Location(models.Model):
-    location = models.PointField(blank=True, null=True)
+    location = models.PointField(
+        geography=True,
+        srid=4326,
+        blank=True,
+        null=True,
+        help_text="Filled in from latitude/longitude on save, used by nearby searches"
+    )
     longitude = models.FloatField()
     latitude = models.FloatField()
 
+    # Mean earth radius (IUGG), used by the haversine approximation
+    EARTH_RADIUS_KM = 6371.0088
+
+    def save(self, *args, **kwargs):
+        self.location = Point(self.longitude, self.latitude, srid=4326)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'location'}
+        super().save(*args, **kwargs)
+
     def distance_to(self, other_location):
         return geodesic(
             (self.latitude, self.longitude),
             (other_location.latitude, other_location.longitude)
         ).km
 
+    @classmethod
+    def distances_from(cls, latitude, longitude, locations):
+        """
+        Distances in km from a point to many locations at once, computed with
+        the haversine formula over NumPy arrays instead of one geopy call per
+        pair. `locations` holds Location instances or (latitude, longitude)
+        pairs; the result is an array in the same order.
+
+        Haversine assumes a spherical earth: results are within 0.6% of
+        geopy's `geodesic` (the ellipsoidal distance `distance_to` returns),
+        which is well below the precision nearby searches need.
+        """
+        coordinates = np.array([
+            (location.latitude, location.longitude) if isinstance(location, Location) else location
+            for location in locations
+        ], dtype=float).reshape(-1, 2)
+        latitudes = np.radians(coordinates[:, 0])
+        longitudes = np.radians(coordinates[:, 1])
+        origin_latitude, origin_longitude = np.radians(latitude), np.radians(longitude)
+
+        a = (
+            np.sin((latitudes - origin_latitude) / 2) ** 2
+            + np.cos(origin_latitude) * np.cos(latitudes) * np.sin((longitudes - origin_longitude) / 2) ** 2
+        )
+        return 2 * cls.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
 
     def __str__(self):
         return f"{self.latitude}, {self.longitude}"
 
+
+class GetBit(Func):
+    """Postgres `get_bit(bytea, n)`, see `restaurants.schedules.bitmap_contains`."""
+    function = 'get_bit'
+    output_field = models.IntegerField()
+
+
+class RestaurantQuerySet(models.QuerySet):
+
+    def with_open_at(self, at=None):
+        """Annotates `is_open_at_time`, whether each restaurant is open at `at` (default: now)."""
+        return self.annotate(
+            is_open_at_time=Exact(
+                Coalesce(GetBit(F('opening_bitmap'), Value(minute_of_week(at))), Value(0)), 1
+            )
+        )
+
+    def open_at(self, at=None):
+        """Restaurants open at `at` (default: now), evaluated in SQL from compiled opening hours."""
+        return self.filter(opening_bitmap__isnull=False).alias(
+            open_bit=GetBit(F('opening_bitmap'), Value(minute_of_week(at)))
+        ).filter(open_bit=1)
+
+
 class Restaurant(models.Model):
     # Category Choices
     CATEGORY_CHOICES = [
@@ -322,21 +393,46 @@ class Restaurant(models.Model):
         help_text="Check if the restaurant is currently open"
     )
 
+    menu_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented on every write to the restaurant menu"
+    )
+
+    is_open_now = models.BooleanField(
+        default=False,
+        db_index=True,
+        editable=False,
+        help_text="Online and within opening hours, maintained by run_open_now_scheduler"
+    )
+
+    opening_bitmap = models.BinaryField(
+        null=True,
+        editable=False,
+        help_text="Opening hours compiled to one bit per minute of the week, see restaurants.opening_hours"
+    )
+
     # Timestamp fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RestaurantQuerySet.as_manager()
+
+    def get_opening_hours(self):
+        """The compiled opening hours, compiled on the fly when missing."""
+        if self.opening_bitmap is not None:
+            return self.opening_bitmap
+        return IntervalSet.from_windows(
+            self.opening_times.values_list('weekday', 'from_hour', 'to_hour'),
+            self.kitchen_closing_time
+        ).to_bitmap()
+
+    def is_open_at(self, at=None):
+        return bitmap_contains(self.get_opening_hours(), minute_of_week(at))
+
     @property
     def is_open(self):
-        now = datetime.now()
-        current_weekday = now.weekday() + 1  # Monday=1
-        current_time = now.time()
-
-        return self.opening_times.filter(
-            weekday=current_weekday,
-            from_hour__lte=current_time,
-            to_hour__gte=current_time
-        ).exists()
+        return self.is_open_at()
 
     def __str__(self):
         return self.name
@@ -345,30 +441,89 @@ class Restaurant(models.Model):
         verbose_name = 'Restaurant'
         verbose_name_plural = 'Restaurants'
         ordering = ['-created_at']
+        indexes = [
+            # Trigram indexes for autocomplete and case insensitive searches,
+            # see restaurants.autocomplete
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='restaurant_name_trgm'),
+            GinIndex(OpClass(Upper('address'), name='gin_trgm_ops'), name='restaurant_address_trgm'),
+        ]
+
+class MenuSnapshot(models.Model):
+    """
+    Pre-rendered menu response of a restaurant, served as-is by the menu
+    endpoint. Rebuilt whenever the menu is written.
+    """
+    restaurant = models.OneToOneField(
+        Restaurant,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='menu_snapshot'
+    )
+    version = models.PositiveIntegerField(
+        help_text="Menu version the snapshot was rendered from"
+    )
+    etag = models.CharField(
+        max_length=100,
+        help_text="ETag of the rendered menu"
+    )
+    payload = models.BinaryField(
+        help_text="Rendered JSON response body"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Menu snapshot v{self.version} - {self.restaurant_id}"
+
+    class Meta:
+        verbose_name = 'Menu Snapshot'
+        verbose_name_plural = 'Menu Snapshots'
+
+class Cuisine(models.Model):
+    """A cuisine restaurants serve, parsed from `Restaurant.cuisines` (see restaurants.cuisines)."""
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(
+        max_length=200,
+        unique=True,
+        allow_unicode=True,
+        help_text="Normalized name identifying the cuisine"
+    )
+
+    def __str__(self):
+        return self.name
 
-#TODO: Add Cuisine model
-
-# class Cuisine(BaseModel):
-#     name = models.CharField(max_length=200, unique=True)
-#     restaurant = models.ForeignKey(
-#         Restaurant,
-#         on_delete=models.CASCADE,
-#         related_name='cuisines',
-#     )
-#
-#     def __str__(self):
-#         return self.name
-#
-#     class Meta:
-#         verbose_name = 'Cuisine'
-#         verbose_name_plural = 'Cuisines'
-#         ordering = ['name']
+    class Meta:
+        verbose_name = 'Cuisine'
+        verbose_name_plural = 'Cuisines'
+        ordering = ['name']
+
+
+class RestaurantCuisine(models.Model):
+    restaurant = models.ForeignKey(Restaurant, related_name='cuisine_links', on_delete=models.CASCADE)
+    cuisine = models.ForeignKey(Cuisine, related_name='restaurant_links', on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f"{self.restaurant_id} - {self.cuisine_id}"
+
+    class Meta:
+        verbose_name = 'Restaurant Cuisine'
+        verbose_name_plural = 'Restaurant Cuisines'
+        unique_together = ['restaurant', 'cuisine']
+        indexes = [
+            # Cuisine filters look restaurants up by cuisine
+            models.Index(fields=['cuisine', 'restaurant']),
+        ]
 
 # Menu Category (linked to Restaurant)
 class MenuCategory(models.Model):
     restaurant = models.ForeignKey(Restaurant, related_name="categories", on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
+    change_seq = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text="Menu version of the last change to this row"
+    )
 
     def __str__(self):
         return f"{self.name} - {self.restaurant.name}"
@@ -409,6 +564,22 @@ class MenuItem(models.Model):
         help_text="Select the availability times for this menu item"
     )
     must_try = models.BooleanField(default=False)
+    change_seq = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text="Menu version of the last change to this row"
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        help_text="Dish search document, maintained by restaurants.menu_search"
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector']),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.category.name}"
@@ -420,6 +591,12 @@ class CustomizationGroup(models.Model):
     name = models.CharField(max_length=255)
     max_options_allowed = models.PositiveIntegerField(default=1)  # Max number of options allowed
     min_options_allowed = models.PositiveIntegerField(default=0)  # Min number of options allowed
+    change_seq = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text="Menu version of the last change to this row"
+    )
 
     def __str__(self):
         return f"{self.name} - {self.menu_item.name}"
@@ -450,8 +627,94 @@ class CustomizationOption(models.Model):
         default=1,  # Default to Medium
         help_text="Select the sweetness level for this menu item (1 = Low, 2 = Medium, 3 = High)"
     )
+    change_seq = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text="Menu version of the last change to this row"
+    )
 
 
 def __str__(self):
         return f"{self.name} - {self.group.name}"
 
+
+class MenuTombstone(models.Model):
+    """
+    Records a menu row removed from a restaurant, so clients syncing the menu
+    incrementally learn about the removal.
+    """
+    KIND_CHOICES = [
+        ('category', 'Menu Category'),
+        ('item', 'Menu Item'),
+        ('group', 'Customization Group'),
+        ('option', 'Customization Option'),
+    ]
+
+    restaurant = models.ForeignKey(Restaurant, related_name="menu_tombstones", on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    change_seq = models.PositiveIntegerField(
+        help_text="Menu version the row was removed in"
+    )
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} removed in v{self.change_seq}"
+
+    class Meta:
+        verbose_name = 'Menu Tombstone'
+        verbose_name_plural = 'Menu Tombstones'
+        indexes = [
+            models.Index(fields=['restaurant', 'change_seq']),
+        ]
+
+
+class MenuImportJob(models.Model):
+    """
+    A menu posted for asynchronous import, picked up by the
+    `run_menu_import_worker` management command.
+    """
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+
+    restaurant = models.ForeignKey(Restaurant, related_name="menu_import_jobs", on_delete=models.CASCADE)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='QUEUED',
+        help_text="Current status of the import"
+    )
+    payload = models.JSONField(help_text="Menu categories to import")
+    total_categories = models.PositiveIntegerField(default=0)
+    processed_categories = models.PositiveIntegerField(default=0)
+    result = models.JSONField(
+        blank=True,
+        null=True,
+        help_text="Inserted/updated/deleted row counts of a finished import"
+    )
+    error = models.TextField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Last time the worker running the import reported in"
+    )
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Menu import #{self.id} - {self.restaurant_id} ({self.status})"
+
+    class Meta:
+        verbose_name = 'Menu Import Job'
+        verbose_name_plural = 'Menu Import Jobs'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
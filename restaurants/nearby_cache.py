@@ -0,0 +1,159 @@
+"""
+Geohash tiled cache of nearby restaurant lookups.
+
+Nearby lookups are snapped to the geohash tile (`PRECISION`) holding the
+searched point. The candidates of a tile, every restaurant within the
+search radius of any point of the tile, are loaded once and cached; each
+lookup then filters and ranks the cached candidates by their exact distance
+to the searched point with `Location.distances_from`. Lookups from anywhere
+in a busy neighbourhood hence share a cache entry and never reach PostGIS.
+
+Invalidation goes through version counters kept per coarse geohash cell
+(`COARSE_PRECISION`). A tile's cache key embeds the versions of every
+coarse cell its candidate area overlaps, and a restaurant write bumps the
+cell of the restaurant's location (see `restaurants.signals`), so entries
+are never served stale after a write, they just stop being looked up and
+expire. Writes through `QuerySet.update` bypass signals and must call
+`invalidate_nearby_location` themselves.
+
+That only holds when every worker sees the same counters, so tiles are only
+cached in a cache shared between processes (Redis, Memcached, database...).
+With a per-process cache like `LocMemCache`, the default when `CACHES` is
+not configured, a write would only invalidate the tiles of the worker
+handling it; lookups then go straight to the database instead.
+
+Settings (all optional):
+    NEARBY_CACHE = {
+        "PRECISION": 6,
+        "COARSE_PRECISION": 4,
+        "CACHE_ALIAS": "default",
+        "TIMEOUT": 300,
+    }
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.gis.measure import D
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from restaurants import geohash
+from restaurants.geo import (
+    CANDIDATE_FIELDS,
+    bounding_box,
+    bounding_box_candidates,
+    has_postgis,
+    make_point,
+    nearby_restaurants,
+    rank_candidates,
+)
+from restaurants.models import Location, Restaurant
+
+DEFAULT_NEARBY_CACHE = {
+    "PRECISION": 6,
+    "COARSE_PRECISION": 4,
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
+
+def get_nearby_cache_setting(name):
+    return getattr(settings, 'NEARBY_CACHE', {}).get(name, DEFAULT_NEARBY_CACHE[name])
+
+
+def get_cache():
+    """The cache holding tiles, or None when it is not shared between processes."""
+    cache = caches[get_nearby_cache_setting("CACHE_ALIAS")]
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return None
+    return cache
+
+
+def cell_version_key(cell):
+    return f"restaurants:nearby:version:{cell}"
+
+
+def get_cell_versions(cells):
+    """
+    Returns the version of each coarse cell. Missing counters start from the
+    current time rather than 0, so a counter evicted from the cache can never
+    go back to a version some stale entry was cached under.
+    """
+    cache = get_cache()
+    keys = {cell_version_key(cell): cell for cell in cells}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+    versions.update(cache.get_many(keys.keys() - versions.keys()))
+    return [versions.get(cell_version_key(cell), 0) for cell in sorted(cells)]
+
+
+def bump_cell_version(cell):
+    cache = get_cache()
+    if cache is None:
+        return
+    key = cell_version_key(cell)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_nearby_location(latitude, longitude):
+    """
+    Invalidates the cached lookups that may include a restaurant at a point.
+    Bumps right away and again once the current transaction commits, so a
+    lookup racing the write cannot keep the old state cached.
+    """
+    cell = geohash.encode(latitude, longitude, get_nearby_cache_setting("COARSE_PRECISION"))
+    bump_cell_version(cell)
+    transaction.on_commit(lambda: bump_cell_version(cell))
+
+
+def tile_candidate_area(tile, radius_km):
+    """Center and radius of a circle holding every point within `radius_km` of the tile."""
+    min_latitude, max_latitude, min_longitude, max_longitude = geohash.bounds(tile)
+    center = ((min_latitude + max_latitude) / 2, (min_longitude + max_longitude) / 2)
+    corner_distance = Location.distances_from(*center, [(max_latitude, max_longitude)])[0]
+    # Haversine may be 0.6% off the spheroid, widen the circle accordingly
+    return center, (radius_km + corner_distance) * 1.01
+
+
+def load_candidates(latitude, longitude, radius_km):
+    """Restaurants within `radius_km` of a point, and possibly a few more."""
+    if not has_postgis():
+        return bounding_box_candidates(latitude, longitude, radius_km)
+    return list(Restaurant.objects.filter(
+        location__location__dwithin=(make_point(latitude, longitude), D(km=radius_km))
+    ).values(*CANDIDATE_FIELDS))
+
+
+def get_tile_candidates(tile, radius_km):
+    (center_latitude, center_longitude), candidate_radius = tile_candidate_area(tile, radius_km)
+    min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(
+        center_latitude, center_longitude, candidate_radius
+    )
+    cells = geohash.covering(
+        min_latitude, max_latitude, min_longitude, max_longitude,
+        get_nearby_cache_setting("COARSE_PRECISION")
+    )
+    versions = hashlib.md5(repr(get_cell_versions(cells)).encode()).hexdigest()
+    key = f"restaurants:nearby:{tile}:{radius_km}:{versions}"
+
+    cache = get_cache()
+    candidates = cache.get(key)
+    if candidates is None:
+        candidates = load_candidates(center_latitude, center_longitude, candidate_radius)
+        cache.set(key, candidates, timeout=get_nearby_cache_setting("TIMEOUT"))
+    return candidates
+
+
+def cached_nearby_restaurants(latitude, longitude, radius_km, limit):
+    """`restaurants.geo.nearby_restaurants` answered from the tile cache."""
+    if get_cache() is None:
+        return nearby_restaurants(latitude, longitude, radius_km, limit)
+    tile = geohash.encode(latitude, longitude, get_nearby_cache_setting("PRECISION"))
+    return rank_candidates(latitude, longitude, get_tile_candidates(tile, radius_km), radius_km, limit)
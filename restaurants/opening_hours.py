@@ -0,0 +1,121 @@
+"""
+Compiled opening hours.
+
+The `OpeningTime` windows of a restaurant, cut short by its
+`kitchen_closing_time`, are compiled into `Restaurant.opening_bitmap`: one
+bit per minute of the week (see `restaurants.schedules.bitmap_contains`).
+Whether a restaurant is open is then a single bit lookup, in Python with
+`open_restaurant_ids` or in SQL with `Restaurant.objects.open_at()`, instead
+of a query over its opening times.
+
+Bitmaps are recompiled by `restaurants.signals` whenever opening times or the
+kitchen closing time change. Times are wall clock times in the current time
+zone, `settings.TIME_ZONE` by default.
+
+`Restaurant.is_open_now` materializes "online and open now" as an indexed
+column for listings to filter on. It is refreshed by
+`run_open_now_scheduler`, which only wakes up at the next minute any
+restaurant opens or closes (see `schedule_boundaries`), and right away for a
+restaurant whose opening hours or `is_online` flag change.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+
+from restaurants.models import GetBit, Restaurant
+from restaurants.schedules import MINUTES_PER_WEEK, IntervalSet, bitmap_contains, minute_of_week, window_intervals
+
+
+def compile_opening_bitmaps(restaurant_ids):
+    """Compiles the opening hours of many restaurants in two queries."""
+    restaurant_ids = list(restaurant_ids)
+    windows = defaultdict(list)
+    opening_times = Restaurant.opening_times.through.objects.filter(
+        restaurant_id__in=restaurant_ids
+    ).values_list(
+        'restaurant_id', 'openingtime__weekday', 'openingtime__from_hour', 'openingtime__to_hour'
+    )
+    for restaurant_id, weekday, from_hour, to_hour in opening_times:
+        windows[restaurant_id].append((weekday, from_hour, to_hour))
+
+    cutoffs = Restaurant.objects.filter(pk__in=restaurant_ids).values_list('id', 'kitchen_closing_time')
+    return {
+        restaurant_id: IntervalSet.from_windows(windows[restaurant_id], cutoff).to_bitmap()
+        for restaurant_id, cutoff in cutoffs
+    }
+
+
+def refresh_opening_bitmaps(restaurant_ids, batch_size=500):
+    """
+    Recompiles and stores the opening hours of restaurants, and refreshes
+    their `is_open_now`. Written with `bulk_update`, so no signal fires and
+    `updated_at` is left alone. Returns the compiled bitmaps by restaurant id.
+    """
+    bitmaps = compile_opening_bitmaps(restaurant_ids)
+    Restaurant.objects.bulk_update(
+        [Restaurant(pk=restaurant_id, opening_bitmap=bitmap) for restaurant_id, bitmap in bitmaps.items()],
+        ['opening_bitmap'],
+        batch_size=batch_size
+    )
+    refresh_open_now(restaurant_ids=bitmaps.keys())
+    return bitmaps
+
+
+def refresh_open_now(at=None, restaurant_ids=None):
+    """
+    Brings `is_open_now` in line with `is_online` and the opening hours at
+    `at` (default: now), for all or the given restaurants. Only rows whose
+    value flips are written. Returns the number of rows written.
+    """
+    restaurants = Restaurant.objects.all()
+    if restaurant_ids is not None:
+        restaurants = restaurants.filter(pk__in=list(restaurant_ids))
+    restaurants = restaurants.alias(
+        open_bit=Coalesce(GetBit(F('opening_bitmap'), Value(minute_of_week(at))), Value(0))
+    )
+
+    opened = restaurants.filter(is_open_now=False, is_online=True, open_bit=1).update(is_open_now=True)
+    closed = restaurants.filter(
+        Q(is_online=False) | Q(open_bit=0), is_open_now=True
+    ).update(is_open_now=False)
+    return opened + closed
+
+
+def schedule_boundaries():
+    """
+    Returns the sorted minutes of the week at which some restaurant opens or
+    closes, computed from the distinct opening windows in one query.
+    """
+    windows = Restaurant.opening_times.through.objects.values_list(
+        'openingtime__weekday', 'openingtime__from_hour', 'openingtime__to_hour',
+        'restaurant__kitchen_closing_time'
+    ).distinct()
+    boundaries = set()
+    for weekday, from_hour, to_hour, cutoff in windows:
+        for start, end in window_intervals(weekday, from_hour, to_hour, cutoff):
+            boundaries.update((start, end % MINUTES_PER_WEEK))
+    return sorted(boundaries)
+
+
+def minutes_until_next_boundary(boundaries, minute):
+    """Minutes from `minute` to the next boundary after it, None without boundaries."""
+    if not boundaries:
+        return None
+    index = bisect_right(boundaries, minute)
+    next_boundary = boundaries[index] if index < len(boundaries) else boundaries[0] + MINUTES_PER_WEEK
+    return next_boundary - minute
+
+
+def open_restaurant_ids(restaurants, at=None):
+    """
+    Returns the ids of the restaurants open at `at` (default: now), out of
+    restaurants loaded with their `opening_bitmap`, without any query.
+    """
+    minute = minute_of_week(at)
+    return {
+        restaurant.pk
+        for restaurant in restaurants
+        if restaurant.opening_bitmap is not None and bitmap_contains(restaurant.opening_bitmap, minute)
+    }
@@ -0,0 +1,92 @@
+"""
+Menu price tables for order pricing.
+
+Prices change rarely but are read by every order. The prices of a
+restaurant's menu items and customization options are loaded once into a
+`PriceTable` tagged with the menu version they were read at, and kept in an
+in-process LRU. Every menu write bumps the version, so a table is only
+rebuilt after the restaurant's menu changed, and orders otherwise never
+touch the menu tables.
+
+A table is only ever used for the version it is tagged with: orders take
+the menu version with `lock_menu_version` in the transaction writing them,
+which keeps menu writers out until they commit, and price from the table of
+that exact version (see `orders.serializers.OrderSerializer`).
+"""
+from django.db import transaction
+
+from restaurants.menu_cache import BUILD_ATTEMPTS, get_menu_version, lock_menu_version
+from restaurants.models import CustomizationOption, MenuItem
+from zapeat.std_utils import LRUCache
+
+price_table_cache = LRUCache(max_entries=1024)
+
+
+class PriceTable:
+    """Prices of the menu items and customization options of one restaurant."""
+
+    def __init__(self, version, item_prices, option_prices):
+        self.version = version
+        # {menu item id: price}
+        self.item_prices = item_prices
+        # {option id: (menu item id, price)}
+        self.option_prices = option_prices
+
+    def item_price(self, menu_item_id):
+        """Price of a menu item, or None when it is not on the menu."""
+        return self.item_prices.get(menu_item_id)
+
+    def option_price(self, option_id, menu_item_id):
+        """Price of a customization option, or None when the menu item does not offer it."""
+        menu_item_option = self.option_prices.get(option_id)
+        if menu_item_option is None or menu_item_option[0] != menu_item_id:
+            return None
+        return menu_item_option[1]
+
+
+def load_prices(restaurant_id):
+    item_prices = dict(
+        MenuItem.objects.filter(category__restaurant_id=restaurant_id).values_list('id', 'price')
+    )
+    option_prices = {
+        option_id: (menu_item_id, price)
+        for option_id, menu_item_id, price in CustomizationOption.objects.filter(
+            group__menu_item__category__restaurant_id=restaurant_id
+        ).values_list('id', 'group__menu_item_id', 'price')
+    }
+    return item_prices, option_prices
+
+
+def build_price_table(restaurant_id, version):
+    """
+    Builds the price table of a restaurant as of `version`, re-reading the
+    version after loading prices like `restaurants.menu_cache.build_menu`
+    so a menu write committing in between is never tagged with the wrong
+    version.
+    """
+    for _ in range(BUILD_ATTEMPTS):
+        prices = load_prices(restaurant_id)
+        current_version = get_menu_version(restaurant_id)
+        if current_version == version:
+            return PriceTable(version, *prices)
+        version = current_version
+
+    with transaction.atomic():
+        version = lock_menu_version(restaurant_id)
+        return PriceTable(version, *load_prices(restaurant_id))
+
+
+def get_price_table(restaurant_id, menu_version):
+    """
+    Returns the price table of a restaurant, built for `menu_version` unless
+    the menu moved on while it was being built: callers needing an exact
+    version must check `PriceTable.version`.
+    """
+    cached = price_table_cache.get(restaurant_id)
+    if cached is not None and cached.version == menu_version:
+        return cached
+
+    table = build_price_table(restaurant_id, menu_version)
+    if cached is None or table.version >= cached.version:
+        price_table_cache.set(restaurant_id, table)
+    return table
@@ -0,0 +1,103 @@
+"""
+Weekly schedule helpers.
+
+Weekly windows (opening times, item availabilities) are compiled into sorted,
+merged [start, end) intervals of minutes since Monday 00:00, which can be
+probed with a binary search, or into a bitmap holding one bit per minute of
+the week, which can be probed in constant time, in Python or in SQL.
+"""
+from bisect import bisect_right
+
+from django.utils import timezone
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+BITMAP_BYTES = MINUTES_PER_WEEK // 8
+
+
+def minute_of_week(value=None):
+    """Minutes since Monday 00:00 of an aware datetime (default: now), in local time."""
+    value = timezone.localtime(value)
+    return (value.isoweekday() - 1) * MINUTES_PER_DAY + value.hour * 60 + value.minute
+
+
+def minute_of_day(value):
+    return value.hour * 60 + value.minute
+
+
+def window_intervals(weekday, from_hour, to_hour, cutoff=None):
+    """
+    Returns the [start, end) minute-of-week intervals covered by a window
+    running from `from_hour` to `to_hour` on `weekday` (Monday=1).
+
+    A window ending at or before its start runs past midnight into the next
+    day, and a window running past Sunday midnight wraps to Monday. A window
+    starting and ending at the same time covers the whole day. A daily
+    `cutoff` time falling within the window ends it early.
+    """
+    start = (weekday - 1) * MINUTES_PER_DAY + minute_of_day(from_hour)
+    length = (minute_of_day(to_hour) - minute_of_day(from_hour)) % MINUTES_PER_DAY or MINUTES_PER_DAY
+    if cutoff is not None:
+        cutoff_offset = (minute_of_day(cutoff) - minute_of_day(from_hour)) % MINUTES_PER_DAY
+        if 0 < cutoff_offset < length:
+            length = cutoff_offset
+    end = start + length
+    if end <= MINUTES_PER_WEEK:
+        return [(start, end)]
+    return [(start, MINUTES_PER_WEEK), (0, end - MINUTES_PER_WEEK)]
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class IntervalSet:
+    """Sorted, merged minute-of-week intervals with O(log n) membership tests."""
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, intervals):
+        merged = merge_intervals(intervals)
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    @classmethod
+    def from_windows(cls, windows, cutoff=None):
+        """Builds the set out of (weekday, from_hour, to_hour) windows."""
+        intervals = []
+        for weekday, from_hour, to_hour in windows:
+            intervals.extend(window_intervals(weekday, from_hour, to_hour, cutoff))
+        return cls(intervals)
+
+    def to_bitmap(self):
+        """Packs the set into a bitmap, see `bitmap_contains`."""
+        bitmap = bytearray(BITMAP_BYTES)
+        for start, end in self:
+            for minute in range(start, end):
+                bitmap[minute >> 3] |= 1 << (minute & 7)
+        return bytes(bitmap)
+
+    def __contains__(self, minute):
+        index = bisect_right(self.starts, minute) - 1
+        return index >= 0 and minute < self.ends[index]
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+    def __bool__(self):
+        return bool(self.starts)
+
+
+def bitmap_contains(bitmap, minute):
+    """
+    Tests a minute of the week against a bitmap built by
+    `IntervalSet.to_bitmap`: 1260 bytes, bit `m % 8` of byte `m // 8` set
+    when minute `m` is covered. That is the bit order of Postgres'
+    `get_bit(bytea, m)`, so the same bitmap can be probed in SQL.
+    """
+    return bool(bitmap[minute >> 3] >> (minute & 7) & 1)
@@ -1,12 +1,18 @@
+from django.db import transaction
 from rest_framework import serializers
-from restaurants.models import Restaurant, Location, OpeningTime, BankAccount, MenuCategory, MenuItem, \
-    CustomizationGroup, CustomizationOption
+
+from zapeat.std_utils import DynamicFieldsMixin
+from restaurants.menu_cache import menu_restaurant_ids
+from restaurants.menu_changes import menu_rows_saved
+from restaurants.models import Cuisine, Restaurant, Location, OpeningTime, BankAccount, MenuCategory, MenuItem, \
+    CustomizationGroup, CustomizationOption, MenuImportJob
 
 
 class LocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Location
         fields = ['id', 'longitude', 'latitude', 'location']
+        read_only_fields = ['location']
 
 class OpeningTimeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,15 +24,16 @@ class BankAccountSerializer(serializers.ModelSerializer):
         model = BankAccount
         fields = ['id', 'account_name', 'account_number', 'ifsc_code', 'bank_name', 'branch_name']
 
-class RestaurantSerializer(serializers.ModelSerializer):
+class RestaurantSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     location = LocationSerializer(required=False, allow_null=True)
     opening_times = OpeningTimeSerializer(many=True, required=False)
     bank_accounts = BankAccountSerializer(many=True, required=False)
 
     class Meta:
         model = Restaurant
-        fields = '__all__'
+        exclude = ['opening_bitmap']
         read_only_fields = ['created_at', 'updated_at']
+        expandable_fields = ['location', 'opening_times', 'bank_accounts']
     
     def validate_services(self, value):
         valid_services = [choice[0] for choice in Restaurant.SERVICES_CHOICES]
@@ -100,25 +107,73 @@ class RestaurantSerializer(serializers.ModelSerializer):
 
         return instance
 
-class MenuCategorySerializer(serializers.ModelSerializer):
+class RestaurantListSerializer(serializers.ModelSerializer):
+    """Compact restaurant representation for discovery listings."""
+
+    class Meta:
+        model = Restaurant
+        fields = [
+            'id', 'name', 'category', 'cuisines', 'logo_url', 'address',
+            'is_online', 'is_open_now', 'created_at'
+        ]
+        read_only_fields = fields
+
+class CuisineSerializer(serializers.ModelSerializer):
+    restaurant_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Cuisine
+        fields = ['id', 'name', 'slug', 'restaurant_count']
+
+class MenuVersionSerializerMixin:
+    """
+    Records every write to menu rows made through the serializer: bumps the
+    menu version of the affected restaurants, tracks the change for menu sync
+    and rebuilds their menu snapshots.
+    """
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            menu_rows_saved(self.Meta.model, [instance.pk])
+        return instance
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            previous_restaurant_ids = menu_restaurant_ids(self.Meta.model, [instance.pk])
+            instance = super().update(instance, validated_data)
+            menu_rows_saved(self.Meta.model, [instance.pk], previous_restaurant_ids)
+        return instance
+
+
+class MenuCategorySerializer(MenuVersionSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = MenuCategory
         fields = '__all__'
 
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(MenuVersionSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = MenuItem
-        fields = '__all__'
+        exclude = ['search_vector']
 
 
-class CustomizationGroupSerializer(serializers.ModelSerializer):
+class CustomizationGroupSerializer(MenuVersionSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomizationGroup
         fields = '__all__'
 
 
-class CustomizationOptionSerializer(serializers.ModelSerializer):
+class CustomizationOptionSerializer(MenuVersionSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomizationOption
         fields = '__all__'
+
+
+class MenuImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MenuImportJob
+        fields = [
+            'id', 'restaurant', 'status', 'total_categories', 'processed_categories',
+            'result', 'error', 'attempts', 'created_at', 'started_at', 'heartbeat_at', 'finished_at'
+        ]
@@ -0,0 +1,168 @@
+"""
+Signal receivers keeping derived restaurant data up to date.
+
+Nearby cache (see `restaurants.nearby_cache`): a restaurant write may change
+what nearby lookups return around both its previous and its current
+location, so the coordinates a row had before the write are read in
+`pre_save` and both places are invalidated in `post_save`.
+
+Opening hours (see `restaurants.opening_hours`): the compiled opening hours
+and `is_open_now` of a restaurant are rebuilt whenever its opening times,
+its kitchen closing time or its `is_online` flag change.
+
+Cuisines (see `restaurants.cuisines`): the cuisine links of a restaurant are
+rebuilt from its `cuisines` text whenever it changes.
+
+Restaurant saves only run the receivers whose fields they may change: the
+values those fields had before the save are read in `pre_save`, along with
+the previous coordinates, unless `update_fields` leaves them all out.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from restaurants.cuisines import sync_restaurant_cuisines
+from restaurants.geo import NEARBY_FIELDS
+from restaurants.models import Location, OpeningTime, Restaurant
+from restaurants.nearby_cache import invalidate_nearby_location
+from restaurants.opening_hours import refresh_opening_bitmaps
+
+# Restaurant fields each post_save receiver derives data from
+NEARBY_RESTAURANT_FIELDS = (*(name for name in NEARBY_FIELDS if name != 'id'), 'location')
+CUISINE_FIELDS = ('cuisines',)
+# The compiled opening hours are saved along with the rest of the row, so a
+# save of a stale instance overwrites them and must rebuild them too
+OPENING_HOURS_FIELDS = ('kitchen_closing_time', 'is_online', 'opening_bitmap', 'is_open_now')
+
+
+def attnames(names):
+    return {Restaurant._meta.get_field(name).attname for name in names}
+
+
+TRACKED_RESTAURANT_FIELDS = attnames(NEARBY_RESTAURANT_FIELDS + CUISINE_FIELDS + OPENING_HOURS_FIELDS)
+
+
+def restaurant_fields_changed(instance, names, update_fields):
+    """
+    Whether a restaurant save may have changed any of the fields `names`:
+    they must be saved, and differ from the values read in `pre_save`, when
+    the row existed.
+    """
+    names = attnames(names)
+    if update_fields is not None and not names & attnames(update_fields):
+        return False
+    previous = getattr(instance, '_previous_values', None)
+    return previous is None or any(previous[name] != getattr(instance, name) for name in names)
+
+
+def invalidate_coordinates(*coordinates):
+    for point in set(coordinates):
+        if point is not None and None not in point:
+            invalidate_nearby_location(*point)
+
+
+def location_coordinates(location):
+    return None if location is None else (location.latitude, location.longitude)
+
+
+def restaurant_coordinates(restaurant):
+    if restaurant.location_id is None:
+        return None
+    return Location.objects.filter(
+        pk=restaurant.location_id
+    ).values_list('latitude', 'longitude').first()
+
+
+@receiver(pre_save, sender=Location)
+def remember_location_coordinates(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_coordinates = Location.objects.filter(
+            pk=instance.pk
+        ).values_list('latitude', 'longitude').first()
+
+
+@receiver(post_save, sender=Location)
+def location_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_coordinates(
+            getattr(instance, '_previous_coordinates', None), location_coordinates(instance)
+        )
+
+
+@receiver(pre_save, sender=Restaurant)
+def remember_restaurant_values(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_values = None
+    if instance.pk and not raw and (update_fields is None or TRACKED_RESTAURANT_FIELDS & attnames(update_fields)):
+        instance._previous_values = Restaurant.objects.filter(pk=instance.pk).values(
+            *TRACKED_RESTAURANT_FIELDS, 'location__latitude', 'location__longitude'
+        ).first()
+
+
+@receiver(post_save, sender=Restaurant)
+def restaurant_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and restaurant_fields_changed(instance, NEARBY_RESTAURANT_FIELDS, update_fields):
+        previous = getattr(instance, '_previous_values', None)
+        invalidate_coordinates(
+            previous and (previous['location__latitude'], previous['location__longitude']),
+            restaurant_coordinates(instance)
+        )
+
+
+@receiver(post_delete, sender=Location)
+def location_deleted(sender, instance, **kwargs):
+    invalidate_coordinates(location_coordinates(instance))
+
+
+@receiver(post_delete, sender=Restaurant)
+def restaurant_deleted(sender, instance, **kwargs):
+    invalidate_coordinates(restaurant_coordinates(instance))
+
+
+@receiver(post_save, sender=Restaurant)
+def link_restaurant_cuisines(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and restaurant_fields_changed(instance, CUISINE_FIELDS, update_fields):
+        sync_restaurant_cuisines(instance.pk, instance.cuisines)
+
+
+def refresh_restaurant_opening_hours(restaurant):
+    """Refreshes the opening hours of a restaurant, and its in-memory copy of them."""
+    restaurant.opening_bitmap = refresh_opening_bitmaps([restaurant.pk]).get(restaurant.pk)
+    restaurant.is_open_now = restaurant.is_online and restaurant.is_open
+
+
+@receiver(post_save, sender=Restaurant)
+def compile_restaurant_opening_hours(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and restaurant_fields_changed(instance, OPENING_HOURS_FIELDS, update_fields):
+        refresh_restaurant_opening_hours(instance)
+
+
+@receiver(m2m_changed, sender=Restaurant.opening_times.through)
+def opening_times_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_restaurant_opening_hours(instance)
+        return
+
+    # Restaurants added to or removed from an opening time
+    if action == 'pre_clear':
+        instance._cleared_restaurant_ids = list(instance.restaurants.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        refresh_opening_bitmaps(getattr(instance, '_cleared_restaurant_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_opening_bitmaps(pk_set)
+
+
+@receiver(post_save, sender=OpeningTime)
+def opening_time_saved(sender, instance, created, raw=False, **kwargs):
+    # A new opening time has no restaurant yet, adding it fires m2m_changed
+    if not created and not raw:
+        refresh_opening_bitmaps(instance.restaurants.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=OpeningTime)
+def remember_opening_time_restaurants(sender, instance, **kwargs):
+    instance._restaurant_ids = list(instance.restaurants.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=OpeningTime)
+def opening_time_deleted(sender, instance, **kwargs):
+    refresh_opening_bitmaps(getattr(instance, '_restaurant_ids', []))
@@ -1,3 +1,1106 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+
+from restaurants import geohash
+from restaurants.autocomplete import prefix_cache
+from restaurants.availability import filtered_menu_cache
+from restaurants.cuisines import parse_cuisines
+from restaurants.geo import nearby_restaurants, nearby_restaurants_in_python
+from restaurants.menu import load_menu_tree, serialize_menu
+from restaurants.menu_cache import (
+    MENU_RESTAURANT_FIELDS,
+    bump_menu_version,
+    get_menu_document,
+    local_cache,
+    rebuild_menu_snapshots,
+    render_menu_document,
+    store_newer_menu_snapshot,
+)
+from restaurants.menu_imports import claim_menu_import, run_menu_import, validate_menu
+from restaurants.menu_stream import iter_menu_batches
+from restaurants.serializers import MenuItemSerializer
+from restaurants.opening_hours import (
+    minutes_until_next_boundary,
+    open_restaurant_ids,
+    refresh_open_now,
+    schedule_boundaries,
+)
+from restaurants.schedules import MINUTES_PER_DAY, IntervalSet, bitmap_contains
+from restaurants.models import (
+    Cuisine,
+    Restaurant,
+    Location,
+    OpeningTime,
+    ItemAvailability,
+    MenuImportJob,
+    MenuSnapshot,
+    MenuCategory,
+    MenuItem,
+    CustomizationGroup,
+    CustomizationOption,
+)
+
+# A cache shared between processes, as the nearby tile cache requires
+SHARED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "zapeat-tests-cache"),
+    }
+}
+
+
+def create_restaurant(suffix=1, **extra_fields):
+    fields = {
+        "category": "CANTEEN",
+        "cuisines": "North Indian, Chinese",
+        "name": f"Restaurant {suffix}",
+        "mobile_number": f"+91900000{suffix:04d}",
+        "email": f"restaurant{suffix}@example.com",
+        "address": "Main Road",
+        "fssai_license_number": f"FSSAI{suffix:06d}",
+        "gst_number": f"GST{suffix:06d}",
+    }
+    fields.update(extra_fields)
+    return Restaurant.objects.create(**fields)
+
+
+def create_restaurant_with_hours(suffix, windows, **extra_fields):
+    restaurant = create_restaurant(suffix, **extra_fields)
+    restaurant.opening_times.add(*[
+        OpeningTime.objects.create(weekday=weekday, from_hour=from_hour, to_hour=to_hour)
+        for weekday, from_hour, to_hour in windows
+    ])
+    return restaurant
+
+
+def create_menu(restaurant, categories, items_per_category, groups_per_item=1, options_per_group=2):
+    for c in range(categories):
+        category = MenuCategory.objects.create(restaurant=restaurant, name=f"Category {c}")
+        for i in range(items_per_category):
+            item = MenuItem.objects.create(
+                category=category,
+                name=f"Item {c}-{i}",
+                price="100.00",
+                customizable=True,
+                food_type="VEG",
+            )
+            for g in range(groups_per_item):
+                group = CustomizationGroup.objects.create(menu_item=item, name=f"Group {g}")
+                for o in range(options_per_group):
+                    CustomizationOption.objects.create(
+                        group=group,
+                        name=f"Option {o}",
+                        price="10.00",
+                        food_type="VEG",
+                    )
+
+
+class MenuTreeLoaderTests(TestCase):
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_menu_size(self):
+        small = create_restaurant(1)
+        large = create_restaurant(2)
+        create_menu(small, categories=1, items_per_category=1)
+        create_menu(large, categories=8, items_per_category=10, groups_per_item=2, options_per_group=3)
+
+        small_queries = self.count_queries(lambda: load_menu_tree(small.id))
+        large_queries = self.count_queries(lambda: load_menu_tree(large.id))
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertLessEqual(large_queries, 4)
+
+    def test_menu_endpoint_query_count_does_not_depend_on_menu_size(self):
+        small = create_restaurant(1)
+        large = create_restaurant(2)
+        create_menu(small, categories=1, items_per_category=1)
+        create_menu(large, categories=8, items_per_category=10, groups_per_item=2, options_per_group=3)
+
+        small_queries = self.count_queries(
+            lambda: self.client.get(reverse('restaurant-menu', kwargs={'pk': small.id}))
+        )
+        large_queries = self.count_queries(
+            lambda: self.client.get(reverse('restaurant-menu', kwargs={'pk': large.id}))
+        )
+
+        self.assertEqual(small_queries, large_queries)
+
+    def test_tree_is_assembled_in_order(self):
+        restaurant = create_restaurant(1)
+        create_menu(restaurant, categories=2, items_per_category=2, groups_per_item=1, options_per_group=2)
+
+        categories = load_menu_tree(restaurant.id)
+
+        self.assertEqual([c.name for c in categories], ["Category 0", "Category 1"])
+        self.assertEqual([i.name for i in categories[1].menu_items], ["Item 1-0", "Item 1-1"])
+        self.assertEqual(len(categories[0].menu_items[0].groups), 1)
+        self.assertEqual(
+            [o.name for o in categories[0].menu_items[0].groups[0].group_options],
+            ["Option 0", "Option 1"]
+        )
+
+
+class MenuCacheTests(TestCase):
+
+    def setUp(self):
+        local_cache.clear()
+
+    def get_restaurant(self, pk):
+        return Restaurant.objects.only(*MENU_RESTAURANT_FIELDS).get(pk=pk)
+
+    def post_menu(self, restaurant, menu):
+        return self.client.post(
+            reverse('restaurant-menu', kwargs={'pk': restaurant.id}),
+            {"menu": menu},
+            content_type='application/json'
+        )
+
+    def test_cached_menu_is_served_until_the_menu_version_moves(self):
+        restaurant = create_restaurant(1)
+        create_menu(restaurant, categories=1, items_per_category=1)
+
+        cached_restaurant = self.get_restaurant(restaurant.id)
+        document = get_menu_document(cached_restaurant)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_menu_document(cached_restaurant), document)
+
+        self.post_menu(restaurant, [{"name": "Drinks", "menu_items": [{"name": "Tea", "price": "20.00", "food_type": "VEG"}]}])
+
+        new_document = get_menu_document(self.get_restaurant(restaurant.id))
+        self.assertEqual(new_document.version, document.version + 1)
+        self.assertEqual(json.loads(new_document.payload)["data"]["menu"][0]["name"], "Drinks")
+
+    def test_menu_writes_rebuild_the_snapshot_served_by_the_endpoint(self):
+        restaurant = create_restaurant(1)
+        self.post_menu(restaurant, [{"name": "Drinks", "menu_items": [{"name": "Tea", "price": "20.00", "food_type": "VEG"}]}])
+        restaurant.refresh_from_db()
+
+        snapshot = MenuSnapshot.objects.get(restaurant=restaurant)
+        self.assertEqual(snapshot.version, restaurant.menu_version)
+
+        local_cache.clear()
+        response = self.client.get(reverse('restaurant-menu', kwargs={'pk': restaurant.id}))
+        self.assertEqual(response.content, bytes(snapshot.payload))
+        self.assertEqual(response['ETag'], snapshot.etag)
+
+    def test_slow_readers_do_not_overwrite_a_newer_snapshot(self):
+        restaurant = create_restaurant(1)
+        self.post_menu(restaurant, [{"name": "Drinks", "menu_items": [{"name": "Tea", "price": "20.00", "food_type": "VEG"}]}])
+        snapshot = MenuSnapshot.objects.get(restaurant=restaurant)
+
+        # A reader that built the menu before the write stores it late
+        stale = render_menu_document(self.get_restaurant(restaurant.id), snapshot.version - 1, [])
+        store_newer_menu_snapshot(restaurant.id, stale)
+        self.assertEqual(MenuSnapshot.objects.get(restaurant=restaurant).etag, snapshot.etag)
+
+        newer = render_menu_document(self.get_restaurant(restaurant.id), snapshot.version + 1, [])
+        store_newer_menu_snapshot(restaurant.id, newer)
+        self.assertEqual(MenuSnapshot.objects.get(restaurant=restaurant).etag, newer.etag)
+
+    def test_bulk_rebuild_matches_live_assembly(self):
+        restaurants = [create_restaurant(i) for i in range(1, 4)]
+        for restaurant in restaurants:
+            create_menu(restaurant, categories=2, items_per_category=2)
+
+        self.assertEqual(rebuild_menu_snapshots([r.id for r in restaurants]), 3)
+
+        for restaurant in restaurants:
+            restaurant = self.get_restaurant(restaurant.id)
+            live = render_menu_document(
+                restaurant, restaurant.menu_version, serialize_menu(load_menu_tree(restaurant.id))
+            )
+            self.assertEqual(bytes(MenuSnapshot.objects.get(pk=restaurant.id).payload), live.payload)
+
+
+class ConditionalGetTests(TestCase):
+
+    def test_menu_revalidation_returns_304_without_loading_the_menu(self):
+        restaurant = create_restaurant(1)
+        create_menu(restaurant, categories=1, items_per_category=1)
+        url = reverse('restaurant-menu', kwargs={'pk': restaurant.id})
+
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_menu_etag_changes_when_the_menu_is_written(self):
+        restaurant = create_restaurant(1)
+        url = reverse('restaurant-menu', kwargs={'pk': restaurant.id})
+        etag = self.client.get(url)['ETag']
+
+        self.client.post(
+            url,
+            {"menu": [{"name": "Drinks", "menu_items": [{"name": "Tea", "price": "20.00", "food_type": "VEG"}]}]},
+            content_type='application/json'
+        )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_revalidation_returns_304(self):
+        restaurant = create_restaurant(1)
+        url = reverse('restaurant-detail', kwargs={'pk': restaurant.id})
+
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+        # Menu writes bump menu_version without touching updated_at
+        bump_menu_version(restaurant.id)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["menu_version"], restaurant.menu_version + 1)
+
+        # So does the open now scheduler
+        etag = response['ETag']
+        Restaurant.objects.filter(pk=restaurant.pk).update(is_open_now=not restaurant.is_open_now)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ScheduleTests(SimpleTestCase):
+
+    def test_windows_past_midnight_wrap_into_the_next_day_and_week(self):
+        windows = IntervalSet.from_windows([
+            (1, time(9), time(17)),
+            (7, time(22), time(2)),
+        ])
+
+        self.assertIn(9 * 60, windows)
+        self.assertNotIn(17 * 60, windows)
+        self.assertIn(6 * MINUTES_PER_DAY + 23 * 60, windows)
+        self.assertIn(60, windows)
+        self.assertNotIn(2 * 60, windows)
+
+    def test_cutoff_ends_windows_early_even_past_midnight(self):
+        windows = IntervalSet.from_windows([
+            (1, time(9), time(17)),
+            (2, time(18), time(2)),
+        ], cutoff=time(1))
+
+        self.assertIn(16 * 60, windows)  # cutoff outside of the window
+        self.assertIn(MINUTES_PER_DAY + 23 * 60, windows)
+        self.assertIn(2 * MINUTES_PER_DAY + 59, windows)
+        self.assertNotIn(2 * MINUTES_PER_DAY + 60, windows)
+
+    def test_bitmap_matches_intervals(self):
+        windows = IntervalSet.from_windows([(1, time(9), time(17)), (7, time(22), time(2))])
+        bitmap = windows.to_bitmap()
+        self.assertEqual(len(bitmap), 1260)
+        for minute in range(0, 7 * MINUTES_PER_DAY, 7):
+            self.assertEqual(bitmap_contains(bitmap, minute), minute in windows)
+
+
+class MenuAvailabilityTests(TestCase):
+
+    def test_menu_is_filtered_by_item_availability(self):
+        restaurant = create_restaurant(1)
+        create_menu(restaurant, categories=1, items_per_category=2)
+        breakfast, always = MenuItem.objects.filter(category__restaurant=restaurant).order_by('id')
+        breakfast.availability_times.add(
+            ItemAvailability.objects.create(weekday=1, from_hour=time(7), to_hour=time(11))
+        )
+        url = reverse('restaurant-menu', kwargs={'pk': restaurant.id})
+
+        monday_morning = self.client.get(url, {"available_at": "2024-12-30T08:00:00+00:00"})
+        monday_evening = self.client.get(url, {"available_at": "2024-12-30T19:00:00+00:00"})
+
+        items = lambda response: [i["id"] for i in response.json()["data"]["menu"][0]["menu_items"]]
+        self.assertEqual(items(monday_morning), [breakfast.id, always.id])
+        self.assertEqual(items(monday_evening), [always.id])
+        self.assertNotEqual(monday_morning['ETag'], monday_evening['ETag'])
+
+    def test_filtered_menus_are_rendered_once_per_set_of_available_items(self):
+        filtered_menu_cache.clear()
+        restaurant = create_restaurant(1)
+        create_menu(restaurant, categories=1, items_per_category=2)
+        breakfast = MenuItem.objects.filter(category__restaurant=restaurant).order_by('id').first()
+        breakfast.availability_times.add(
+            ItemAvailability.objects.create(weekday=1, from_hour=time(7), to_hour=time(11))
+        )
+        url = reverse('restaurant-menu', kwargs={'pk': restaurant.id})
+
+        eight = self.client.get(url, {"available_at": "2024-12-30T08:00:00+00:00"})
+        nine = self.client.get(url, {"available_at": "2024-12-30T09:00:00+00:00"})
+        self.assertEqual(eight.content, nine.content)
+        self.assertNotEqual(eight['ETag'], nine['ETag'])
+        self.assertEqual(len(filtered_menu_cache), 1)
+
+        self.client.get(url, {"available_at": "2024-12-30T19:00:00+00:00"})
+        self.assertEqual(len(filtered_menu_cache), 2)
+
+    def test_invalid_available_at_is_rejected(self):
+        restaurant = create_restaurant(1)
+        response = self.client.get(
+            reverse('restaurant-menu', kwargs={'pk': restaurant.id}), {"available_at": "lunch"}
+        )
+        self.assertEqual(response.status_code, 422)
+
+
+class MenuChangesTests(TestCase):
+
+    def post_menu(self, restaurant, menu):
+        self.client.post(
+            reverse('restaurant-menu', kwargs={'pk': restaurant.id}),
+            {"menu": menu},
+            content_type='application/json'
+        )
+        restaurant.refresh_from_db()
+
+    def get_changes(self, restaurant, since=None):
+        params = {} if since is None else {"since": since}
+        response = self.client.get(
+            reverse('restaurant-menu-changes', kwargs={'pk': restaurant.id}), params
+        )
+        return response.json()["data"]
+
+    def test_only_rows_changed_since_the_given_version_are_returned(self):
+        restaurant = create_restaurant(1)
+        self.post_menu(restaurant, [{"name": "Drinks", "menu_items": [
+            {"name": "Tea", "price": "20.00", "food_type": "VEG"},
+            {"name": "Coffee", "price": "30.00", "food_type": "VEG"},
+        ]}])
+        synced_version = restaurant.menu_version
+
+        self.assertEqual(self.get_changes(restaurant, synced_version)["changes"]["items"], [])
+
+        tea = MenuItem.objects.get(name="Tea")
+        serializer = MenuItemSerializer(tea, data={"price": "25.00"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        delta = self.get_changes(restaurant, synced_version)
+        self.assertFalse(delta["full"])
+        self.assertEqual([item["id"] for item in delta["changes"]["items"]], [tea.id])
+        self.assertEqual(delta["changes"]["categories"], [])
+
+    def test_removed_rows_are_reported(self):
+        restaurant = create_restaurant(1)
+        self.post_menu(restaurant, [{"name": "Drinks", "menu_items": [{"name": "Tea", "price": "20.00", "food_type": "VEG"}]}])
+        synced_version = restaurant.menu_version
+        tea = MenuItem.objects.get(name="Tea")
+
+        self.post_menu(restaurant, [{"name": "Snacks", "menu_items": [{"name": "Samosa", "price": "15.00", "food_type": "VEG"}]}])
+
+        delta = self.get_changes(restaurant, synced_version)
+        self.assertEqual(delta["removed"]["items"], [tea.id])
+        self.assertEqual([item["name"] for item in delta["changes"]["items"]], ["Samosa"])
+
+    def test_negative_versions_are_rejected(self):
+        restaurant = create_restaurant(1)
+        response = self.client.get(
+            reverse('restaurant-menu-changes', kwargs={'pk': restaurant.id}), {"since": -5}
+        )
+        self.assertEqual(response.status_code, 422)
+
+    def test_missing_or_stale_version_falls_back_to_a_full_sync(self):
+        restaurant = create_restaurant(1)
+        self.post_menu(restaurant, [{"name": "Drinks", "menu_items": [{"name": "Tea", "price": "20.00", "food_type": "VEG"}]}])
+
+        self.assertTrue(self.get_changes(restaurant)["full"])
+        self.assertTrue(self.get_changes(restaurant, restaurant.menu_version + 1)["full"])
+
+
+class MenuSyncTests(TestCase):
+
+    menu = [
+        {"name": "Drinks", "menu_items": [
+            {"name": "Tea", "price": "20.00", "food_type": "VEG"},
+            {"name": "Coffee", "price": "30.00", "food_type": "VEG", "customizable": True, "customization_groups": [
+                {"name": "Milk", "options": [
+                    {"name": "Oat", "price": "10.00", "food_type": "VEG"},
+                    {"name": "Soy", "price": "10.00", "food_type": "VEG"},
+                ]},
+            ]},
+        ]},
+    ]
+
+    def post_menu(self, restaurant, menu):
+        return self.client.post(
+            reverse('restaurant-menu', kwargs={'pk': restaurant.id}),
+            {"menu": menu},
+            content_type='application/json'
+        )
+
+    def test_unchanged_rows_keep_their_primary_keys(self):
+        restaurant = create_restaurant(1)
+        self.post_menu(restaurant, self.menu)
+        pks = set(MenuItem.objects.values_list('pk', flat=True))
+
+        response = self.post_menu(restaurant, self.menu)
+
+        self.assertEqual(set(MenuItem.objects.values_list('pk', flat=True)), pks)
+        self.assertEqual(response.json()["meta"]["changes"], {"inserted": 0, "updated": 0, "deleted": 0})
+
+    def test_changes_are_applied_and_counted(self):
+        restaurant = create_restaurant(1)
+        self.post_menu(restaurant, self.menu)
+        coffee = MenuItem.objects.get(name="Coffee")
+
+        menu = json.loads(json.dumps(self.menu))
+        menu[0]["menu_items"][0]["price"] = "25.00"  # Tea updated
+        menu[0]["menu_items"][1]["customization_groups"][0]["options"].pop()  # Soy deleted
+        menu[0]["menu_items"].append({"name": "Juice", "price": "40.00", "food_type": "VEG"})
+
+        response = self.post_menu(restaurant, menu)
+
+        self.assertEqual(response.json()["meta"]["changes"], {"inserted": 1, "updated": 1, "deleted": 1})
+        self.assertEqual(MenuItem.objects.get(name="Tea").price, Decimal("25.00"))
+        self.assertEqual(MenuItem.objects.get(name="Coffee").pk, coffee.pk)
+        self.assertEqual(
+            list(CustomizationOption.objects.values_list('name', flat=True)), ["Oat"]
+        )
+
+    def test_invalid_values_are_rejected_before_anything_is_written(self):
+        restaurant = create_restaurant(1)
+        self.post_menu(restaurant, self.menu)
+        version = Restaurant.objects.get(pk=restaurant.pk).menu_version
+
+        for item in (
+            {"name": "Juice", "price": "40.00"},
+            {"name": "Juice", "price": "40.00", "food_type": "VEGAN"},
+            {"name": "Juice", "price": "cheap", "food_type": "VEG"},
+        ):
+            menu = json.loads(json.dumps(self.menu))
+            menu[0]["menu_items"].append(item)
+            response = self.post_menu(restaurant, menu)
+            self.assertEqual(response.status_code, 422)
+
+        self.assertFalse(MenuItem.objects.filter(name="Juice").exists())
+        self.assertEqual(Restaurant.objects.get(pk=restaurant.pk).menu_version, version)
+
+
+class MenuImportTests(TestCase):
+
+    menu = [{"name": "Drinks", "menu_items": [{"name": "Tea", "price": "20.00", "food_type": "VEG"}]}]
+
+    def test_async_import_is_queued_then_applied_by_a_worker(self):
+        restaurant = create_restaurant(1)
+        response = self.client.post(
+            reverse('restaurant-menu', kwargs={'pk': restaurant.id}) + '?async=1',
+            {"menu": self.menu},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["data"]["id"]
+        self.assertFalse(MenuItem.objects.exists())
+
+        run_menu_import(claim_menu_import())
+
+        status_url = reverse('restaurant-menu-import', kwargs={'pk': restaurant.id, 'job_id': job_id})
+        job = self.client.get(status_url).json()["data"]
+        self.assertEqual(job["status"], "SUCCEEDED")
+        self.assertEqual(job["processed_categories"], 1)
+        self.assertEqual(job["result"], {"inserted": 2, "updated": 0, "deleted": 0})
+        self.assertTrue(MenuItem.objects.filter(name="Tea").exists())
+        self.assertIsNone(claim_menu_import())
+
+    def test_running_imports_are_only_reclaimed_once_their_heartbeat_stops(self):
+        restaurant = create_restaurant(1)
+        long_ago = django_timezone.now() - timedelta(hours=1)
+        job = MenuImportJob.objects.create(
+            restaurant=restaurant, payload=self.menu, total_categories=1,
+            status='RUNNING', started_at=long_ago, heartbeat_at=django_timezone.now()
+        )
+        self.assertIsNone(claim_menu_import())
+
+        MenuImportJob.objects.filter(pk=job.pk).update(heartbeat_at=long_ago)
+        self.assertEqual(claim_menu_import().pk, job.pk)
+
+    def test_invalid_menus_are_rejected_before_queueing(self):
+        errors = validate_menu([{"name": "Drinks", "menu_items": [{"name": "Tea", "food_type": "VEG"}]}])
+        self.assertEqual(list(errors), ["menu[0].menu_items[0].price"])
+
+        errors = validate_menu([{"name": "Drinks", "menu_items": [
+            {"name": "Tea", "price": "twenty"},
+            {"name": "Coffee", "price": "30.00", "food_type": "VEG", "spice_level": "hot",
+             "customization_groups": [{"name": "Milk", "options": [{"name": "Oat", "food_type": "VEGAN"}]}]},
+        ]}])
+        self.assertEqual(set(errors), {
+            "menu[0].menu_items[0].price",
+            "menu[0].menu_items[0].food_type",
+            "menu[0].menu_items[1].spice_level",
+            "menu[0].menu_items[1].customization_groups[0].options[0].food_type",
+        })
+
+        # The worker never sees such menus
+        restaurant = create_restaurant(1)
+        response = self.client.post(
+            reverse('restaurant-menu', kwargs={'pk': restaurant.id}) + '?async=1',
+            {"menu": [{"name": "Drinks", "menu_items": [{"name": "Tea", "price": "20.00"}]}]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(MenuImportJob.objects.exists())
+
+
+def menu_stream_lines(items):
+    yield b'{"type": "category", "name": "Mains"}\n'
+    for i in range(items):
+        yield json.dumps(
+            {"type": "item", "name": f"Dish {i}", "price": "100.00", "food_type": "VEG", "description": "x" * 200}
+        ).encode() + b"\n"
+
+
+class MenuStreamTests(TestCase):
+
+    def peak_memory(self, items, batch_size):
+        tracemalloc.start()
+        try:
+            for batch in iter_menu_batches(menu_stream_lines(items), batch_size):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_peak_memory_is_bounded_by_the_batch_size(self):
+        small = self.peak_memory(1000, batch_size=100)
+        large = self.peak_memory(20000, batch_size=100)
+        # 20x the menu, about the same peak
+        self.assertLess(large, small * 1.5)
+
+    def upload_peak_memory(self, restaurant, body, content_type):
+        tracemalloc.start()
+        try:
+            response = self.client.post(
+                reverse('restaurant-menu', kwargs={'pk': restaurant.id}), body, content_type=content_type
+            )
+            self.assertEqual(response.status_code, 201)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_streamed_upload_peaks_below_a_json_upload(self):
+        # The whole endpoint: parsing, the sync and the snapshot refresh. The
+        # last two hold the whole menu, so only parsing is bounded.
+        items = 2000
+        streamed = self.upload_peak_memory(
+            create_restaurant(1), b"".join(menu_stream_lines(items)), 'application/x-ndjson'
+        )
+        menu = [{
+            "name": "Mains",
+            "menu_items": [
+                {"name": f"Dish {i}", "price": "100.00", "food_type": "VEG", "description": "x" * 200}
+                for i in range(items)
+            ]
+        }]
+        posted = self.upload_peak_memory(create_restaurant(2), {"menu": menu}, 'application/json')
+        self.assertLess(streamed, posted)
+
+    def test_large_categories_are_split_across_batches(self):
+        batches = list(iter_menu_batches(menu_stream_lines(5), batch_size=3))
+        self.assertEqual(
+            [[len(category["menu_items"]) for category in batch] for batch in batches],
+            [[2], [3]]
+        )
+        self.assertEqual({batch[0]["name"] for batch in batches}, {"Mains"})
+
+    def test_streamed_menu_is_applied(self):
+        restaurant = create_restaurant(1)
+        response = self.client.post(
+            reverse('restaurant-menu', kwargs={'pk': restaurant.id}),
+            b"".join(menu_stream_lines(450)),
+            content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["meta"]["changes"], {"inserted": 451, "updated": 0, "deleted": 0})
+        self.assertEqual(MenuCategory.objects.filter(restaurant=restaurant).count(), 1)
+        self.assertEqual(MenuItem.objects.filter(category__restaurant=restaurant).count(), 450)
+
+    def test_invalid_line_rolls_back_the_upload(self):
+        restaurant = create_restaurant(1)
+        response = self.client.post(
+            reverse('restaurant-menu', kwargs={'pk': restaurant.id}),
+            b"".join(menu_stream_lines(300)) + b'{"type": "item", "name": "Broken"}\n',
+            content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("Line 302", response.json()["errors"]["menu"][0])
+        self.assertFalse(MenuItem.objects.exists())
+
+    def test_invalid_food_types_are_reported_with_their_line(self):
+        restaurant = create_restaurant(1)
+        for item in ({"name": "Tea", "price": "20.00"}, {"name": "Tea", "price": "20.00", "food_type": "VEGAN"}):
+            response = self.client.post(
+                reverse('restaurant-menu', kwargs={'pk': restaurant.id}),
+                b'{"type": "category", "name": "Drinks"}\n' + json.dumps({"type": "item", **item}).encode(),
+                content_type='application/x-ndjson'
+            )
+            self.assertEqual(response.status_code, 422)
+            self.assertIn("Line 2: `food_type`", response.json()["errors"]["menu"][0])
+
+
+class DishSearchTests(TestCase):
+
+    def post_menu(self, restaurant, menu):
+        return self.client.post(
+            reverse('restaurant-menu', kwargs={'pk': restaurant.id}),
+            {"menu": menu},
+            content_type='application/json'
+        )
+
+    def search(self, **params):
+        return self.client.get(reverse('dish-search'), params).json()
+
+    def setUp(self):
+        self.first = create_restaurant(1)
+        self.second = create_restaurant(2)
+        response = self.post_menu(self.first, [{"name": "Starters", "menu_items": [
+            {"name": "Paneer Tikka", "price": "250.00", "food_type": "VEG"},
+            {"name": "Chicken Tikka", "price": "300.00", "food_type": "NON-VEG"},
+        ]}])
+        self.assertEqual(response.status_code, 201)
+        response = self.post_menu(self.second, [{"name": "Curries", "menu_items": [
+            {"name": "Kadai Paneer", "price": "280.00", "food_type": "VEG"},
+            {"name": "Dal Makhani", "price": "200.00", "food_type": "VEG", "customizable": True, "customization_groups": [
+                {"name": "Add-ons", "options": [{"name": "Extra Paneer", "price": "50.00", "food_type": "VEG"}]}
+            ]},
+        ]}])
+        self.assertEqual(response.status_code, 201)
+
+    def test_terms_match_as_prefixes_and_rank_name_matches_first(self):
+        names = [dish["name"] for dish in self.search(q="pan")["data"]]
+        # Matched on their name, then on an option name
+        self.assertEqual(set(names[:2]), {"Paneer Tikka", "Kadai Paneer"})
+        self.assertEqual(set(names[2:]), {"Dal Makhani"})
+
+        names = [dish["name"] for dish in self.search(q="paneer tik")["data"]]
+        self.assertEqual(names, ["Paneer Tikka"])
+
+    def test_filters(self):
+        names = {dish["name"] for dish in self.search(q="tikka", food_type="VEG")["data"]}
+        self.assertEqual(names, {"Paneer Tikka"})
+
+        dishes = self.search(q="paneer", restaurant=self.second.id)["data"]
+        self.assertEqual({dish["restaurant_id"] for dish in dishes}, {self.second.id})
+
+    def test_keyset_pages_cover_every_result_once(self):
+        ids, cursor = [], None
+        while True:
+            params = {"q": "paneer", "page_size": 1}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.search(**params)
+            ids.extend(dish["id"] for dish in response["data"])
+            cursor = response["meta"]["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(sorted(ids), sorted(dish["id"] for dish in self.search(q="paneer")["data"]))
+        self.assertEqual(len(ids), 3)
+
+
+class NearbyRestaurantsTests(TestCase):
+
+    def create_at(self, suffix, latitude, longitude):
+        location = Location.objects.create(latitude=latitude, longitude=longitude)
+        return create_restaurant(suffix, location=location)
+
+    def test_location_point_follows_coordinates(self):
+        location = Location.objects.create(latitude=12.97, longitude=77.59)
+        self.assertEqual((location.location.x, location.location.y), (77.59, 12.97))
+
+        location.latitude = 13.0
+        location.save(update_fields=['latitude'])
+        location.refresh_from_db()
+        self.assertAlmostEqual(location.location.y, 13.0)
+
+    def test_nearest_first_within_radius(self):
+        far = self.create_at(1, 13.05, 77.59)  # ~9km north
+        near = self.create_at(2, 12.975, 77.59)  # ~0.5km north
+        middle = self.create_at(3, 12.99, 77.59)  # ~2km north
+
+        response = self.client.get(reverse('restaurant-nearby'), {"lat": 12.97, "lon": 77.59, "radius": 5})
+
+        restaurants = response.json()["data"]
+        self.assertEqual([restaurant["id"] for restaurant in restaurants], [near.id, middle.id])
+        self.assertAlmostEqual(restaurants[0]["distance_km"], 0.55, delta=0.05)
+        self.assertNotIn(far.id, [restaurant["id"] for restaurant in restaurants])
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_cached_tiles_follow_restaurant_writes(self):
+        caches['default'].clear()
+        restaurant = self.create_at(1, 12.975, 77.59)
+        params = {"lat": 12.97, "lon": 77.59}
+        self.client.get(reverse('restaurant-nearby'), params)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.get(reverse('restaurant-nearby'), params).json()["data"][0]["is_online"])
+        self.assertFalse(queries)
+        self.assertTrue(self.client.get(reverse('restaurant-nearby'), params).json()["data"][0]["is_online"])
+
+        restaurant.is_online = False
+        restaurant.save()
+        self.assertFalse(self.client.get(reverse('restaurant-nearby'), params).json()["data"][0]["is_online"])
+
+        # Moved out of range
+        restaurant.location.latitude = 13.2
+        restaurant.location.save()
+        self.assertEqual(self.client.get(reverse('restaurant-nearby'), params).json()["data"], [])
+
+    def test_tiles_are_not_cached_per_process(self):
+        # Without CACHES, the default cache is a per-process LocMemCache
+        self.create_at(1, 12.975, 77.59)
+        params = {"lat": 12.97, "lon": 77.59}
+        self.client.get(reverse('restaurant-nearby'), params)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(self.client.get(reverse('restaurant-nearby'), params).json()["data"]), 1)
+        self.assertTrue(queries)
+
+    def test_invalid_coordinates(self):
+        response = self.client.get(reverse('restaurant-nearby'), {"lat": 120, "radius": "far"})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(set(response.json()["errors"]), {"lat", "lon", "radius"})
+
+
+class LocationDistanceTests(SimpleTestCase):
+
+    def test_batch_distances_are_within_tolerance_of_geodesic(self):
+        origin = Location(latitude=12.97, longitude=77.59)
+        locations = [
+            Location(latitude=latitude, longitude=longitude)
+            for latitude, longitude in [
+                (12.97, 77.59), (12.98, 77.60), (13.2, 77.7), (19.07, 72.87),
+                (28.61, 77.2), (8.5, 76.95), (51.5, -0.12), (-33.86, 151.2),
+            ]
+        ]
+
+        distances = Location.distances_from(origin.latitude, origin.longitude, locations)
+
+        self.assertEqual(len(distances), len(locations))
+        for location, distance in zip(locations, distances):
+            expected = origin.distance_to(location)
+            self.assertAlmostEqual(distance, expected, delta=max(expected * 0.006, 1e-6))
+
+    def test_accepts_coordinate_pairs(self):
+        distances = Location.distances_from(0, 0, [(0, 1), (1, 0)])
+        self.assertAlmostEqual(distances[0], distances[1])
+        self.assertEqual(len(Location.distances_from(0, 0, [])), 0)
+
+
+class NearbyFallbackTests(TestCase):
+
+    def test_python_ranking_matches_postgis(self):
+        for suffix, (latitude, longitude) in enumerate(
+                [(12.975, 77.59), (12.99, 77.595), (12.96, 77.6), (13.05, 77.59)], start=1):
+            create_restaurant(suffix, location=Location.objects.create(latitude=latitude, longitude=longitude))
+
+        in_python = nearby_restaurants_in_python(12.97, 77.59, radius_km=5)
+        self.assertEqual(
+            [restaurant["id"] for restaurant in in_python],
+            [restaurant["id"] for restaurant in nearby_restaurants(12.97, 77.59, radius_km=5)]
+        )
+        self.assertEqual(len(in_python), 3)
+
+
+class GeohashTests(SimpleTestCase):
+
+    def test_encode_and_bounds(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        min_latitude, max_latitude, min_longitude, max_longitude = geohash.bounds("u4pruydqqvj")
+        self.assertTrue(min_latitude <= 57.64911 <= max_latitude)
+        self.assertTrue(min_longitude <= 10.40744 <= max_longitude)
+
+    def test_covering_includes_every_overlapping_cell(self):
+        cells = geohash.covering(12.9, 13.0, 77.5, 77.7, 4)
+        self.assertEqual(cells, {"tdr1", "tdr3"})
+
+
+class OpeningHoursTests(TestCase):
+
+    # Monday 2024-01-01
+    monday_noon = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+    monday_night = datetime(2024, 1, 1, 23, 30, tzinfo=timezone.utc)
+    tuesday_early = datetime(2024, 1, 2, 1, 30, tzinfo=timezone.utc)
+
+    def test_open_at_in_sql_and_in_python(self):
+        lunch = create_restaurant_with_hours(1, [(1, time(11), time(15))])
+        late = create_restaurant_with_hours(2, [(1, time(18), time(3))], kitchen_closing_time=time(1))
+
+        self.assertEqual(list(Restaurant.objects.open_at(self.monday_noon)), [lunch])
+        self.assertEqual(list(Restaurant.objects.open_at(self.monday_night)), [late])
+        self.assertFalse(Restaurant.objects.open_at(self.tuesday_early).exists())
+
+        restaurants = list(Restaurant.objects.all())
+        with self.assertNumQueries(0):
+            self.assertEqual(open_restaurant_ids(restaurants, self.monday_night), {late.id})
+        self.assertEqual(
+            {restaurant.id: restaurant.is_open_at_time for restaurant in Restaurant.objects.with_open_at(self.monday_noon)},
+            {lunch.id: True, late.id: False}
+        )
+
+    def test_bitmap_follows_opening_time_changes(self):
+        restaurant = create_restaurant_with_hours(1, [(1, time(11), time(15))])
+        opening_time = restaurant.opening_times.get()
+
+        opening_time.to_hour = time(11, 30)
+        opening_time.save()
+        restaurant.refresh_from_db()
+        self.assertFalse(restaurant.is_open_at(self.monday_noon))
+
+        restaurant.opening_times.clear()
+        restaurant.refresh_from_db()
+        self.assertEqual(bytes(restaurant.opening_bitmap), bytes(1260))
+
+
+class OpenNowTests(TestCase):
+
+    def test_refresh_follows_schedule_and_online_flag(self):
+        restaurant = create_restaurant_with_hours(1, [(1, time(11), time(15))])
+
+        refresh_open_now(OpeningHoursTests.monday_noon)
+        self.assertTrue(Restaurant.objects.get(pk=restaurant.pk).is_open_now)
+        self.assertEqual(refresh_open_now(OpeningHoursTests.monday_noon), 0)
+
+        restaurant.is_online = False
+        restaurant.save()
+        refresh_open_now(OpeningHoursTests.monday_noon, restaurant_ids=[restaurant.pk])
+        self.assertFalse(Restaurant.objects.get(pk=restaurant.pk).is_open_now)
+
+        restaurant.is_online = True
+        restaurant.save()
+        refresh_open_now(OpeningHoursTests.monday_night)
+        self.assertFalse(Restaurant.objects.get(pk=restaurant.pk).is_open_now)
+
+    def test_list_filters_on_open_now(self):
+        open_restaurant = create_restaurant(1)
+        create_restaurant(2)
+        Restaurant.objects.filter(pk=open_restaurant.pk).update(is_open_now=True)
+
+        response = self.client.get(reverse('restaurant-list'), {"open_now": 1})
+        self.assertEqual([restaurant["id"] for restaurant in response.json()["data"]], [open_restaurant.id])
+
+    def test_scheduler_wakes_up_at_the_next_boundary(self):
+        create_restaurant_with_hours(1, [(1, time(11), time(15)), (7, time(22), time(2))])
+
+        boundaries = schedule_boundaries()
+        self.assertEqual(boundaries, [2 * 60, 11 * 60, 15 * 60, 6 * MINUTES_PER_DAY + 22 * 60])
+        self.assertEqual(minutes_until_next_boundary(boundaries, 12 * 60), 3 * 60)
+        # Wraps around the end of the week
+        self.assertEqual(minutes_until_next_boundary(boundaries, 6 * MINUTES_PER_DAY + 23 * 60), 3 * 60)
+
+
+class RestaurantListTests(TestCase):
+
+    def test_cursor_pages_cover_every_restaurant_newest_first(self):
+        for suffix in range(1, 26):
+            restaurant = create_restaurant_with_hours(suffix, [(1, time(11), time(15))])
+            restaurant.location = Location.objects.create(latitude=12.97, longitude=77.59)
+            restaurant.save()
+
+        ids, cursor = [], None
+        while True:
+            params = {"page_size": 10}
+            if cursor:
+                params["cursor"] = cursor
+            # Restaurants, opening times and bank accounts, whatever the page
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse('restaurant-list'), params)
+            ids.extend(restaurant["id"] for restaurant in response.json()["data"])
+            cursor = response.json()["meta"]["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(ids, list(Restaurant.objects.values_list('id', flat=True)))
+        self.assertEqual(len(ids), 25)
+
+    def test_page_size_and_invalid_cursor(self):
+        for suffix in range(1, 4):
+            create_restaurant(suffix)
+        response = self.client.get(reverse('restaurant-list'), {"page_size": 2})
+        self.assertEqual(len(response.json()["data"]), 2)
+
+        response = self.client.get(reverse('restaurant-list'), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 422)
+
+        # Well formed, but with values the ordering fields reject
+        for values in (["yesterday", 1], ["2024-01-01T00:00:00+00:00", "one"], [{}, [1]]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(reverse('restaurant-list'), {"cursor": cursor})
+            self.assertEqual(response.status_code, 422)
+
+
+class SparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        self.restaurant = create_restaurant_with_hours(1, [(1, time(11), time(15))])
+
+    def test_fields_and_expand_limit_payload_and_queries(self):
+        url = reverse('restaurant-detail', kwargs={'pk': self.restaurant.pk})
+
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {"fields": "id,name,logo_url"}).json()["data"]
+        self.assertEqual(set(data), {"id", "name", "logo_url"})
+
+        with self.assertNumQueries(2):
+            data = self.client.get(url, {"fields": "name", "expand": "opening_times"}).json()["data"]
+        self.assertEqual(set(data), {"name", "opening_times"})
+        self.assertEqual(len(data["opening_times"]), 1)
+
+        data = self.client.get(url, {"expand": "location"}).json()["data"]
+        self.assertIn("location", data)
+        self.assertNotIn("bank_accounts", data)
+        self.assertIn("fssai_license_number", data)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('restaurant-list'), {"fields": "name,secret", "expand": "name"})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(set(response.json()["errors"]), {"fields", "expand"})
+
+    def test_compact_list(self):
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('restaurant-list'), {"view": "compact"}).json()["data"]
+        self.assertEqual(set(data[0]), {
+            "id", "name", "category", "cuisines", "logo_url", "address", "is_online", "is_open_now", "created_at"
+        })
+
+
+class CuisineTests(TestCase):
+
+    def test_parse_normalizes_names(self):
+        self.assertEqual(
+            parse_cuisines(["South Indian, chinese", " south-indian ,, Chinese"]),
+            {"south-indian": "South Indian", "chinese": "chinese"}
+        )
+
+    def test_links_follow_cuisines_text(self):
+        restaurant = create_restaurant(1)
+        self.assertEqual(
+            set(restaurant.cuisine_links.values_list('cuisine__slug', flat=True)), {"north-indian", "chinese"}
+        )
+
+        restaurant.cuisines = "Chinese, Thai"
+        restaurant.save()
+        self.assertEqual(
+            set(restaurant.cuisine_links.values_list('cuisine__slug', flat=True)), {"chinese", "thai"}
+        )
+        self.assertEqual(Cuisine.objects.count(), 3)
+
+    def test_saves_only_rebuild_what_they_change(self):
+        restaurant = Restaurant.objects.get(pk=create_restaurant(1).pk)
+        # Reading the previous values, then writing the row
+        with self.assertNumQueries(2):
+            restaurant.save()
+        with self.assertNumQueries(1):
+            restaurant.save(update_fields=['mobile_number'])
+
+        restaurant.cuisines = "Thai"
+        restaurant.save(update_fields=['cuisines'])
+        self.assertEqual(set(restaurant.cuisine_links.values_list('cuisine__slug', flat=True)), {"thai"})
+
+    def test_list_filters_on_any_or_all_cuisines(self):
+        both = create_restaurant(1, cuisines="North Indian, Chinese")
+        chinese = create_restaurant(2, cuisines="Chinese")
+        create_restaurant(3, cuisines="Thai")
+        url = reverse('restaurant-list')
+
+        def ids(params):
+            return {restaurant["id"] for restaurant in self.client.get(url, params).json()["data"]}
+
+        self.assertEqual(ids({"cuisine": "chinese,north indian"}), {both.id, chinese.id})
+        self.assertEqual(ids({"cuisine": ["Chinese", "North Indian"], "cuisine_match": "all"}), {both.id})
+        self.assertEqual(ids({"cuisine": "chinese,mexican", "cuisine_match": "all"}), set())
+        self.assertEqual(ids({"cuisine": "mexican"}), set())
+
+        response = self.client.get(url, {"cuisine": "thai", "cuisine_match": "some"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_cuisine_list_counts_restaurants(self):
+        create_restaurant(1, cuisines="North Indian, Chinese")
+        create_restaurant(2, cuisines="Chinese")
+        data = self.client.get(reverse('cuisine-list')).json()["data"]
+        self.assertEqual(
+            {cuisine["slug"]: cuisine["restaurant_count"] for cuisine in data},
+            {"chinese": 2, "north-indian": 1}
+        )
+
+
+class RestaurantSearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        create_restaurant(1, cuisines="North Indian, Chinese", services=["DINE_IN", "TAKEAWAY"])
+        create_restaurant(2, cuisines="Chinese", services=["TAKEAWAY"], category="FINE_DINE")
+        create_restaurant(3, cuisines="Thai", services=["DINE_IN"], service_style="BUFFET")
+
+    def test_results_come_with_facet_counts_in_one_query(self):
+        # Restaurants, then every facet count at once
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('restaurant-search'), {"services": "TAKEAWAY"})
+        body = response.json()
+        self.assertEqual(len(body["data"]), 2)
+        self.assertEqual(body["meta"]["facets"], {
+            "category": [{"value": "CANTEEN", "count": 1}, {"value": "FINE_DINE", "count": 1}],
+            "service_style": [{"value": "SELF_SERVICE", "count": 2}],
+            "services": [{"value": "TAKEAWAY", "count": 2}, {"value": "DINE_IN", "count": 1}],
+            "cuisine": [{"value": "chinese", "count": 2}, {"value": "north-indian", "count": 1}],
+        })
+
+        # Counts are cached per filter combination
+        with self.assertNumQueries(1):
+            self.client.get(reverse('restaurant-search'), {"services": "TAKEAWAY"})
+
+    def test_filters_combine(self):
+        response = self.client.get(reverse('restaurant-search'), {"cuisine": "chinese", "category": "FINE_DINE"})
+        self.assertEqual([restaurant["name"] for restaurant in response.json()["data"]], ["Restaurant 2"])
+        self.assertEqual(response.json()["meta"]["facets"]["category"], [{"value": "FINE_DINE", "count": 1}])
+
+        response = self.client.get(reverse('restaurant-search'), {"cuisine": "mexican"})
+        self.assertEqual(response.json()["data"], [])
+        self.assertEqual(response.json()["meta"]["facets"]["cuisine"], [])
+
+        response = self.client.get(reverse('restaurant-search'), {"category": "DHABA"})
+        self.assertEqual(response.status_code, 422)
+
+
+class AutocompleteTests(TestCase):
+
+    def setUp(self):
+        prefix_cache.clear()
+        create_restaurant(1, name="Paradise Biryani", address="Gachibowli, Hyderabad")
+        create_restaurant(2, name="Pizza Corner", address="Koramangala, Bengaluru")
+        create_restaurant(3, name="Biryani House", address="Indiranagar, Bengaluru")
+
+    def get_names(self, q, **params):
+        response = self.client.get(reverse('restaurant-autocomplete'), {"q": q, **params})
+        return [restaurant["name"] for restaurant in response.json()["data"] or []]
+
+    def test_short_prefixes_match_names_and_are_cached(self):
+        self.assertEqual(self.get_names("pa"), ["Paradise Biryani"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_names(" PA "), ["Paradise Biryani"])
+
+    def test_longer_queries_rank_by_similarity(self):
+        self.assertEqual(self.get_names("biryani"), ["Paradise Biryani", "Biryani House"])
+        self.assertEqual(self.get_names("biryani hous")[0], "Biryani House")
+        self.assertEqual(self.get_names("paradse"), ["Paradise Biryani"])
+        self.assertEqual(self.get_names("koramangala"), ["Pizza Corner"])
+
+        response = self.client.get(reverse('restaurant-autocomplete'), {"q": "biryani"})
+        self.assertEqual(set(response.json()["data"][0]), {"id", "name", "logo_url"})
+
+    def test_limit_is_bounded(self):
+        self.assertEqual(len(self.get_names("biryani", limit=1)), 1)
+        response = self.client.get(reverse('restaurant-autocomplete'), {"q": "biryani", "limit": 500})
+        self.assertEqual(response.status_code, 422)
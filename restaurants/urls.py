@@ -2,7 +2,12 @@ from django.urls import path, include
 from .views import (
     RestaurantListView,
     RestaurantDetailView,
-    S3PreSignedUrlView, RestaurantMenuAPIView,
+    S3PreSignedUrlView, RestaurantMenuAPIView, RestaurantMenuChangesAPIView, MenuImportJobAPIView,
+    DishSearchAPIView,
+    CuisineListAPIView,
+    RestaurantSearchAPIView,
+    RestaurantAutocompleteAPIView,
+    NearbyRestaurantsAPIView,
 )
 
 urlpatterns = [
@@ -12,6 +17,21 @@ urlpatterns = [
     path('<int:pk>/', RestaurantDetailView.as_view(), name='restaurant-detail'),
     # List Menu
     path('<int:pk>/menu/', RestaurantMenuAPIView.as_view(), name='restaurant-menu'),
+    # Incremental Menu Sync
+    path('<int:pk>/menu/changes/', RestaurantMenuChangesAPIView.as_view(), name='restaurant-menu-changes'),
+    # Asynchronous Menu Import Status
+    path('<int:pk>/menu/imports/<int:job_id>/', MenuImportJobAPIView.as_view(), name='restaurant-menu-import'),
+
+    # Restaurants near a Location
+    path('nearby/', NearbyRestaurantsAPIView.as_view(), name='restaurant-nearby'),
+    # Restaurant Search with Facet Counts
+    path('search/', RestaurantSearchAPIView.as_view(), name='restaurant-search'),
+    # Restaurant Name Type-ahead
+    path('autocomplete/', RestaurantAutocompleteAPIView.as_view(), name='restaurant-autocomplete'),
+    # Cuisines to filter Restaurants on
+    path('cuisines/', CuisineListAPIView.as_view(), name='cuisine-list'),
+    # Dish Search across Restaurants
+    path('dishes/', DishSearchAPIView.as_view(), name='dish-search'),
 
     path('<int:restaurant_id>/orders/', include('orders.urls')),
     # Get S3 Pre-signed URL
@@ -1,6 +1,12 @@
+import hashlib
+
 import boto3
 from django.conf import settings
-from django.http import Http404
+from django.db import transaction
+from django.db.models import Count
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
@@ -9,33 +15,178 @@ from django.shortcuts import get_object_or_404
 from botocore.exceptions import ClientError
 
 from authentication.permissions import IsRestaurantAdmin
-from zapeat.std_utils import CustomAPIModule
-from .models import (
-    Restaurant,
-    MenuCategory,
-    MenuItem,
-    CustomizationGroup,
-    CustomizationOption
-)
+from zapeat.std_utils import CustomAPIModule, KeysetPagination
+from .models import Cuisine, Restaurant, MenuImportJob, MenuItem
 from .serializers import (
+    CuisineSerializer,
     RestaurantSerializer,
+    RestaurantListSerializer,
+    MenuImportJobSerializer,
+)
+from .autocomplete import DEFAULT_AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT, autocomplete_restaurants
+from .cuisines import filter_by_cuisines, parse_cuisines
+from .facets import cached_facet_counts
+from .geo import DEFAULT_NEARBY_LIMIT, DEFAULT_RADIUS_KM, MAX_NEARBY_LIMIT, MAX_RADIUS_KM
+from .menu import load_menu_tree, serialize_menu_summary
+from .availability import get_available_menu_payload
+from .menu_cache import (
+    MENU_RESTAURANT_FIELDS,
+    bump_menu_version,
+    get_menu_document,
+    menu_etag,
+    refresh_menu_snapshot,
 )
+from .menu_changes import get_menu_changes
+from .menu_imports import enqueue_menu_import, validate_menu
+from .menu_search import build_search_query, search_menu_items
+from .menu_stream import MenuStreamError, is_menu_stream, iter_menu_batches
+from .menu_sync import MenuSync, MenuSyncError
+from .nearby_cache import cached_nearby_restaurants
+from .schedules import minute_of_week
 from orders.models import Order
 from orders.serializers import OrderSerializer
 from drf_yasg.utils import swagger_auto_schema
 
+# Restaurant relations and how to fetch them
+RESTAURANT_RELATIONS = {
+    'location': 'select_related',
+    'opening_times': 'prefetch_related',
+    'bank_accounts': 'prefetch_related',
+}
+
+
+def restaurant_queryset(field_names, required=('id', 'created_at', 'updated_at')):
+    """
+    Restaurants loading the columns and relations behind the given
+    serializer fields only, plus the `required` columns.
+    """
+    concrete_fields = {field.name for field in Restaurant._meta.concrete_fields}
+    restaurants = Restaurant.objects.only(
+        *[name for name in field_names if name in concrete_fields], *required
+    )
+    for name, method in RESTAURANT_RELATIONS.items():
+        if name in field_names:
+            restaurants = getattr(restaurants, method)(name)
+    return restaurants
+
+
+def filter_restaurants(restaurants, params):
+    """
+    Applies the restaurant filters of the query parameters:
+        - `open_now`
+        - `category`, `service_style`: one of the values, comma separated or repeated
+        - `services`: every service, comma separated or repeated
+        - `cuisine`: any cuisine, comma separated or repeated, or all of them
+          with `cuisine_match=all`
+    Returns the filtered queryset, the normalized filters and a dict of errors.
+    """
+    filters, errors = {}, {}
+    if params.get('open_now') in ('1', 'true'):
+        filters["open_now"] = True
+        restaurants = restaurants.filter(is_open_now=True)
+
+    for name, choices, lookup in (
+        ('category', Restaurant.CATEGORY_CHOICES, 'in'),
+        ('service_style', Restaurant.SERVING_STYLE_CHOICES, 'in'),
+        ('services', Restaurant.SERVICES_CHOICES, 'contains'),
+    ):
+        values = sorted({value for item in params.getlist(name) for value in item.split(',') if value})
+        if not values:
+            continue
+        if set(values) - set(dict(choices)):
+            errors[name] = [f"Must be among {', '.join(dict(choices))}."]
+            continue
+        filters[name] = values
+        restaurants = restaurants.filter(**{f"{name}__{lookup}": values})
+
+    cuisines = parse_cuisines(params.getlist('cuisine'))
+    if cuisines:
+        cuisine_match = params.get('cuisine_match', 'any')
+        if cuisine_match not in ('any', 'all'):
+            errors["cuisine_match"] = ["Must be one of any, all."]
+        else:
+            filters["cuisine"] = sorted(cuisines)
+            filters["cuisine_match"] = cuisine_match
+            restaurants = filter_by_cuisines(restaurants, cuisines, match_all=cuisine_match == 'all')
+    return restaurants, filters, errors
+
+
+def get_restaurant_serializer_options(request):
+    """
+    Reads `?fields=` and `?expand=`. Returns (serializer kwargs, field names)
+    for `RestaurantSerializer` and a dict of errors.
+    """
+    fields, expand, errors = RestaurantSerializer.parse_field_selection(request.query_params)
+    options = {"fields": fields, "expand": expand}
+    return options, list(RestaurantSerializer(**options).fields), errors
+
+
+# Restaurant columns written with `QuerySet.update`, which leaves
+# `updated_at` alone, so the detail ETag covers them explicitly
+RESTAURANT_ETAG_FIELDS = ('menu_version', 'is_open_now')
+
+
+def restaurant_etag(restaurant, options):
+    """ETag of the detail representation of a restaurant."""
+    return CustomAPIModule.make_etag(
+        "restaurant", restaurant.pk, restaurant.updated_at.timestamp(),
+        *[getattr(restaurant, name) for name in RESTAURANT_ETAG_FIELDS],
+        *field_selection_variant(options)
+    )
+
+
+def field_selection_variant(options):
+    """ETag variant of a field selection, empty for the full representation."""
+    if options["fields"] is None and options["expand"] is None:
+        return ()
+    return (hashlib.md5(repr(options).encode()).hexdigest()[:12],)
+
+
 class RestaurantListView(APIView, CustomAPIModule):
     # permission_classes = [permissions.IsAuthenticated]
 
+    # Newest first, as Restaurant.Meta.ordering
+    pagination = KeysetPagination(ordering=[('created_at', True), ('id', True)])
+
     @swagger_auto_schema(
         responses={
             200: RestaurantSerializer(many=True)
         }
     )
     def get(self, request):
-        restaurants = Restaurant.objects.all()
-        serializer = RestaurantSerializer(restaurants, many=True)
-        return self.success_response(data=serializer.data, message="Restaurants fetched successfully", status_code=status.HTTP_200_OK)
+        """
+        List restaurants, newest first. Supports `?view=compact` for the discovery
+        representation, or `?fields=` and `?expand=` to pick fields and relations.
+        Supports the filters of `filter_restaurants`.
+        """
+        if request.query_params.get('view') == 'compact':
+            serializer_class, options = RestaurantListSerializer, {}
+            field_names = RestaurantListSerializer.Meta.fields
+        else:
+            options, field_names, errors = get_restaurant_serializer_options(request)
+            if errors:
+                return self.validation_error_response(errors=errors, message="Invalid field selection")
+            serializer_class = RestaurantSerializer
+
+        restaurants, filters, errors = filter_restaurants(restaurant_queryset(field_names), request.query_params)
+        if errors:
+            return self.validation_error_response(errors=errors, message="Invalid restaurant filter")
+
+        try:
+            page, next_cursor = self.pagination.paginate_queryset(restaurants, request)
+        except ValueError:
+            return self.validation_error_response(
+                errors={"cursor": ["Invalid cursor or page size."]},
+                message="Invalid pagination"
+            )
+
+        serializer = serializer_class(page, many=True, **options)
+        return self.success_response(
+            data=serializer.data,
+            message="Restaurants fetched successfully",
+            status_code=status.HTTP_200_OK,
+            meta={"next_cursor": next_cursor}
+        )
 
     @swagger_auto_schema(
         request_body=RestaurantSerializer,
@@ -55,13 +206,29 @@ class RestaurantDetailView(APIView, CustomAPIModule):
     # permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pk):
+        """
+        Get a restaurant. Supports `?fields=` and `?expand=` to pick fields and relations.
+        """
+        options, field_names, errors = get_restaurant_serializer_options(request)
+        if errors:
+            return self.validation_error_response(errors=errors, message="Invalid field selection")
+
         try:
-            restaurant = get_object_or_404(Restaurant, pk=pk)
-            serializer = RestaurantSerializer(restaurant)
-            return self.success_response(
+            restaurant = get_object_or_404(
+                restaurant_queryset(field_names, required=('id', 'created_at', 'updated_at', *RESTAURANT_ETAG_FIELDS)),
+                pk=pk
+            )
+            etag = restaurant_etag(restaurant, options)
+            if self.etag_matches(request, etag):
+                return self.not_modified_response(etag)
+
+            serializer = RestaurantSerializer(restaurant, **options)
+            response = self.success_response(
                 data=serializer.data,
                 message="Restaurant details retrieved successfully"
             )
+            response['ETag'] = etag
+            return response
         except Http404:
             return self.not_found_response(
                 message=f"Restaurant with id {pk} not found"
@@ -182,49 +349,56 @@ class S3PreSignedUrlView(APIView, CustomAPIModule):
 class RestaurantMenuAPIView(APIView, CustomAPIModule):
     # permission_classes = [IsAuthenticated, IsRestaurantAdmin]
 
+    def get_available_at(self, request):
+        """
+        Returns the moment the menu should be filtered for, from the
+        `available_now` or `available_at` (ISO 8601) query parameters.
+        """
+        if request.query_params.get('available_now') in ('1', 'true'):
+            return timezone.now()
+
+        available_at = request.query_params.get('available_at')
+        if not available_at:
+            return None
+        value = parse_datetime(available_at)
+        if value is None:
+            raise ValueError(available_at)
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
     def get(self, request, pk):
         try:
-            restaurant = get_object_or_404(Restaurant, pk=pk)
-            categories = MenuCategory.objects.filter(restaurant=restaurant)
-            data = []
-
-            for category in categories:
-                items = MenuItem.objects.filter(category=category)
-                category_data = {
-                    "name": category.name,
-                    "description": category.description,
-                    "menu_items": []
-                }
-
-                for item in items:
-                    customizations = []
-                    if item.customizable:
-                        groups = CustomizationGroup.objects.filter(menu_item=item)
-                        for group in groups:
-                            options = CustomizationOption.objects.filter(group=group)
-                            customizations.append({
-                                "group_name": group.name,
-                                "options": [{"name": option.name, "price": option.price, "food_type": option.food_type} for option in options]
-                            })
-
-                    category_data["menu_items"].append({
-                        "name": item.name,
-                        "price": item.price,
-                        "photo_url": item.photo_url,
-                        "customizable": item.customizable,
-                        "customizations": customizations,
-                        "food_type": item.food_type
-                    })
-
-                data.append(category_data)
+            try:
+                available_at = self.get_available_at(request)
+            except ValueError:
+                return self.validation_error_response(
+                    errors={"available_at": ["Enter a valid ISO 8601 date/time."]},
+                    message="Invalid menu filter"
+                )
+            # Filtered menus vary with the minute of the week they are served for
+            variant = ("at", minute_of_week(available_at)) if available_at else ()
 
-            return self.success_response(
-                data={
-                    "restaurant": restaurant.name,
-                    "menu": data
-                },
-                message="Restaurant menu retrieved successfully"
+            restaurant = get_object_or_404(
+                Restaurant.objects.only(*MENU_RESTAURANT_FIELDS),
+                pk=pk
+            )
+            etag = menu_etag(restaurant.pk, restaurant.menu_version, restaurant.updated_at, *variant)
+            if self.etag_matches(request, etag):
+                return self.not_modified_response(etag)
+
+            document = get_menu_document(restaurant)
+            # Documents are served pre-rendered, bypassing DRF rendering
+            if not variant:
+                response = HttpResponse(document.payload, content_type='application/json')
+                response['ETag'] = document.etag
+                return response
+
+            response = HttpResponse(
+                get_available_menu_payload(restaurant, document, variant[1]), content_type='application/json'
             )
+            response['ETag'] = menu_etag(restaurant.pk, document.version, restaurant.updated_at, *variant)
+            return response
 
         except Http404:
             return self.not_found_response(
@@ -236,6 +410,14 @@ class RestaurantMenuAPIView(APIView, CustomAPIModule):
                 errors={"detail": str(e)}
             )
 
+    @staticmethod
+    def is_async_request(request):
+        """Menus are imported in the background on `?async=1` or `Prefer: respond-async`"""
+        return (
+            request.query_params.get('async') in ('1', 'true')
+            or 'respond-async' in request.headers.get('Prefer', '')
+        )
+
     @swagger_auto_schema(
         request_body=OrderSerializer,
         responses={
@@ -247,6 +429,9 @@ class RestaurantMenuAPIView(APIView, CustomAPIModule):
     def post(self, request, pk):
         try:
             restaurant = get_object_or_404(Restaurant, pk=pk)
+            if is_menu_stream(request):
+                return self.post_menu_stream(request, restaurant)
+
             menu_categories = request.data.get("menu", [])
 
             if not menu_categories:
@@ -254,89 +439,29 @@ class RestaurantMenuAPIView(APIView, CustomAPIModule):
                     errors={"menu_categories": ["Menu categories are required."]},
                     message="Missing required data"
                 )
-            
-            # Delete all existing menu data for this restaurant
-            MenuCategory.objects.filter(restaurant=restaurant).delete()
-
-            # Process menu categories and items
-            for category_data in menu_categories:
-                category = MenuCategory.objects.get_or_create(
-                    name=category_data["name"],
-                    restaurant=restaurant,
-                    defaults={"description": category_data.get("description", "")}
+
+            if self.is_async_request(request):
+                errors = validate_menu(menu_categories)
+                if errors:
+                    return self.validation_error_response(errors=errors, message="Invalid menu data")
+                job = enqueue_menu_import(restaurant.id, menu_categories)
+                return self.success_response(
+                    data=MenuImportJobSerializer(job).data,
+                    message="Menu import queued",
+                    status_code=status.HTTP_202_ACCEPTED
                 )
 
-                for item_data in category_data.get("menu_items", []):
-                    menu_item = MenuItem.objects.create(
-                        name=item_data["name"],
-                        category=category[0] if isinstance(category, tuple) else category,
-                        description = item_data.get("description", ""),
-                        price = item_data["price"],
-                        photo_url = item_data.get("photo_url", ""),
-                        customizable = item_data.get("customizable", False),
-                        food_type = item_data.get("food_type"),
-                        spice_level = item_data.get("spice_level", 0),
-                        sweetness_level = item_data.get("sweetness_level", 0),
-                        must_try = item_data.get("must_try", False),
-
-                    )
-
-                    if item_data.get("customizable"):
-                        for group_data in item_data.get("customization_groups", []):
-                            group = CustomizationGroup.objects.get_or_create(
-                                name=group_data["name"],
-                                menu_item=menu_item,
-                                defaults={
-                                    "max_options_allowed": group_data.get("max_options_allowed", 1),
-                                    "min_options_allowed": group_data.get("min_options_allowed", 0)
-                                }
-                            )
-
-                            for option_data in group_data.get("options", []):
-                                CustomizationOption.objects.create(
-                                    name=option_data["name"],
-                                    group=group[0] if isinstance(group, tuple) else group,
-                                    price=option_data.get("price", 0.0),
-                                    food_type=option_data.get("food_type"),
-                                    spice_level=option_data.get("spice_level", 0),
-                                    sweetness_level=option_data.get("sweetness_level", 0)
-                                )
-            # Fetch updated menu for response
+            with transaction.atomic():
+                # Lock the restaurant against concurrent menu writers and
+                # invalidate its cached menu
+                version = bump_menu_version(restaurant.id)
 
-            categories = MenuCategory.objects.filter(restaurant=restaurant)
-            response_data = []
-
-
-            for category in categories:
-                items = MenuItem.objects.filter(category=category)
-                category_data = {
-                    "category_name": category.name,
-                    "category_description": category.description,
-                    "items": []
-                }
-
-                for item in items:
-                    customizations = []
-
-                    if item.customizable:
-                        groups = CustomizationGroup.objects.filter(menu_item=item)
-                        for group in groups:
-                            options = CustomizationOption.objects.filter(group=group)
-                            customizations.append({
-                                "group_name": group.name,
-                                "options": [{"name": option.name, "price": option.price, "food_type": option.food_type} for option in options]
-                            })
-
-                    category_data["items"].append({
-                        "name": item.name,
-                        "price": item.price,
-                        "photo_url": item.photo_url,
-                        "customizable": item.customizable,
-                        "customizations": customizations,
-                        "food_type": item.food_type
-                    })
-
-                response_data.append(category_data)
+                # Diff the posted menu against the current one and apply the changes
+                changes = MenuSync(restaurant.id, version).apply(menu_categories)
+                refresh_menu_snapshot(restaurant.id)
+
+            # Fetch updated menu for response
+            response_data = serialize_menu_summary(load_menu_tree(restaurant.id))
 
             return self.success_response(
                 data={
@@ -344,19 +469,281 @@ class RestaurantMenuAPIView(APIView, CustomAPIModule):
                     "menu": response_data
                 },
                 message="Menu created/updated successfully",
-                status_code=status.HTTP_201_CREATED
+                status_code=status.HTTP_201_CREATED,
+                meta={"changes": changes}
             )
 
         except Http404:
             return self.not_found_response(
                 message=f"Restaurant with id {pk} not found"
             )
+        except MenuSyncError as e:
+            return self.validation_error_response(
+                errors={"menu": [str(e)]},
+                message="Invalid menu data"
+            )
         except Exception as e:
             return self.error_response(
                 message="Failed to create/update menu",
                 errors={"detail": str(e)}
             )
 
+    def post_menu_stream(self, request, restaurant):
+        """
+        Applies a menu streamed as NDJSON batch by batch, without parsing the
+        whole request body at once (see `restaurants.menu_stream` for what
+        that bounds). Responds with the applied changes only, as echoing the
+        whole menu back would defeat the purpose.
+        """
+        try:
+            with transaction.atomic():
+                version = bump_menu_version(restaurant.id)
+                sync = MenuSync(restaurant.id, version)
+                records = 0
+                for batch in iter_menu_batches(request.stream or []):
+                    sync.apply_batch(batch)
+                    records += sum(1 + len(category["menu_items"]) for category in batch)
+                if not records:
+                    raise MenuStreamError("Menu categories are required.")
+                changes = sync.finish()
+                refresh_menu_snapshot(restaurant.id)
+        except (MenuStreamError, MenuSyncError) as e:
+            return self.validation_error_response(
+                errors={"menu": [str(e)]},
+                message="Invalid menu data"
+            )
+
+        return self.success_response(
+            data={
+                "restaurant": restaurant.name,
+                "records": records
+            },
+            message="Menu created/updated successfully",
+            status_code=status.HTTP_201_CREATED,
+            meta={"changes": changes}
+        )
+
+class RestaurantMenuChangesAPIView(APIView, CustomAPIModule):
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Get the menu rows changed and removed after menu version `since`.
+        Falls back to every menu row (`full`) when `since` is missing or too old.
+        """
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+                if since < 0:
+                    raise ValueError(since)
+            except ValueError:
+                return self.validation_error_response(
+                    errors={"since": ["A valid menu version is required."]},
+                    message="Invalid menu version"
+                )
+
+        try:
+            restaurant = get_object_or_404(Restaurant.objects.only('id', 'menu_version'), pk=pk)
+            return self.success_response(
+                data=get_menu_changes(restaurant.pk, restaurant.menu_version, since),
+                message="Menu changes retrieved successfully"
+            )
+        except Http404:
+            return self.not_found_response(
+                message=f"Restaurant with id {pk} not found"
+            )
+        except Exception as e:
+            return self.error_response(
+                message="Failed to retrieve menu changes",
+                errors={"detail": str(e)}
+            )
+
+class MenuImportJobAPIView(APIView, CustomAPIModule):
+    # permission_classes = [IsAuthenticated, IsRestaurantAdmin]
+
+    def get(self, request, pk, job_id):
+        """
+        Get the status and progress of an asynchronous menu import
+        """
+        try:
+            job = get_object_or_404(
+                MenuImportJob.objects.defer('payload'), pk=job_id, restaurant_id=pk
+            )
+            return self.success_response(
+                data=MenuImportJobSerializer(job).data,
+                message="Menu import status retrieved successfully"
+            )
+        except Http404:
+            return self.not_found_response(
+                message=f"Menu import {job_id} not found"
+            )
+
+class RestaurantSearchAPIView(APIView, CustomAPIModule):
+    # permission_classes = [IsAuthenticated]
+
+    pagination = RestaurantListView.pagination
+
+    def get(self, request):
+        """
+        Search restaurants with the filters of `filter_restaurants`. Returns a page of
+        compact restaurants, newest first, and in `meta.facets` the number of
+        matching restaurants per category, service style, service and cuisine.
+        """
+        restaurants, filters, errors = filter_restaurants(
+            restaurant_queryset(RestaurantListSerializer.Meta.fields), request.query_params
+        )
+        if errors:
+            return self.validation_error_response(errors=errors, message="Invalid restaurant filter")
+
+        try:
+            page, next_cursor = self.pagination.paginate_queryset(restaurants, request)
+        except ValueError:
+            return self.validation_error_response(
+                errors={"cursor": ["Invalid cursor or page size."]},
+                message="Invalid pagination"
+            )
+
+        return self.success_response(
+            data=RestaurantListSerializer(page, many=True).data,
+            message="Restaurants fetched successfully",
+            meta={
+                "next_cursor": next_cursor,
+                "facets": cached_facet_counts(restaurants, filters),
+            },
+            many=True
+        )
+
+class CuisineListAPIView(APIView, CustomAPIModule):
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        List cuisines with the number of restaurants serving them, for cuisine filters
+        """
+        cuisines = Cuisine.objects.annotate(restaurant_count=Count('restaurant_links'))
+        return self.success_response(
+            data=CuisineSerializer(cuisines, many=True).data,
+            message="Cuisines retrieved successfully",
+            many=True
+        )
+
+class NearbyRestaurantsAPIView(APIView, CustomAPIModule):
+    # permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def parse_params(params):
+        """Returns (latitude, longitude, radius_km, limit) and a dict of errors"""
+        values, errors = {}, {}
+        for name, cast, default, low, high in (
+            ("lat", float, None, -90, 90),
+            ("lon", float, None, -180, 180),
+            ("radius", float, DEFAULT_RADIUS_KM, 0, MAX_RADIUS_KM),
+            ("limit", int, DEFAULT_NEARBY_LIMIT, 1, MAX_NEARBY_LIMIT),
+        ):
+            value = params.get(name)
+            if value is None:
+                if default is None:
+                    errors[name] = ["This parameter is required."]
+                values[name] = default
+                continue
+            try:
+                values[name] = cast(value)
+            except ValueError:
+                errors[name] = ["A valid number is required."]
+                continue
+            if not low <= values[name] <= high:
+                errors[name] = [f"Must be between {low} and {high}."]
+        return (values["lat"], values["lon"], values["radius"], values["limit"]), errors
+
+    def get(self, request):
+        """
+        Get the restaurants within `radius` km (default 5) of `lat`/`lon`, nearest first
+        """
+        (latitude, longitude, radius_km, limit), errors = self.parse_params(request.query_params)
+        if errors:
+            return self.validation_error_response(errors=errors, message="Invalid location")
+
+        return self.success_response(
+            data=cached_nearby_restaurants(latitude, longitude, radius_km, limit),
+            message="Nearby restaurants retrieved successfully",
+            many=True
+        )
+
+class RestaurantAutocompleteAPIView(APIView, CustomAPIModule):
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Get the restaurants matching the name (or address locality) typed so far in `q`,
+        best matches first, up to `limit` (default 10)
+        """
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = None
+        if limit is None or not 1 <= limit <= MAX_AUTOCOMPLETE_LIMIT:
+            return self.validation_error_response(
+                errors={"limit": [f"Must be between 1 and {MAX_AUTOCOMPLETE_LIMIT}."]},
+                message="Invalid autocomplete"
+            )
+
+        return self.success_response(
+            data=autocomplete_restaurants(request.query_params.get('q', ''), limit),
+            message="Restaurants retrieved successfully",
+            many=True
+        )
+
+class DishSearchAPIView(APIView, CustomAPIModule):
+    # permission_classes = [IsAuthenticated]
+
+    pagination = KeysetPagination(ordering=[('rank', True), ('id', False)])
+
+    def get(self, request):
+        """
+        Search dishes across restaurants, best matches first.
+        Supports `q` (matched as prefixes), `food_type`, `restaurant` (repeatable),
+        `page_size` and the `cursor` of the previous page.
+        """
+        query = build_search_query(request.query_params.get('q', ''))
+        if query is None:
+            return self.validation_error_response(
+                errors={"q": ["A search term is required."]},
+                message="Invalid search"
+            )
+
+        food_type = request.query_params.get('food_type')
+        if food_type and food_type not in dict(MenuItem.FOOD_TYPE):
+            return self.validation_error_response(
+                errors={"food_type": [f"Must be one of {', '.join(dict(MenuItem.FOOD_TYPE))}."]},
+                message="Invalid search"
+            )
+
+        try:
+            restaurant_ids = [int(value) for value in request.query_params.getlist('restaurant')]
+        except ValueError:
+            return self.validation_error_response(
+                errors={"restaurant": ["Restaurant ids must be integers."]},
+                message="Invalid search"
+            )
+
+        try:
+            results, next_cursor = self.pagination.paginate_queryset(
+                search_menu_items(query, food_type, restaurant_ids), request
+            )
+        except ValueError:
+            return self.validation_error_response(
+                errors={"cursor": ["Invalid cursor or page size."]},
+                message="Invalid search"
+            )
+
+        return self.success_response(
+            data=results,
+            message="Dishes retrieved successfully",
+            meta={"next_cursor": next_cursor},
+            many=True
+        )
+
 class RestaurantOrdersAPIView(ListAPIView):
     # permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
@@ -1,6 +1,18 @@
+import base64
+import datetime
+import json
+import statistics
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.response import Response
 from rest_framework import status
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
 from rest_framework.pagination import PageNumberPagination
 
 class CustomAPIModule:
@@ -16,7 +28,8 @@ class CustomAPIModule:
             success: bool = True,
             status_code: int = status.HTTP_200_OK,
             errors: Optional[Dict] = None,
-            meta: Optional[Dict] = None
+            meta: Optional[Dict] = None,
+            many: bool = False
     ) -> Response:
         """
         Creates a standardized response format for all API endpoints.
@@ -28,26 +41,50 @@ class CustomAPIModule:
             status_code: HTTP status code for the response
             errors: Dictionary of validation or processing errors
             meta: Additional metadata like pagination info
+            many: Whether data is a list, kept a list even when empty
 
         Returns:
             DRF Response object with standardized format
         """
-        response_data = {
+        response_data = CustomAPIModule.create_response_data(
+            data=data,
+            message=message,
+            success=success,
+            errors=errors,
+            meta=meta,
+            many=many
+        )
+
+        return Response(response_data, status=status_code)
+
+    @staticmethod
+    def create_response_data(
+            data: Any = None,
+            message: str = "",
+            success: bool = True,
+            errors: Optional[Dict] = None,
+            meta: Optional[Dict] = None,
+            many: bool = False
+    ) -> Dict:
+        """
+        Builds the standardized response body, for callers pre-rendering
+        responses outside of a view.
+        """
+        return {
             "success": success,
             "message": message,
-            "data": data or {},
+            "data": (data or []) if many else (data or {}),
             "errors": errors or {},
             "meta": meta or {}
         }
 
-        return Response(response_data, status=status_code)
-
     def success_response(
             self,
             data: Any = None,
             message: str = "Operation successful",
             status_code: int = status.HTTP_200_OK,
-            meta: Optional[Dict] = None
+            meta: Optional[Dict] = None,
+            many: bool = False
     ) -> Response:
         """Helper method for successful responses"""
         return self.create_response(
@@ -55,7 +92,8 @@ class CustomAPIModule:
             message=message,
             success=True,
             status_code=status_code,
-            meta=meta
+            meta=meta,
+            many=many
         )
 
     def error_response(
@@ -87,6 +125,29 @@ class CustomAPIModule:
             errors=errors
         )
 
+    def not_modified_response(self, etag: str) -> Response:
+        """Helper method for 304 responses to conditional GETs"""
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        return response
+
+    @staticmethod
+    def make_etag(*parts: Any) -> str:
+        """Builds a strong ETag out of the parts of a version stamp"""
+        return quote_etag("-".join(str(part) for part in parts))
+
+    @staticmethod
+    def etag_matches(request, etag: str) -> bool:
+        """
+        Checks the If-None-Match header of a request against an ETag, using
+        the weak comparison RFC 9110 prescribes for If-None-Match.
+        """
+        header = request.META.get('HTTP_IF_NONE_MATCH')
+        if not header:
+            return False
+        etags = parse_etags(header)
+        return '*' in etags or any(tag.removeprefix('W/') == etag for tag in etags)
+
     def validation_error_response(
             self,
             errors: Dict,
@@ -104,3 +165,198 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+class DynamicFieldsMixin:
+    """
+    ModelSerializer mixin serving sparse fieldsets, e.g. from `?fields=` and
+    `?expand=` query parameters.
+
+    Relations listed in `Meta.expandable_fields` are only serialized when
+    named in `fields` or `expand`, other fields only when named in `fields`
+    (all of them when `fields` is not given). Without either argument the
+    serializer behaves as usual.
+    """
+
+    def __init__(self, *args, fields: Optional[Sequence[str]] = None,
+                 expand: Optional[Sequence[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and expand is None:
+            return
+
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        expanded = set(expand or ()) & expandable
+        if fields is None:
+            allowed = (set(self.fields) - expandable) | expanded
+        else:
+            allowed = set(fields) | expanded
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
+
+    @classmethod
+    def parse_field_selection(cls, query_params) -> Tuple[Optional[List[str]], Optional[List[str]], Dict]:
+        """
+        Reads comma separated `fields` and `expand` query parameters. Returns
+        (fields, expand, errors), with errors for unknown field names.
+        """
+        known = set(cls().fields)
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        selection, errors = {}, {}
+        for name, valid in (('fields', known), ('expand', expandable)):
+            value = query_params.get(name)
+            if value is None:
+                selection[name] = None
+                continue
+            selection[name] = [field.strip() for field in value.split(',') if field.strip()]
+            unknown = set(selection[name]) - valid
+            if unknown:
+                errors[name] = [f"Unknown fields: {', '.join(sorted(unknown))}."]
+        return selection['fields'], selection['expand'], errors
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keeps the microseconds DjangoJSONEncoder drops, cursors must round-trip exactly"""
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination:
+    """
+    Cursor pagination over a unique ordering, e.g. `[('rank', True), ('id', False)]`
+    for rank descending then id ascending.
+
+    Pages are fetched with a WHERE clause on the ordering keys of the last row
+    of the previous page rather than an OFFSET, so deep pages cost the same as
+    the first one. The last key must be unique for the ordering to be total.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    max_page_size = 100
+
+    def __init__(self, ordering: Sequence[Tuple[str, bool]], page_size: Optional[int] = None,
+                 max_page_size: Optional[int] = None):
+        self.ordering = list(ordering)
+        self.page_size = page_size or self.page_size
+        self.max_page_size = max_page_size or self.max_page_size
+
+    def encode_cursor(self, row: Any) -> str:
+        values = [
+            row[field] if isinstance(row, dict) else getattr(row, field)
+            for field, _ in self.ordering
+        ]
+        return base64.urlsafe_b64encode(
+            json.dumps(values, cls=CursorEncoder).encode()
+        ).decode()
+
+    def decode_cursor(self, cursor: str) -> List[Any]:
+        """Raises ValueError on a cursor this pagination did not issue"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError) as e:
+            raise ValueError("Invalid cursor") from e
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise ValueError("Invalid cursor")
+        return values
+
+    def get_page_size(self, request) -> int:
+        """Raises ValueError on an invalid page size"""
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None:
+            return self.page_size
+        page_size = int(page_size)
+        if page_size < 1:
+            raise ValueError("Invalid page size")
+        return min(page_size, self.max_page_size)
+
+    def after(self, values: Sequence[Any]) -> Q:
+        """Filter selecting the rows ordered after the given key values"""
+        condition = Q()
+        for position, (field, descending) in enumerate(self.ordering):
+            step = Q(**{f"{field}__{'lt' if descending else 'gt'}": values[position]})
+            for (previous, _), value in zip(self.ordering[:position], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def paginate_queryset(self, queryset, request) -> Tuple[List[Any], Optional[str]]:
+        """
+        Returns a page of the queryset and the cursor of the next page, None
+        on the last page. Raises ValueError on invalid pagination parameters.
+        """
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = queryset.filter(self.after(self.decode_cursor(cursor)))
+            except (ValidationError, TypeError) as e:
+                # Well formed cursor holding values the ordering fields reject
+                raise ValueError("Invalid cursor") from e
+        queryset = queryset.order_by(*[
+            f"-{field}" if descending else field for field, descending in self.ordering
+        ])
+
+        rows = list(queryset[:page_size + 1])
+        next_cursor = self.encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size], next_cursor
+
+
+class LRUCache:
+    """
+    A small thread-safe in-process cache with least-recently-used eviction.
+    Used for hot, per-process data such as rendered menus.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def summarize_timings(timings: List[float]) -> Dict[str, float]:
+    """Median, 95th percentile and maximum of a list of timings, for benchmarks."""
+    timings = sorted(timings)
+    return {
+        "median": statistics.median(timings),
+        "p95": timings[max(int(len(timings) * 0.95) - 1, 0)],
+        "max": timings[-1],
+    }
+
+
+def measure(func: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    """Calls `func` `iterations` times and summarizes its timings in milliseconds."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize_timings(timings)